@@ -0,0 +1,52 @@
+# Benchmark das agregações do painel: 100 mil ligações sintéticas em colunas,
+# somadas de uma vez e em lotes incrementais, e leitura das agregações.
+#
+#   python benchmarks/bench_analytics.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatglass.analytics import CallAnalytics  # noqa: E402
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64("2026-01-01T00:00:00") + rng.integers(0, 180 * 86400, n).astype("timedelta64[s]")
+    checklist_masks = rng.integers(0, 1 << 12, n)
+    eliminatorio_masks = np.where(rng.random(n) < 0.08, rng.integers(1, 1 << 7, n), 0)
+    scores = rng.integers(0, 82, n)
+    statuses = rng.choice(np.array(["completo", "parcial", "não utilizado"], dtype=object), n)
+    return timestamps, scores, checklist_masks, eliminatorio_masks, statuses
+
+
+def main(n=100_000):
+    columns = synthetic(n)
+
+    analytics = CallAnalytics()
+    start = time.perf_counter()
+    analytics.add_columns(*columns)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analytics.pass_rates()
+    analytics.score_summary()
+    analytics.weekly_eliminatory()
+    read_s = time.perf_counter() - start
+
+    incremental = CallAnalytics()
+    start = time.perf_counter()
+    for i in range(0, n, 1000):
+        incremental.add_columns(*(c[i:i + 1000] for c in columns))
+    incremental_s = time.perf_counter() - start
+    assert (incremental.week_counts == analytics.week_counts).all()
+
+    print(f"{n} ligações: agregação {load_s * 1000:.1f} ms, leitura {read_s * 1000:.1f} ms, "
+          f"incremental em lotes de 1000 {incremental_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
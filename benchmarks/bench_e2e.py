@@ -0,0 +1,228 @@
+# Benchmark de ponta a ponta sem custo de API: sobe o servidor local que imita
+# a OpenAI (stub_openai.py), gera um corpus de mp3 sintéticos e passa cada um
+# pelo mesmo fluxo do botão "Analisar Atendimento" do streamlit_app.py (upload,
+# transcrição, análise em streaming, parse e PDF) e pelo modo em lote.
+# Relata vazão, percentis de latência por etapa, pico de memória (RSS) e taxa
+# de falhas no parse.
+#
+#   python benchmarks/bench_e2e.py -n 40 --sessoes 4 --latencia-ms 800 --taxa-truncada 0.05
+import argparse
+import io
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatglass.batch import run_batch  # noqa: E402
+from heatglass.cache import DiskCache  # noqa: E402
+from heatglass.core import evaluate, transcribe  # noqa: E402
+from heatglass.metrics import REGISTRY, Trace  # noqa: E402
+from heatglass.parsing import parse_analysis  # noqa: E402
+from heatglass.prompt import MODELO_PADRAO  # noqa: E402
+from heatglass.tiers import STATS as ESCALONAMENTO, split_tiers  # noqa: E402
+from heatglass.report import create_pdf  # noqa: E402
+from heatglass.scheduler import SCHEDULER, shared_client  # noqa: E402
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_openai.py")
+
+# Quadro MPEG-1 Layer III, 128 kbps, 44,1 kHz, sem padding: 417 bytes e 1152 amostras
+QUADRO_MP3 = b"\xff\xfb\x90\x64" + bytes(413)
+AMOSTRAS_POR_QUADRO = 1152
+
+
+# mp3 sintético (silêncio) com a duração pedida
+def synthetic_mp3(seconds):
+    return QUADRO_MP3 * max(1, int(seconds * 44100 / AMOSTRAS_POR_QUADRO))
+
+
+# Corpus de ligações com durações entre 1 e 8 minutos
+def synthetic_corpus(directory, n, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i, seconds in enumerate(rng.uniform(60, 480, n)):
+        path = os.path.join(directory, f"ligacao_{i:04d}.mp3")
+        with open(path, "wb") as f:
+            f.write(synthetic_mp3(seconds) + i.to_bytes(4, "big"))  # bytes distintos por arquivo
+        paths.append(path)
+    return paths
+
+
+# Sobe o stub em outro processo (o pico de RSS medido é só o do HeatGlass)
+def start_stub(stub_args):
+    proc = subprocess.Popen(
+        [sys.executable, STUB, "--porta", "0", *stub_args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    return proc, proc.stdout.readline().strip()
+
+
+def stop_stub(proc):
+    proc.send_signal(signal.SIGINT)
+    try:
+        _, err = proc.communicate(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        return {}
+    lines = [line for line in err.splitlines() if line.startswith("{")]
+    return json.loads(lines[-1]) if lines else {}
+
+
+# O caminho de um upload do streamlit_app.py (o que os workers da fila executam), sem a interface e sem a fila
+def app_flow(client, cache, path, model, pdf=False):
+    with open(path, "rb") as f:
+        uploaded = io.BytesIO(f.read())
+    trace = Trace("bench_app")
+    outcome = {"erro": None, "parse_falhou": False, "reparado": False}
+    try:
+        transcript_text, _ = transcribe(uploaded, client, cache, trace)
+        # Em streaming, como no app; o pipeline mede primeiro_item_s a partir do primeiro item do modelo
+        result = evaluate(transcript_text, client, model, cache, lambda key, value: None, trace,
+                          trace.attrs.get("audio"))
+        try:
+            with trace.span("parse_json"):
+                analysis = parse_analysis(result)
+            outcome["reparado"] = bool(analysis.get("json_reparado"))
+        except ValueError:
+            outcome["parse_falhou"] = True
+            analysis = None
+        if pdf and analysis is not None:
+            with trace.span("pdf"):
+                create_pdf(analysis, transcript_text, model)
+    except Exception as e:
+        outcome["erro"] = f"{type(e).__name__}: {e}"
+    trace.finish()
+    outcome["metricas"] = trace.to_dict()
+    return outcome
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+# Resumo de uma rodada a partir dos traces de cada ligação
+def summarize_run(mode, outcomes, elapsed):
+    stages = {}
+    for outcome in outcomes:
+        for span in outcome["metricas"]["etapas"]:
+            stages.setdefault(span["etapa"], []).append(span["duracao_s"])
+    first_items = [o["metricas"]["primeiro_item_s"] for o in outcomes if "primeiro_item_s" in o["metricas"]]
+    n = len(outcomes)
+    return {
+        "modo": mode,
+        "ligacoes": n,
+        "segundos": round(elapsed, 2),
+        "ligacoes_por_min": round(n / elapsed * 60, 1) if elapsed else None,
+        "erros": sum(1 for o in outcomes if o["erro"]),
+        "taxa_falha_parse": round(sum(o["parse_falhou"] for o in outcomes) / n, 4) if n else 0,
+        "taxa_reparado": round(sum(o["reparado"] for o in outcomes) / n, 4) if n else 0,
+        "total_s": percentiles([o["metricas"]["total_s"] for o in outcomes]),
+        "primeiro_item_s": percentiles(first_items),
+        "etapas": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def run_app(client, files, model, sessions, pdf, cache_dir):
+    cache = DiskCache(cache_dir)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, sessions)) as executor:
+        outcomes = list(executor.map(lambda path: app_flow(client, cache, path, model, pdf), files))
+    return summarize_run("app", outcomes, time.perf_counter() - start)
+
+
+def run_batch_mode(client, files, model, concurrency):
+    output = io.StringIO()
+    start = time.perf_counter()
+    run_batch(client, files, output, model, concurrency)
+    elapsed = time.perf_counter() - start
+    outcomes = []
+    for line in output.getvalue().splitlines():
+        record = json.loads(line)
+        spans = [s["etapa"] for s in record["metricas"]["etapas"]]
+        # No lote, uma falha no parse aparece como erro com parse_json como última etapa
+        parse_failed = "erro" in record and spans[-1:] == ["parse_json"]
+        outcomes.append({
+            "erro": None if parse_failed else record.get("erro"),
+            "parse_falhou": parse_failed,
+            "reparado": bool(record.get("json_reparado")),
+            "metricas": record["metricas"],
+        })
+    return summarize_run("lote", outcomes, elapsed)
+
+
+def print_summary(summary):
+    print(f"\n== {summary['modo']}: {summary['ligacoes']} ligações em {summary['segundos']} s "
+          f"({summary['ligacoes_por_min']}/min), {summary['erros']} erros, "
+          f"falha no parse {summary['taxa_falha_parse']:.1%}, reparadas {summary['taxa_reparado']:.1%}")
+    print(f"{'etapa':<16}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = [("total", summary["total_s"]), ("primeiro_item", summary["primeiro_item_s"]),
+            *summary["etapas"].items()]
+    for stage, values in rows:
+        if values:
+            print(f"{stage:<16}{values['p50']:>9.3f}{values['p95']:>9.3f}{values['p99']:>9.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta com o stub local da OpenAI")
+    parser.add_argument("-n", type=int, default=20, help="Ligações no corpus sintético")
+    parser.add_argument("--modo", choices=("app", "lote", "ambos"), default="ambos")
+    parser.add_argument("--sessoes", type=int, default=4, help="Sessões simultâneas no fluxo do app")
+    parser.add_argument("-c", "--concorrencia", type=int, default=4, help="Concorrência do modo em lote")
+    parser.add_argument("--pdf", action="store_true", help="Gera o PDF de cada análise no fluxo do app")
+    parser.add_argument("--tentativas", type=int, default=5, help="Novas tentativas do agendador em erros transitórios")
+    parser.add_argument("--rpm", type=float, default=100000, help="Limite de requisições por minuto por modelo")
+    parser.add_argument("--tpm", type=float, default=None, help="Limite de tokens por minuto do chat")
+    parser.add_argument("-m", "--modelo", default=MODELO_PADRAO,
+                        help="Modelo da análise (\"rápido+completo\" para a avaliação escalonada)")
+    parser.add_argument("--json", dest="saida_json", help="Grava o resumo em JSON neste arquivo")
+    args, stub_args = parser.parse_known_args(argv)  # o resto vai para o stub (--latencia-ms, --taxa-erro...)
+
+    SCHEDULER.max_retries = args.tentativas
+    SCHEDULER.limits = {"whisper-1": {"rpm": args.rpm, "tpm": None}}
+    for model in (split_tiers(args.modelo) or (args.modelo,)):
+        SCHEDULER.limits[model] = {"rpm": args.rpm, "tpm": args.tpm}
+
+    with tempfile.TemporaryDirectory(prefix="heatglass_bench_") as directory:
+        REGISTRY.path = os.path.join(directory, "heatglass.prom")
+        os.makedirs(os.path.join(directory, "corpus"))
+        files = synthetic_corpus(os.path.join(directory, "corpus"), args.n)
+        proc, base_url = start_stub(stub_args)
+        try:
+            client = shared_client("stub", base_url)
+            summaries = []
+            if args.modo in ("app", "ambos"):
+                summaries.append(run_app(client, files, args.modelo, args.sessoes, args.pdf,
+                                         os.path.join(directory, "cache")))
+            if args.modo in ("lote", "ambos"):
+                summaries.append(run_batch_mode(client, files, args.modelo, args.concorrencia))
+        finally:
+            stub_stats = stop_stub(proc)
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for summary in summaries:
+        print_summary(summary)
+    print(f"\nPico de RSS: {peak_rss_mb:.1f} MB | stub: {json.dumps(stub_stats)} | "
+          f"agendador: {json.dumps(SCHEDULER.stats)}")
+    if ESCALONAMENTO.stats["avaliacoes"]:
+        print(f"Escalonamento: {json.dumps(ESCALONAMENTO.summary())}")
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump({"execucoes": summaries, "pico_rss_mb": round(peak_rss_mb, 1), "stub": stub_stats,
+                       "agendador": SCHEDULER.stats, "escalonamento": ESCALONAMENTO.summary()}, f,
+                      ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+# Micro-benchmark do extrator de JSON: respostas grandes, com texto em volta,
+# truncadas e com lixo entre chaves. O tempo por KB deve ficar estável
+# (crescimento linear) à medida que a resposta cresce.
+#
+#   python benchmarks/bench_extract_json.py
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatglass.parsing import extract_json, parse_analysis  # noqa: E402
+from heatglass.rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS  # noqa: E402
+
+
+def make_response(n_items):
+    return json.dumps({
+        "status_final": {"satisfacao": "satisfeito", "risco": "baixo", "desfecho": "resolvido"},
+        "checklist": [
+            {"item": i % len(CHECKLIST) + 1, "resposta": "sim", "justificativa": "O atendente disse \"{ok}\" e confirmou [dados]. " * 3}
+            for i in range(n_items)
+        ],
+        "criterios_eliminatorios": [{"id": i, "ocorreu": False, "justificativa": "Não ocorreu."} for i in range(1, len(CRITERIOS_ELIMINATORIOS) + 1)],
+        "uso_script": {"status": "completo", "justificativa": "Todos os elementos presentes."},
+        "resumo_geral": "Atendimento cordial e completo.",
+    }, ensure_ascii=False)
+
+
+def cases(n_items):
+    body = make_response(n_items)
+    return {
+        "valido": body,
+        "com_texto": "Segue a análise solicitada:\n```json\n" + body + "\n```\nQualquer dúvida {estou} à disposição.",
+        "truncado": body[: len(body) - 20],  # cortado no resumo_geral
+        "lixo_antes": "{rascunho: [1, 2} " + body,
+    }
+
+
+def main():
+    print(f"{'caso':<12}{'tamanho':>10}{'ms':>10}{'us/KB':>10}")
+    for n_items in (12, 120, 1200, 12000):
+        for name, text in cases(n_items).items():
+            runs = max(1, 2000 // n_items)
+            func = parse_analysis if name == "valido" else extract_json
+            elapsed = timeit.timeit(lambda: func(text), number=runs) / runs
+            kb = len(text) / 1024
+            print(f"{name:<12}{len(text):>10}{elapsed * 1000:>10.2f}{elapsed * 1e6 / kb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# Servidor HTTP local que imita os endpoints da OpenAI usados pelo HeatGlass
+# (/v1/audio/transcriptions e /v1/chat/completions, com e sem streaming), para
+# medir o desempenho sem gastar com a API. Latência, variação, taxa de erros e
+# de respostas truncadas são configuráveis; a análise devolvida é um JSON do
+# checklist gerado a partir da rubrica.
+#
+#   python benchmarks/stub_openai.py --porta 8089 --latencia-ms 800 --taxa-erro 0.02
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub python -m heatglass.batch gravacoes/
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatglass.rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS  # noqa: E402
+
+FRASES = (
+    "Bom dia, meu nome é Ana, da Carglass, com quem eu falo?",
+    "Por questões de segurança, posso confirmar seu CPF? Sim, 123 456 789 00.",
+    "A placa é ABC 1D23, correto? Isso mesmo, ABC 1D23.",
+    "Seu sinistro foi aberto, o número do protocolo é 2024 5566.",
+    "O senhor receberá um link por WhatsApp para acompanhar o atendimento.",
+    "Posso ajudar em algo mais? Não, obrigado.",
+    "Ao final você receberá uma pesquisa de satisfação, a nota 5 é a máxima.",
+    "Agradeço o contato, tenha um ótimo dia.",
+)
+
+
+# Transcrição sintética com n frases (ligações maiores têm mais frases)
+def synthetic_transcript(n_sentences, rng):
+    return " ".join(rng.choice(FRASES) for _ in range(n_sentences))
+
+
+# Análise sintética no formato pedido pelo prompt, com respostas sorteadas
+def synthetic_analysis(rng, yes_rate=0.8, eliminatory_rate=0.05):
+    return {
+        "status_final": {"satisfacao": "satisfeito", "desfecho": "resolvido", "risco": "baixo"},
+        "checklist": [
+            {"item": c["item"], "resposta": "sim" if rng.random() < yes_rate else "não",
+             "justificativa": "Trecho da ligação que comprova a avaliação deste item."}
+            for c in CHECKLIST
+        ],
+        "criterios_eliminatorios": [
+            {"id": c["id"], "ocorreu": rng.random() < eliminatory_rate, "justificativa": "Não ocorreu na ligação."}
+            for c in CRITERIOS_ELIMINATORIOS
+        ],
+        "uso_script": {"status": "completo", "justificativa": "Todos os elementos do script foram ditos."},
+        "resumo_geral": "Atendimento cordial, dados confirmados e próximos passos explicados ao cliente.",
+    }
+
+
+class StubOpenAI:
+    def __init__(self, latency_ms=800, transcription_ms=1500, jitter_ms=200, error_rate=0.0, rate_limit_rate=0.0,
+                 truncate_rate=0.0, chunk_chars=24, chunk_ms=5, seed=0):
+        self.latency_ms = latency_ms
+        self.transcription_ms = transcription_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.truncate_rate = truncate_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_ms = chunk_ms
+        self.stats = {"transcricoes": 0, "chats": 0, "erros": 0, "limites": 0, "truncadas": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, fn):
+        with self._lock:
+            return fn(self._rng)
+
+    def _count(self, field):
+        with self._lock:
+            self.stats[field] += 1
+
+    def _sleep(self, base_ms):
+        jitter = self._draw(lambda rng: rng.uniform(-self.jitter_ms, self.jitter_ms))
+        time.sleep(max(0.0, base_ms + jitter) / 1000)
+
+    # Sorteia uma falha: (status, cabeçalhos) ou None
+    def _failure(self):
+        roll = self._draw(lambda rng: rng.random())
+        if roll < self.rate_limit_rate:
+            self._count("limites")
+            return 429, {"Retry-After": "1"}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count("erros")
+            return 500, {}
+        return None
+
+    def transcription(self, body):
+        self._count("transcricoes")
+        self._sleep(self.transcription_ms)
+        # A mesma gravação sempre gera a mesma transcrição
+        seed = int(hashlib.sha256(body).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        return {"text": synthetic_transcript(20 + len(body) // 20000, rng)}
+
+    def completion(self, request):
+        self._count("chats")
+        content = json.dumps(self._draw(synthetic_analysis), ensure_ascii=False)
+        if self._draw(lambda rng: rng.random()) < self.truncate_rate:
+            self._count("truncadas")
+            content = content[: self._draw(lambda rng: rng.randint(len(content) // 4, len(content) - 1))]
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+        return content, usage
+
+    def make_server(self, host="127.0.0.1", port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                failure = stub._failure()
+                if failure is not None:
+                    status, headers = failure
+                    stub._sleep(stub.latency_ms / 4)
+                    self._json(status, {"error": {"message": "stub: falha simulada", "type": "server_error"}}, headers)
+                    return
+                if self.path.endswith("/audio/transcriptions"):
+                    self._json(200, stub.transcription(body))
+                elif self.path.endswith("/chat/completions"):
+                    self._chat(json.loads(body or b"{}"))
+                else:
+                    self._json(404, {"error": {"message": f"stub: rota desconhecida {self.path}"}})
+
+            def _chat(self, request):
+                content, usage = stub.completion(request)
+                model = request.get("model", "stub")
+                stub._sleep(stub.latency_ms)
+                if not request.get("stream"):
+                    self._json(200, {
+                        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": usage,
+                    })
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model}
+                for i in range(0, len(content), stub.chunk_chars):
+                    delta = {"content": content[i:i + stub.chunk_chars]}
+                    self._event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                    if stub.chunk_ms:
+                        time.sleep(stub.chunk_ms / 1000)
+                self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    self._event({**base, "choices": [], "usage": usage})
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _event(self, payload):
+                self._chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da OpenAI para benchmarks")
+    parser.add_argument("--porta", type=int, default=8089, help="Porta HTTP (0 escolhe uma livre)")
+    parser.add_argument("--latencia-ms", type=float, default=800, help="Tempo até o primeiro byte do chat")
+    parser.add_argument("--transcricao-ms", type=float, default=1500, help="Tempo de resposta da transcrição")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="Variação uniforme (+/-) das latências")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 (com Retry-After)")
+    parser.add_argument("--taxa-truncada", type=float, default=0.0, help="Fração de análises com JSON cortado")
+    parser.add_argument("--pedaco-chars", type=int, default=24, help="Caracteres por pedaço no streaming")
+    parser.add_argument("--pedaco-ms", type=float, default=5, help="Intervalo entre pedaços no streaming")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stub = StubOpenAI(args.latencia_ms, args.transcricao_ms, args.jitter_ms, args.taxa_erro, args.taxa_429,
+                      args.taxa_truncada, args.pedaco_chars, args.pedaco_ms, args.semente)
+    server = stub.make_server(port=args.porta)
+    # A primeira linha informa a porta para quem iniciou o processo (bench_e2e.py)
+    print(f"http://127.0.0.1:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stub.stats), file=sys.stderr, flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# HeatGlass - pipeline de análise de ligações (transcrição + checklist)
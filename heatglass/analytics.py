@@ -0,0 +1,151 @@
+# Agregações do histórico de análises em arrays NumPy: taxa de "sim" por item do
+# checklist, distribuição da pontuação e critérios eliminatórios por semana.
+# Os totais são acumulados: cada lote novo (do SQLite ou de um JSONL do modo em
+# lote) é somado de forma vetorizada, sem recalcular o histórico inteiro.
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS, PONTUACAO_MAXIMA
+from .store import summarize
+
+N_ITENS = len(CHECKLIST)
+N_ELIMINATORIOS = len(CRITERIOS_ELIMINATORIOS)
+_BITS_ITENS = np.arange(N_ITENS, dtype=np.int64)
+_BITS_ELIMINATORIOS = np.arange(N_ELIMINATORIOS, dtype=np.int64)
+
+
+# Função para expandir uma máscara de bits (n,) em matriz booleana (n, bits)
+def unpack_mask(masks, bits):
+    return ((masks[:, None] >> bits) & 1).astype(bool)
+
+
+# Função para calcular a segunda-feira (em dias desde 1970-01-01) da semana de cada data
+def week_start(timestamps):
+    days = timestamps.astype("datetime64[D]").astype(np.int64)
+    return days - (days + 3) % 7  # 1970-01-01 foi uma quinta-feira
+
+
+class CallAnalytics:
+    def __init__(self):
+        self.total = 0
+        self.last_id = 0
+        self.item_sim = np.zeros(N_ITENS, dtype=np.int64)
+        self.score_counts = np.zeros(PONTUACAO_MAXIMA + 1, dtype=np.int64)
+        self.script_counts = {}
+        # Por semana: [ligações, ligações com violação, violações por critério...]
+        self.weeks = np.zeros(0, dtype=np.int64)
+        self.week_counts = np.zeros((0, 2 + N_ELIMINATORIOS), dtype=np.int64)
+        self._lock = threading.Lock()  # a mesma instância é compartilhada entre sessões do Streamlit
+
+    # Soma um lote já em colunas: datas (datetime64), pontuação, máscaras e status do script
+    def add_columns(self, timestamps, scores, checklist_masks, eliminatorio_masks, script_status):
+        n = len(scores)
+        if n == 0:
+            return
+        self.total += n
+
+        self.item_sim += unpack_mask(checklist_masks, _BITS_ITENS).sum(axis=0)
+
+        scores = np.clip(np.nan_to_num(scores.astype(np.float64)).astype(np.int64), 0, PONTUACAO_MAXIMA)
+        self.score_counts += np.bincount(scores, minlength=PONTUACAO_MAXIMA + 1)
+
+        for status, count in pd.Series(script_status, dtype=object).value_counts().items():
+            self.script_counts[str(status)] = self.script_counts.get(str(status), 0) + int(count)
+
+        violations = unpack_mask(eliminatorio_masks, _BITS_ELIMINATORIOS)
+        batch_weeks, inverse = np.unique(week_start(timestamps), return_inverse=True)
+        batch_counts = np.zeros((len(batch_weeks), 2 + N_ELIMINATORIOS), dtype=np.int64)
+        batch_counts[:, 0] = np.bincount(inverse, minlength=len(batch_weeks))
+        batch_counts[:, 1] = np.bincount(inverse, weights=violations.any(axis=1), minlength=len(batch_weeks))
+        np.add.at(batch_counts[:, 2:], inverse, violations.astype(np.int64))
+        self._merge_weeks(batch_weeks, batch_counts)
+
+    def _merge_weeks(self, weeks, counts):
+        all_weeks = np.union1d(self.weeks, weeks)
+        merged = np.zeros((len(all_weeks), counts.shape[1]), dtype=np.int64)
+        merged[np.searchsorted(all_weeks, self.weeks)] += self.week_counts
+        merged[np.searchsorted(all_weeks, weeks)] += counts
+        self.weeks, self.week_counts = all_weeks, merged
+
+    # Soma as linhas resumidas do SQLite (ResultStore.iter_summaries)
+    def add_rows(self, rows):
+        if not rows:
+            return
+        ids, dates, scores, checklist_masks, eliminatorio_masks, statuses = zip(*rows)
+        self.add_columns(
+            np.array([d[:19] for d in dates], dtype="datetime64[s]"),
+            np.array([s if s is not None else 0 for s in scores], dtype=np.int64),
+            np.array(checklist_masks, dtype=np.int64),
+            np.array(eliminatorio_masks, dtype=np.int64),
+            [s or "sem status" for s in statuses],
+        )
+        self.last_id = max(self.last_id, max(ids))
+
+    # Atualiza com as análises gravadas no SQLite desde a última chamada
+    def refresh(self, store, chunk_size=20000):
+        added = 0
+        with self._lock:
+            for rows in store.iter_summaries(self.last_id, chunk_size):
+                self.add_rows(rows)
+                added += len(rows)
+        return added
+
+    # Soma análises completas (ex.: linhas do JSONL do modo em lote)
+    def add_records(self, records):
+        rows = []
+        for record in records:
+            if "erro" in record or "checklist" not in record:
+                continue
+            summary = summarize(record)
+            rows.append((
+                0, record.get("analisado_em") or "1970-01-01T00:00:00", summary["pontuacao_total"],
+                summary["checklist_mask"], summary["eliminatorios_mask"], summary["uso_script_status"],
+            ))
+        self.add_rows(rows)
+        return len(rows)
+
+    def load_jsonl(self, lines):
+        return self.add_records(json.loads(line) for line in lines if line.strip())
+
+    # Taxa de "sim" por item do checklist, do item mais reprovado para o menos
+    def pass_rates(self):
+        rates = self.item_sim / self.total if self.total else np.zeros(N_ITENS)
+        frame = pd.DataFrame({
+            "item": [c["item"] for c in CHECKLIST],
+            "criterio": [c["criterio"] for c in CHECKLIST],
+            "pontos": [c["pontos"] for c in CHECKLIST],
+            "taxa_sim": rates,
+            "reprovacoes": self.total - self.item_sim,
+        })
+        return frame.sort_values("taxa_sim").reset_index(drop=True)
+
+    # Resumo da distribuição da pontuação a partir do histograma acumulado
+    def score_summary(self):
+        if not self.total:
+            return {"ligacoes": 0, "media": None, "p10": None, "p50": None, "p90": None}
+        points = np.arange(PONTUACAO_MAXIMA + 1)
+        cumulative = np.cumsum(self.score_counts)
+        percentile = lambda q: int(np.searchsorted(cumulative, q * self.total))  # noqa: E731
+        return {
+            "ligacoes": self.total,
+            "media": float((points * self.score_counts).sum() / self.total),
+            "p10": percentile(0.10),
+            "p50": percentile(0.50),
+            "p90": percentile(0.90),
+        }
+
+    def score_histogram(self):
+        return pd.DataFrame({"pontuacao": np.arange(PONTUACAO_MAXIMA + 1), "ligacoes": self.score_counts})
+
+    # Ligações e violações de critérios eliminatórios por semana
+    def weekly_eliminatory(self):
+        frame = pd.DataFrame(
+            self.week_counts,
+            columns=["ligacoes", "com_violacao"] + [f"criterio_{c['id']}" for c in CRITERIOS_ELIMINATORIOS],
+        )
+        frame.insert(0, "semana", self.weeks.astype("datetime64[D]"))
+        frame["taxa_violacao"] = frame["com_violacao"] / frame["ligacoes"].where(frame["ligacoes"] > 0)
+        return frame
@@ -0,0 +1,152 @@
+# Manipulação dos arquivos de áudio: cópia do upload para disco em blocos,
+# divisão de gravações longas em segmentos sobrepostos (via ffmpeg, sem
+# decodificar para a memória) e junção das transcrições dos segmentos.
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import unicodedata
+
+BLOCO = 1024 * 1024  # 1 MB
+WHISPER_LIMITE_BYTES = 25 * 1024 * 1024  # limite de upload do whisper-1
+SEGMENTAR_ACIMA_S = 10 * 60  # acima disso a gravação é transcrita em paralelo
+SEGMENTO_S = 5 * 60
+SOBREPOSICAO_S = 8
+MIN_PALAVRAS_EMENDA = 3  # palavras repetidas necessárias para reconhecer a emenda
+JANELA_EMENDA = 80  # palavras examinadas de cada lado da emenda
+
+
+# Função para calcular o SHA-256 de um arquivo aberto sem carregá-lo inteiro
+def stream_sha256(fileobj, chunk_size=BLOCO):
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+# Copia o upload para um arquivo temporário em blocos; o arquivo é sempre apagado ao sair
+@contextlib.contextmanager
+def spool_upload(fileobj, suffix=".mp3", chunk_size=BLOCO):
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            fileobj.seek(0)
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+        fileobj.seek(0)
+        yield path, digest.hexdigest()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def has_ffmpeg():
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+# Função para obter a duração do áudio em segundos (None se o ffprobe não estiver disponível)
+def probe_duration(path):
+    if not has_ffmpeg():
+        return None
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+        capture_output=True, check=True, text=True,
+    ).stdout
+    return float(json.loads(out)["format"]["duration"])
+
+
+# Função para decidir se a gravação deve ser dividida antes da transcrição
+def needs_segmentation(path, duration=None):
+    if duration is None:
+        duration = probe_duration(path)
+    if os.path.getsize(path) > WHISPER_LIMITE_BYTES:
+        if duration is None:
+            raise RuntimeError(
+                "Áudio maior que o limite do Whisper (25 MB) e ffmpeg não está instalado para dividi-lo."
+            )
+        return True
+    return duration is not None and duration > SEGMENTAR_ACIMA_S
+
+
+# Função para calcular os intervalos (início, duração) dos segmentos sobrepostos.
+# O último segmento já inclui a sobreposição: o que sobra depois dela não vira um
+# segmento à parte (um corte de frações de segundo é recusado pelo whisper-1)
+def segment_bounds(duration, segment_s=SEGMENTO_S, overlap_s=SOBREPOSICAO_S):
+    bounds = []
+    start = 0.0
+    while start < duration:
+        length = min(segment_s + overlap_s, duration - start)
+        bounds.append((start, length))
+        if start + length >= duration:
+            break
+        start += segment_s
+    return bounds
+
+
+# Função para cortar a gravação em segmentos mp3 dentro de `directory` (cópia de stream, sem recodificar)
+def split_segments(path, directory, duration=None, segment_s=SEGMENTO_S, overlap_s=SOBREPOSICAO_S):
+    if duration is None:
+        duration = probe_duration(path)
+    paths = []
+    for i, (start, length) in enumerate(segment_bounds(duration, segment_s, overlap_s)):
+        out = os.path.join(directory, f"segmento_{i:03d}.mp3")
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{length:.3f}",
+             "-i", path, "-c", "copy", out],
+            check=True, capture_output=True,
+        )
+        paths.append(out)
+    return paths
+
+
+def _normalize_word(word):
+    word = unicodedata.normalize("NFKD", word.lower())
+    word = "".join(c for c in word if not unicodedata.combining(c))
+    return re.sub(r"[^\w]", "", word)
+
+
+# Função para encontrar a maior sequência de palavras comum entre o fim de `a` e o início de `b`
+def _longest_common_run(a, b):
+    best = (0, 0, 0)  # (tamanho, fim em a, fim em b)
+    prev = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        cur = [0] * (len(b) + 1)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] and a[i - 1] == b[j - 1]:
+                cur[j] = prev[j - 1] + 1
+                if cur[j] > best[0]:
+                    best = (cur[j], i, j)
+        prev = cur
+    return best
+
+
+# Função para juntar as transcrições dos segmentos removendo o trecho repetido nas emendas
+def merge_transcripts(texts):
+    words = []
+    for text in texts:
+        new_words = text.split()
+        if not words:
+            words = new_words
+            continue
+        tail = words[-JANELA_EMENDA:]
+        head = new_words[:JANELA_EMENDA]
+        size, end_a, end_b = _longest_common_run(
+            [_normalize_word(w) for w in tail], [_normalize_word(w) for w in head]
+        )
+        if size >= MIN_PALAVRAS_EMENDA:
+            # Mantém o texto anterior até o fim da sobreposição e continua logo depois dela
+            cut = len(words) - len(tail) + end_a
+            words = words[:cut] + new_words[end_b:]
+        else:
+            words = words + new_words
+    return " ".join(words)
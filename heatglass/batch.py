@@ -0,0 +1,164 @@
+# Execução em lote (sem Streamlit):
+#   python -m heatglass.batch <pasta|manifesto.txt> -o resultados.jsonl -c 4
+#
+# Cada arquivo passa por transcrição (whisper-1) e análise do checklist em uma
+# thread própria; com -c N existem no máximo N requisições à API em andamento,
+# então a transcrição dos próximos arquivos acontece enquanto os anteriores
+# ainda estão na etapa de análise. Gravações longas são divididas em segmentos,
+# transcritos em sequência dentro da thread do arquivo para respeitar o limite,
+# e os trechos de uma ligação longa (mapreduce.py) também são avaliados em sequência.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from .cache import DIRETORIO_PADRAO as DIRETORIO_CACHE, DiskCache
+from .core import analyze
+from .metrics import REGISTRY, Trace, configure_log, serve_metrics
+from .prompt import MODELO_PADRAO
+from .scheduler import SCHEDULER, shared_client
+from .store import DB_PADRAO, ResultStore
+from .tiers import MODELO_ESCALONADO, STATS as ESCALONAMENTO
+
+CONCORRENCIA_PADRAO = 4
+
+
+# Função para listar os mp3 de uma pasta ou de um manifesto (um caminho por linha)
+def collect_audio_files(source):
+    if os.path.isdir(source):
+        files = []
+        for root, _, names in os.walk(source):
+            for name in names:
+                if name.lower().endswith(".mp3"):
+                    files.append(os.path.join(root, name))
+        return sorted(files)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    files = []
+    with open(source, encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            files.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return files
+
+
+# Função para processar uma ligação: transcrição seguida da análise
+def process_file(client, path, model, cache=None):
+    record = {"arquivo": path, "modelo": model}
+    trace = Trace("lote")
+    trace.set(arquivo=path)
+    start = time.perf_counter()
+    try:
+        result = analyze(path, client, model, cache, trace=trace, max_workers=1)
+        record.update(audio_sha256=result["audio_sha256"], transcricao=result["transcricao"])
+        record.update(result["analise"])
+    except Exception as e:
+        record["erro"] = str(e)  # o analyze já registrou o erro no trace e o fechou
+    record["duracao_s"] = round(time.perf_counter() - start, 3)
+    record["analisado_em"] = datetime.now().isoformat(timespec="seconds")
+    record["metricas"] = trace.to_dict()
+    return record
+
+
+# Função para gravar o resultado de uma ligação no histórico (SQLite)
+def save_record(store, record):
+    analysis = {k: v for k, v in record.items()
+                if k not in ("arquivo", "modelo", "transcricao", "audio_sha256", "duracao_s", "analisado_em", "metricas")}
+    timings = {"total_s": record["duracao_s"]}
+    for span in record.get("metricas", {}).get("etapas", []):
+        timings[f"{span['etapa']}_s"] = span["duracao_s"]
+    store.add(
+        analysis, record.get("transcricao"), record["modelo"], record.get("audio_sha256"), record["arquivo"],
+        timings=timings, analyzed_at=record["analisado_em"],
+    )
+
+
+# Função para executar o lote - grava um objeto JSON por ligação assim que ela termina
+def run_batch(client, files, output, model=MODELO_PADRAO, concurrency=CONCORRENCIA_PADRAO, cache=None, store=None):
+    errors = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(process_file, client, path, model, cache) for path in files]
+        for future in as_completed(futures):
+            record = future.result()
+            if "erro" in record:
+                errors += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            if store is not None and "erro" not in record:
+                save_record(store, record)
+    if store is not None:
+        store.flush()
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HeatGlass - análise de ligações em lote")
+    parser.add_argument("origem", help="Pasta com arquivos .mp3 ou manifesto com um caminho por linha")
+    parser.add_argument("-o", "--saida", default="-", help="Arquivo JSONL de saída (padrão: stdout)")
+    parser.add_argument("-c", "--concorrencia", type=int, default=CONCORRENCIA_PADRAO,
+                        help="Máximo de requisições simultâneas à API")
+    parser.add_argument("-m", "--modelo", default=MODELO_PADRAO,
+                        help="Modelo usado na análise (\"rápido+completo\" para a avaliação escalonada)")
+    parser.add_argument("--escalonado", action="store_true",
+                        help=f"Avaliação escalonada com {MODELO_ESCALONADO}: o modelo completo só reavalia as "
+                             "ligações duvidosas")
+    parser.add_argument("--cache", nargs="?", const=DIRETORIO_CACHE, default=None,
+                        help="Reaproveita transcrições e análises já feitas (diretório opcional)")
+    parser.add_argument("--db", nargs="?", const=DB_PADRAO, default=None,
+                        help="Grava os resultados também no histórico SQLite (caminho opcional)")
+    parser.add_argument("--metricas", default=None,
+                        help="Arquivo .prom com as métricas no formato do Prometheus (gravado a cada ligação)")
+    parser.add_argument("--metricas-porta", type=int, default=None,
+                        help="Expõe as métricas em http://0.0.0.0:PORTA/metrics durante o lote")
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    files = collect_audio_files(args.origem)
+    if not files:
+        print(f"Nenhum arquivo .mp3 encontrado em {args.origem}", file=sys.stderr)
+        return 1
+
+    client = shared_client(os.environ.get("OPENAI_API_KEY"))
+    configure_log()
+    if args.metricas:
+        REGISTRY.path = args.metricas
+    if args.metricas_porta:
+        serve_metrics(args.metricas_porta)
+    cache = DiskCache(args.cache) if args.cache else None
+    store = ResultStore(args.db) if args.db else None
+    model = MODELO_ESCALONADO if args.escalonado else args.modelo
+    start = time.perf_counter()
+    if args.saida == "-":
+        errors = run_batch(client, files, sys.stdout, model, args.concorrencia, cache, store)
+    else:
+        with open(args.saida, "a", encoding="utf-8") as output:
+            errors = run_batch(client, files, output, model, args.concorrencia, cache, store)
+    elapsed = time.perf_counter() - start
+    if store is not None:
+        store.close()
+    if cache is not None:
+        print(f"Cache: {json.dumps(cache.stats)}", file=sys.stderr)
+    print(f"Agendador: {json.dumps(SCHEDULER.stats)}", file=sys.stderr)
+    if ESCALONAMENTO.stats["avaliacoes"]:
+        print(f"Escalonamento: {json.dumps(ESCALONAMENTO.summary())}", file=sys.stderr)
+    metrics_path = REGISTRY.write_file()
+    for stage, quantiles in REGISTRY.percentiles().items():
+        print(f"{stage}: " + ", ".join(f"p{int(q * 100)}={v:.2f}s" for q, v in quantiles.items()), file=sys.stderr)
+    print(f"Métricas em {metrics_path}", file=sys.stderr)
+
+    print(f"{len(files)} ligações em {elapsed:.1f}s ({len(files) / elapsed * 60:.1f}/min), {errors} com erro",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# Cache em disco endereçado por conteúdo, em dois níveis:
+#   transcricoes - chave = SHA-256 dos bytes do áudio
+#   analises     - chave = SHA-256 da transcrição + versão do prompt + modelo + temperatura
+#                  (+ medições do áudio que entram no prompt)
+# Cada entrada é um arquivo JSON; o mtime é atualizado a cada acerto e serve de
+# relógio para a remoção LRU quando o cache passa do tamanho ou da idade máxima.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .mapreduce import TRECHOS_SIMULTANEOS
+from .pipeline import request_analysis, stream_analysis, transcribe_audio
+from .parsing import parse_analysis
+from .prescreen import VERSAO_PRE_TRIAGEM, audio_facts
+from .prompt import MODELO_PADRAO, PROMPT_VERSION, TEMPERATURA
+
+DIRETORIO_PADRAO = os.environ.get(
+    "HEATGLASS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "heatglass")
+)
+TAMANHO_MAXIMO = 512 * 1024 * 1024  # 512 MB
+IDADE_MAXIMA = 90 * 24 * 3600  # 90 dias
+EVICT_A_CADA = 50  # gravações entre duas varreduras de remoção
+
+TRANSCRICOES = "transcricoes"
+ANALISES = "analises"
+# Versão do prompt e da pré-triagem: uma análise só vale para a mesma combinação
+VERSAO_ANALISE = f"{PROMPT_VERSION}-{VERSAO_PRE_TRIAGEM}"
+
+
+class DiskCache:
+    def __init__(self, directory=DIRETORIO_PADRAO, max_bytes=TAMANHO_MAXIMO, max_age=IDADE_MAXIMA):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = {TRANSCRICOES: {"hits": 0, "misses": 0}, ANALISES: {"hits": 0, "misses": 0}}
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.evict()
+
+    def _path(self, namespace, key):
+        return os.path.join(self.directory, namespace, key[:2], key + ".json")
+
+    def _count(self, namespace, field):
+        with self._lock:
+            self.stats.setdefault(namespace, {"hits": 0, "misses": 0})[field] += 1
+
+    def get(self, namespace, key):
+        path = self._path(namespace, key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self._count(namespace, "misses")
+            return None
+        if time.time() - os.path.getmtime(path) > self.max_age:
+            self._count(namespace, "misses")
+            return None
+        try:
+            os.utime(path)  # marca como usado recentemente
+        except OSError:
+            pass
+        self._count(namespace, "hits")
+        return value
+
+    def set(self, namespace, key, value):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Grava em arquivo temporário e renomeia para nunca deixar uma entrada pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_A_CADA == 0
+        if should_evict:
+            self.evict()
+
+    # Remove entradas expiradas e, se ainda passar do limite, as menos usadas recentemente
+    def evict(self):
+        now = time.time()
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age:
+                    _remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            _remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Função para calcular o SHA-256 de um arquivo lendo em blocos
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Função para montar a chave de uma análise
+def analysis_key(transcript_text, model=MODELO_PADRAO, temperature=TEMPERATURA,
+                 prompt_version=VERSAO_ANALISE, audio=None):
+    transcript_hash = hashlib.sha256(transcript_text.encode("utf-8")).hexdigest()
+    key = f"{transcript_hash}|{prompt_version}|{model}|{temperature}"
+    facts = audio_facts(audio)
+    if facts:
+        key += "|" + "|".join(facts)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# Função para transcrever usando o cache - retorna (transcrição, hash do áudio)
+def transcribe_cached(cache, client, path, audio_hash=None, max_workers=4, trace=None):
+    audio_hash = audio_hash or file_sha256(path)
+    entry = cache.get(TRANSCRICOES, audio_hash)
+    if trace is not None:
+        trace.set(cache_transcricao=entry is not None)
+    if entry is not None:
+        if trace is not None and entry.get("audio") is not None:
+            trace.set(audio=entry["audio"])
+        return entry["text"], audio_hash
+    transcript_text = transcribe_audio(client, path, max_workers, trace)
+    value = {"text": transcript_text, "criado_em": time.time()}
+    if trace is not None and trace.attrs.get("audio") is not None:
+        value["audio"] = trace.attrs["audio"]  # medições do áudio, reaproveitadas na análise
+    cache.set(TRANSCRICOES, audio_hash, value)
+    return transcript_text, audio_hash
+
+
+# Função para pedir a avaliação usando o cache - retorna a resposta bruta do modelo.
+# Só respostas que viram JSON válido entram no cache, para não fixar uma falha.
+# Com on_event a chamada é feita em streaming (ver pipeline.stream_analysis).
+def request_analysis_cached(cache, client, transcript_text, model=MODELO_PADRAO, on_event=None, trace=None,
+                            audio=None, max_workers=TRECHOS_SIMULTANEOS):
+    key = analysis_key(transcript_text, model, audio=audio)
+    entry = cache.get(ANALISES, key)
+    if trace is not None:
+        trace.set(cache_analise=entry is not None)
+    if entry is not None:
+        return entry["raw"]
+    if on_event is not None:
+        result = stream_analysis(client, transcript_text, on_event, model, trace, audio, max_workers)
+    else:
+        result = request_analysis(client, transcript_text, model, trace, audio, max_workers)
+    try:
+        if parse_analysis(result).get("json_reparado"):
+            return result  # resposta truncada e reparada: vale tentar de novo na próxima vez
+    except ValueError:
+        return result
+    cache.set(ANALISES, key, {"raw": result, "modelo": model, "criado_em": time.time()})
+    return result
+
+
+# Função para avaliar usando o cache - retorna (análise, resposta bruta)
+def analyze_cached(cache, client, transcript_text, model=MODELO_PADRAO, trace=None):
+    result = request_analysis_cached(cache, client, transcript_text, model, trace=trace)
+    return parse_analysis(result), result
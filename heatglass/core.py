@@ -0,0 +1,128 @@
+# API do pipeline sem Streamlit, para workers, handlers serverless e testes:
+#
+#   from heatglass.core import analyze
+#   resultado = analyze("ligacao.mp3")
+#   resultado["analise"]["pontuacao_total"]
+#
+# Nada pesado é importado aqui: o cliente da OpenAI só é criado na primeira
+# chamada que precisa dele e o FPDF só quando um relatório é gerado.
+import contextlib
+import io
+import os
+import sys
+from datetime import datetime
+
+from .audio import spool_upload
+from .cache import file_sha256, request_analysis_cached, transcribe_cached
+from .metrics import Trace
+from .parsing import parse_analysis
+from .pipeline import request_analysis, stream_analysis, transcribe_audio
+from .prompt import MODELO_PADRAO
+
+
+# Cliente compartilhado do processo, com a chave de OPENAI_API_KEY
+def default_client():
+    from .scheduler import shared_client
+
+    return shared_client(os.environ.get("OPENAI_API_KEY"))
+
+
+# Aceita caminho, bytes ou arquivo aberto (ex.: upload do Streamlit) e entrega
+# (caminho no disco, SHA-256); cópias temporárias são apagadas na saída
+@contextlib.contextmanager
+def open_audio(audio, suffix=".mp3"):
+    if isinstance(audio, (str, os.PathLike)):
+        yield os.fspath(audio), file_sha256(audio)
+        return
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = io.BytesIO(audio)
+    with spool_upload(audio, suffix) as (path, audio_hash):
+        yield path, audio_hash
+
+
+# Função para transcrever uma gravação - retorna (transcrição, hash do áudio).
+# As medições do áudio (primeira fala, silêncio removido) ficam em trace.attrs["audio"]
+def transcribe(audio, client=None, cache=None, trace=None, max_workers=4, audio_hash=None):
+    client = client or default_client()
+    trace = trace or Trace()
+    with contextlib.ExitStack() as stack:
+        with trace.span("upload"):
+            path, sha = stack.enter_context(open_audio(audio))
+        audio_hash = audio_hash or sha
+        with trace.span("transcricao"):
+            if cache is not None:
+                return transcribe_cached(cache, client, path, audio_hash, max_workers, trace)
+            return transcribe_audio(client, path, max_workers, trace), audio_hash
+
+
+# Função para avaliar uma transcrição com o checklist - retorna a resposta bruta.
+# Com on_event(campo, valor) a resposta chega em streaming; audio são as medições
+# feitas na transcrição (trace.attrs["audio"]), usadas no item 1; max_workers limita
+# os trechos avaliados ao mesmo tempo numa ligação longa
+def evaluate(transcript_text, client=None, model=MODELO_PADRAO, cache=None, on_event=None, trace=None, audio=None,
+             max_workers=4):
+    client = client or default_client()
+    trace = trace or Trace()
+    with trace.span("analise"):
+        if cache is not None:
+            return request_analysis_cached(cache, client, transcript_text, model, on_event, trace, audio, max_workers)
+        if on_event is not None:
+            return stream_analysis(client, transcript_text, on_event, model, trace, audio, max_workers)
+        return request_analysis(client, transcript_text, model, trace, audio, max_workers)
+
+
+# Função para analisar uma ligação do áudio ao resultado pontuado. Devolve um
+# dicionário com a análise, a transcrição, a resposta bruta e as métricas;
+# lança ValueError se a resposta do modelo não tiver o formato esperado. O trace é
+# sempre fechado aqui, com o erro (campo "erro") quando a análise falha
+def analyze(audio, client=None, model=MODELO_PADRAO, cache=None, on_event=None, trace=None, max_workers=4,
+            name=None):
+    trace = trace or Trace("core")
+    client = client or default_client()
+    try:
+        transcript_text, audio_hash = transcribe(audio, client, cache, trace, max_workers)
+        result = evaluate(transcript_text, client, model, cache, on_event, trace, trace.attrs.get("audio"),
+                          max_workers)
+        with trace.span("parse_json"):
+            analysis = parse_analysis(result)
+    except Exception as e:
+        trace.set(erro=str(e))
+        raise
+    finally:
+        trace.set(modelo=model)
+        trace.finish()
+    if name is None and isinstance(audio, (str, os.PathLike)):
+        name = os.fspath(audio)
+    return {
+        "arquivo": name,
+        "modelo": model,
+        "audio_sha256": audio_hash,
+        "transcricao": transcript_text,
+        "resposta": result,
+        "analise": analysis,
+        "analisado_em": datetime.now().isoformat(timespec="seconds"),
+        "metricas": trace.to_dict(),
+    }
+
+
+# Uso avulso: python -m heatglass.core ligacao.mp3 (imprime a análise em JSON)
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="HeatGlass - análise de uma ligação")
+    parser.add_argument("audio", help="Arquivo de áudio da ligação")
+    parser.add_argument("-m", "--modelo", default=MODELO_PADRAO, help="Modelo usado na análise")
+    args = parser.parse_args(argv)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    result = analyze(args.audio, model=args.modelo)
+    print(json.dumps(result["analise"], ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# Fila persistente de análises em segundo plano. Cada envio vira um trabalho no
+# SQLite (tabela trabalhos, no mesmo banco do histórico) com uma cópia do áudio
+# em disco; um pool fixo de workers processa a fila em ordem de chegada. A
+# interface só consulta o status, então um rerun ou uma reconexão do navegador
+# não perdem a análise, e a concorrência do servidor fica limitada ao número de
+# workers. Trabalhos interrompidos por um reinício do processo voltam para a fila.
+# Um áudio reenviado reaproveita o trabalho anterior só se ele ainda estiver em
+# andamento ou tiver terminado com resposta válida e sem reparo, com o mesmo
+# modelo e a mesma versão do prompt e da pré-triagem (VERSAO_ANALISE).
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from .cache import VERSAO_ANALISE
+from .core import evaluate, open_audio, transcribe
+from .metrics import Trace
+from .parsing import parse_analysis
+from .prompt import MODELO_PADRAO
+from .store import DB_PADRAO
+
+WORKERS_PADRAO = int(os.environ.get("HEATGLASS_WORKERS", "2"))
+ESPERA_OCIOSA_S = 5.0  # workers sem trabalho conferem a fila pelo menos a cada intervalo
+
+NA_FILA = "na fila"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluído"
+ERRO = "erro"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id TEXT PRIMARY KEY,
+    criado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    status TEXT NOT NULL,
+    etapa TEXT,
+    arquivo TEXT,
+    audio_sha256 TEXT,
+    modelo TEXT,
+    audio_path TEXT,
+    transcricao TEXT,
+    resposta TEXT,
+    erro TEXT,
+    metricas TEXT,
+    versao TEXT,
+    resposta_valida INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_trabalhos_status ON trabalhos (status, criado_em);
+CREATE INDEX IF NOT EXISTS idx_trabalhos_audio ON trabalhos (audio_sha256, modelo);
+"""
+
+# Colunas leves usadas na consulta de status (sem transcrição e resposta)
+COLUNAS_STATUS = ("id", "criado_em", "atualizado_em", "status", "etapa", "arquivo", "audio_sha256", "modelo", "erro")
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    def __init__(self, client=None, cache=None, store=None, path=DB_PADRAO, workers=WORKERS_PADRAO,
+                 audio_dir=None):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.client = client
+        self.cache = cache
+        self.store = store
+        self.audio_dir = audio_dir or os.path.join(os.path.dirname(os.path.abspath(path)), "fila")
+        os.makedirs(self.audio_dir, exist_ok=True)
+        self.progress = {}  # id -> eventos (campo, valor) da análise em streaming (só em memória)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._stopping = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            self._conn.execute(
+                "UPDATE trabalhos SET status = ?, etapa = NULL WHERE status = ?", (NA_FILA, PROCESSANDO)
+            )
+        self._threads = [
+            threading.Thread(target=self._run, name=f"heatglass-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # Bancos criados antes das colunas versao e resposta_valida: os trabalhos
+    # antigos ficam sem versão e nunca são reaproveitados
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(trabalhos)")}
+        if not columns or "versao" in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE trabalhos ADD COLUMN versao TEXT")
+            self._conn.execute("ALTER TABLE trabalhos ADD COLUMN resposta_valida INTEGER NOT NULL DEFAULT 0")
+
+    # Enfileira uma ligação (caminho, bytes ou arquivo aberto) e devolve o id do
+    # trabalho. O mesmo áudio já enviado com o mesmo modelo reaproveita o trabalho
+    # existente se ele ainda estiver na fila ou tiver uma resposta válida (ver _find)
+    def submit(self, audio, name=None, model=MODELO_PADRAO, audio_hash=None):
+        if name is None and isinstance(audio, (str, os.PathLike)):
+            name = os.path.basename(os.fspath(audio))
+        job_id = uuid.uuid4().hex
+        with open_audio(audio) as (path, sha):
+            audio_hash = audio_hash or sha
+            existing = self._find(audio_hash, model)
+            if existing is not None:
+                return existing
+            audio_path = os.path.join(self.audio_dir, f"{job_id}.mp3")
+            shutil.copyfile(path, audio_path)
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO trabalhos (id, criado_em, atualizado_em, status, arquivo, audio_sha256, modelo, "
+                "audio_path, versao) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, now, now, NA_FILA, name, audio_hash, model, audio_path, VERSAO_ANALISE),
+            )
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    # Trabalho reaproveitável para o áudio: em andamento, ou concluído com uma
+    # resposta lida sem reparo, do mesmo modelo e da versão atual da análise
+    def _find(self, audio_hash, model):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM trabalhos WHERE audio_sha256 = ? AND modelo = ? AND versao = ? "
+                "AND (status IN (?, ?) OR (status = ? AND resposta_valida = 1)) "
+                "ORDER BY criado_em DESC LIMIT 1",
+                (audio_hash, model, VERSAO_ANALISE, NA_FILA, PROCESSANDO, CONCLUIDO),
+            ).fetchone()
+        return row["id"] if row else None
+
+    # Status dos trabalhos pedidos: {id: {status, etapa, arquivo, ...}}; durante a
+    # análise, também os eventos já recebidos do modelo e o número de itens
+    def status(self, job_ids):
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUNAS_STATUS)} FROM trabalhos WHERE id IN ({', '.join('?' * len(job_ids))})",
+                job_ids,
+            ).fetchall()
+        found = {row["id"]: dict(row) for row in rows}
+        for job_id, job in found.items():
+            events = self.progress.get(job_id)
+            if job["status"] == PROCESSANDO and events is not None:
+                job["eventos"] = list(events)
+                job["itens_recebidos"] = sum(1 for key, _ in job["eventos"] if key == "checklist")
+        return found
+
+    # Registro completo de um trabalho (transcrição, resposta bruta e métricas)
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM trabalhos WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["metricas"] = json.loads(job["metricas"] or "{}")
+        return job
+
+    # Quantidade de trabalhos por status
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM trabalhos GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def _update(self, job_id, **fields):
+        fields["atualizado_em"] = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE trabalhos SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    # Retira o próximo trabalho da fila, marcando-o como em processamento. O
+    # UPDATE condicional garante que dois processos nunca peguem o mesmo trabalho
+    def _claim(self):
+        while True:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT * FROM trabalhos WHERE status = ? ORDER BY criado_em, rowid LIMIT 1", (NA_FILA,)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self._conn.execute(
+                    "UPDATE trabalhos SET status = ?, etapa = ?, atualizado_em = ? WHERE id = ? AND status = ?",
+                    (PROCESSANDO, "transcrição", _now(), row["id"], NA_FILA),
+                ).rowcount
+            if claimed:
+                return dict(row)
+
+    def _run(self):
+        while not self._stopping:
+            job = self._claim()
+            if job is None:
+                with self._wake:
+                    if not self._stopping:
+                        self._wake.wait(ESPERA_OCIOSA_S)
+                continue
+            self._process(job)
+
+    # Transcrição e análise de um trabalho; o resultado fica no banco e, se a
+    # resposta for válida, também no histórico (ResultStore)
+    def _process(self, job):
+        job_id = job["id"]
+        trace = Trace("fila")
+        trace.set(arquivo=job["arquivo"], modelo=job["modelo"], audio_sha256=job["audio_sha256"])
+        try:
+            transcript_text, _ = transcribe(
+                job["audio_path"], self.client, self.cache, trace, audio_hash=job["audio_sha256"]
+            )
+            self._update(job_id, etapa="análise", transcricao=transcript_text)
+            events = self.progress[job_id] = []
+
+            # Guarda cada parte da análise para a exibição ao vivo; o tempo até o
+            # primeiro item do modelo (primeiro_item_s) é medido pelo pipeline
+            def on_event(key, value):
+                events.append((key, value))
+
+            result = evaluate(
+                transcript_text, self.client, job["modelo"], self.cache, on_event, trace, trace.attrs.get("audio")
+            )
+            try:
+                with trace.span("parse_json"):
+                    analysis = parse_analysis(result)
+            except ValueError as e:
+                analysis = None
+                trace.set(erro=str(e))  # a resposta fica salva; o erro aparece ao exibi-la
+            trace.finish()
+            if analysis is not None and self.store is not None:
+                self.store.add(
+                    analysis, transcript_text, job["modelo"], job["audio_sha256"], job["arquivo"],
+                    timings={
+                        **{f"{span['etapa']}_s": round(span["duracao_s"], 3) for span in trace.spans},
+                        **{k: trace.attrs[k] for k in ("primeiro_item_s", "prompt_tokens", "completion_tokens",
+                                                       "audio_s", "custo_usd") if k in trace.attrs},
+                    },
+                )
+            valid = analysis is not None and not analysis.get("json_reparado")
+            self._update(job_id, status=CONCLUIDO, etapa=None, resposta=result, resposta_valida=int(valid),
+                         metricas=json.dumps(trace.to_dict(), ensure_ascii=False))
+        except Exception as e:
+            trace.set(erro=str(e))
+            trace.finish()
+            self._update(job_id, status=ERRO, etapa=None, erro=str(e),
+                         metricas=json.dumps(trace.to_dict(), ensure_ascii=False))
+        finally:
+            self.progress.pop(job_id, None)
+            try:
+                os.remove(job["audio_path"])
+            except OSError:
+                pass
+
+    # Para os workers depois do trabalho em andamento; o que estiver na fila
+    # continua no banco e é retomado na próxima inicialização
+    def close(self, timeout=None):
+        self._stopping = True
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            self._conn.close()
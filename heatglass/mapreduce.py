@@ -0,0 +1,177 @@
+# Avaliação de ligações longas em trechos (map-reduce): a transcrição é dividida
+# em janelas sobrepostas por contagem aproximada de tokens, cada janela é
+# avaliada em paralelo com a mesma rubrica (SYSTEM_PROMPT_TRECHO) e os resultados
+# são consolidados localmente no mesmo formato de uma avaliação única. Quantos
+# trechos vão à API ao mesmo tempo é decisão de quem chama (max_workers; o lote
+# usa 1 para manter o limite de -c) e o SCHEDULER ainda aplica os limites da
+# conta. Sem chamada extra para consolidar, a latência fica limitada pelo trecho
+# mais lento só enquanto houver até max_workers trechos; acima disso eles são
+# avaliados em ondas e a latência cresce com trechos / max_workers.
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .parsing import check_complete, extract_json, validate_analysis
+from .prompt import MODELO_PADRAO, TEMPERATURA, build_window_messages
+from .rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS, ITENS_LIGACAO_INTEIRA, _as_bool, _normalize, is_yes
+from .scheduler import SCHEDULER, estimate_tokens
+
+CARACTERES_POR_TOKEN = 4
+DIVIDIR_ACIMA_TOKENS = 8000  # ~40 min de conversa; abaixo disso a avaliação é única
+JANELA_TOKENS = 4000
+SOBREPOSICAO_TOKENS = 300
+TRECHOS_SIMULTANEOS = 4  # padrão para uma ligação avulsa (app, core.analyze)
+
+_FIM_DE_FRASE = re.compile(r"[.!?]\s")
+_NIVEIS_SCRIPT = {"nao utilizado": 0, "parcial": 1, "completo": 2}
+_NIVEIS_RISCO = {"baixo": 0, "medio": 1, "alto": 2}
+
+
+def count_tokens(text):
+    return len(text) // CARACTERES_POR_TOKEN
+
+
+def needs_windows(transcript_text, limit=DIVIDIR_ACIMA_TOKENS):
+    return count_tokens(transcript_text) > limit
+
+
+# Função para dividir a transcrição em janelas sobrepostas, cortando de preferência
+# no fim de uma frase e nunca no meio de uma palavra
+def split_windows(transcript_text, window_tokens=JANELA_TOKENS, overlap_tokens=SOBREPOSICAO_TOKENS):
+    size = window_tokens * CARACTERES_POR_TOKEN
+    overlap = overlap_tokens * CARACTERES_POR_TOKEN
+    text = transcript_text.strip()
+    windows = []
+    start = 0
+    while True:
+        end = start + size
+        if end >= len(text):
+            windows.append(text[start:])
+            return windows
+        sentence_ends = [m.end() for m in _FIM_DE_FRASE.finditer(text, start + size // 2, end)]
+        if sentence_ends:
+            end = sentence_ends[-1]
+        elif text.rfind(" ", start, end) > start:
+            end = text.rfind(" ", start, end)
+        windows.append(text[start:end].strip())
+        next_start = max(start + 1, end - overlap)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+
+# Resposta de um trecho; os itens em `skip` (decididos pela pré-triagem) podem faltar,
+# assim como o uso_script quando a pré-triagem já o decidiu (`script`), que é preenchido aqui
+def _parse_window(result, skip=(), script=None):
+    try:
+        partial = json.loads(result)
+    except ValueError:
+        partial = extract_json(result)
+    if script is not None and isinstance(partial, dict):
+        partial.setdefault("uso_script", script)
+    problems = validate_analysis(partial)
+    if problems:
+        raise ValueError("Trecho fora do formato esperado: " + "; ".join(problems))
+    check_complete(partial, skip, "Avaliação do trecho")
+    return partial
+
+
+def _by_number(entries, field):
+    found = {}
+    for position, entry in enumerate(entries or [], 1):
+        if isinstance(entry, dict):
+            try:
+                found[int(entry.get(field, position))] = entry
+            except (TypeError, ValueError):
+                found[position] = entry
+    return found
+
+
+def _join(parts, labels):
+    texts = [f"[Trecho {label}] {text}" for label, text in zip(labels, parts) if text]
+    return " ".join(texts)
+
+
+# Função para consolidar as avaliações dos trechos (em ordem) numa análise única
+def merge_windows(partials):
+    total = len(partials)
+    checklist = []
+    for item in CHECKLIST:
+        entries = [_by_number(p.get("checklist"), "item").get(item["item"], {}) for p in partials]
+        answers = [_normalize(e.get("resposta", "")).rstrip(".!") for e in entries]
+        yes = [i for i, a in enumerate(answers) if is_yes(a)]
+        no = [i for i, a in enumerate(answers) if a in ("nao", "n", "no", "false")]
+        if item["item"] in ITENS_LIGACAO_INTEIRA:
+            passed = bool(yes) and not no
+        else:
+            passed = bool(yes)
+        evidence = (yes if passed else no) or range(total)
+        checklist.append({
+            "item": item["item"],
+            "resposta": "sim" if passed else "não",
+            "justificativa": _join([entries[i].get("justificativa", "") for i in evidence], [i + 1 for i in evidence]),
+        })
+
+    criterios = []
+    for criterio in CRITERIOS_ELIMINATORIOS:
+        entries = [_by_number(p.get("criterios_eliminatorios"), "id").get(criterio["id"], {}) for p in partials]
+        hits = [i for i, e in enumerate(entries) if _as_bool(e.get("ocorreu", False))]
+        criterios.append({
+            "id": criterio["id"],
+            "ocorreu": bool(hits),
+            "justificativa": _join([entries[i].get("justificativa", "") for i in hits], [i + 1 for i in hits]),
+        })
+
+    # Script de encerramento: vale o trecho em que ele aparece mais completo
+    scripts = [p.get("uso_script") or {} for p in partials]
+    best_script = max(
+        reversed(range(total)), key=lambda i: _NIVEIS_SCRIPT.get(_normalize(scripts[i].get("status", "")), -1)
+    )
+    # Status final: satisfação e desfecho do último trecho, o maior risco entre todos
+    status = dict(partials[-1].get("status_final") or {})
+    risks = [(p.get("status_final") or {}).get("risco") for p in partials]
+    known_risks = [r for r in risks if _normalize(r or "") in _NIVEIS_RISCO]
+    if known_risks:
+        status["risco"] = max(known_risks, key=lambda r: _NIVEIS_RISCO[_normalize(r)])
+
+    merged = {
+        "status_final": status,
+        "checklist": checklist,
+        "criterios_eliminatorios": criterios,
+        "uso_script": scripts[best_script],
+        "resumo_geral": _join([p.get("resumo_geral", "") for p in partials], range(1, total + 1)),
+        "trechos": total,
+    }
+    if any(p.get("json_reparado") for p in partials):
+        merged["json_reparado"] = True
+    return merged
+
+
+# Função para avaliar uma transcrição longa em trechos paralelos (até max_workers
+# por vez) - retorna a resposta consolidada como texto JSON (mesmo formato de
+# pipeline.request_analysis). facts são os fatos da pré-triagem (prescreen.facts_prompt),
+# enviados a todos os trechos; skip são os itens que eles mandam omitir e script o
+# uso_script já decidido (também omitido), se houver
+def request_analysis_windows(client, transcript_text, model=MODELO_PADRAO, trace=None,
+                             max_workers=TRECHOS_SIMULTANEOS, facts="", skip=(), script=None):
+    windows = split_windows(transcript_text)
+
+    def evaluate(position):
+        messages = build_window_messages(windows[position], position + 1, len(windows), facts)
+        reserved = estimate_tokens(messages)
+        response = SCHEDULER.call(model, lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=TEMPERATURA,
+            response_format={"type": "json_object"},
+        ), tokens=reserved)
+        usage = getattr(response, "usage", None)
+        SCHEDULER.settle(model, reserved, getattr(usage, "total_tokens", None))
+        return _parse_window(response.choices[0].message.content.strip(), skip, script), usage
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(evaluate, range(len(windows))))
+    if trace is not None:
+        trace.set(trechos=len(windows))
+        for _, usage in results:
+            trace.add_usage(model, usage)
+    return json.dumps(merge_windows([partial for partial, _ in results]), ensure_ascii=False)
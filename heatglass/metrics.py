@@ -0,0 +1,250 @@
+# Instrumentação do pipeline: tempo de cada etapa (upload, transcrição, análise,
+# parse do JSON, renderização, PDF), tokens, duração do áudio e custo estimado.
+# Cada ligação vira um Trace; ao terminar, ele é gravado como uma linha JSON no
+# log estruturado e somado ao registro do processo, exportado no formato texto
+# do Prometheus (arquivo e, opcionalmente, endpoint HTTP /metrics).
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+DIRETORIO_PADRAO = os.environ.get(
+    "HEATGLASS_METRICS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "heatglass", "metricas")
+)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+QUANTIS = (0.5, 0.95, 0.99)
+AMOSTRAS_POR_ETAPA = 2048  # janela usada no cálculo de p50/p95/p99
+
+# Preços em USD: chat por 1 mil tokens (entrada, saída); whisper por minuto de áudio
+PRECOS_CHAT = {
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+PRECO_WHISPER_MINUTO = 0.006
+
+logger = logging.getLogger("heatglass.metrics")
+
+
+# Função para estimar o custo de uma chamada de chat (vale o prefixo mais longo:
+# gpt-4o-mini não é cobrado como gpt-4o)
+def chat_cost(model, prompt_tokens, completion_tokens):
+    names = [name for name in PRECOS_CHAT if model.startswith(name)]
+    if not names:
+        return None
+    prices = PRECOS_CHAT[max(names, key=len)]
+    return prompt_tokens / 1000 * prices[0] + completion_tokens / 1000 * prices[1]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # etapa -> [contagens por bucket, soma, total, amostras recentes]
+        self._counters = {}  # (nome, rótulos) -> valor
+        self._gauges = {}  # (nome, rótulos) -> valor atual
+        self.path = os.path.join(DIRETORIO_PADRAO, "heatglass.prom")
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = [[0] * len(BUCKETS), 0.0, 0, deque(maxlen=AMOSTRAS_POR_ETAPA)]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+            hist[1] += seconds
+            hist[2] += 1
+            hist[3].append(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    # Mede um bloco fora de um Trace (ex.: geração de PDF sob demanda)
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    # p50/p95/p99 por etapa, sobre as amostras mais recentes
+    def percentiles(self):
+        with self._lock:
+            samples = {stage: sorted(hist[3]) for stage, hist in self._histograms.items()}
+        result = {}
+        for stage, values in samples.items():
+            if values:
+                result[stage] = {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTIS}
+        return result
+
+    # Texto no formato de exposição do Prometheus
+    def render_prometheus(self):
+        lines = [
+            "# HELP heatglass_etapa_segundos Duração de cada etapa do pipeline",
+            "# TYPE heatglass_etapa_segundos histogram",
+        ]
+        with self._lock:
+            histograms = {stage: (list(h[0]), h[1], h[2]) for stage, h in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        for stage, (buckets, total, count) in sorted(histograms.items()):
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f"heatglass_etapa_segundos_bucket{_labels(etapa=stage, le=bound)} {value}")
+            lines.append(f'heatglass_etapa_segundos_bucket{_labels(etapa=stage, le="+Inf")} {count}')
+            lines.append(f"heatglass_etapa_segundos_sum{_labels(etapa=stage)} {total:.6f}")
+            lines.append(f"heatglass_etapa_segundos_count{_labels(etapa=stage)} {count}")
+        lines += [
+            "# HELP heatglass_etapa_quantil_segundos p50/p95/p99 das amostras recentes de cada etapa",
+            "# TYPE heatglass_etapa_quantil_segundos summary",
+        ]
+        for stage, quantiles in sorted(self.percentiles().items()):
+            for q, value in quantiles.items():
+                lines.append(f"heatglass_etapa_quantil_segundos{_labels(etapa=stage, quantile=q)} {value:.6f}")
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in values}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(**dict(labels))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    # Grava o texto do Prometheus em arquivo (para o textfile collector do node_exporter)
+    def write_file(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Trace:
+    def __init__(self, name="analise"):
+        self.name = name
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.attrs = {}
+        self.finished = False
+        self.total_s = None
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.spans.append({"etapa": stage, "inicio_s": start - self._start, "duracao_s": duration})
+            REGISTRY.observe(stage, duration)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    # Registra o uso de tokens de uma resposta de chat (response.usage) e o custo estimado
+    def add_usage(self, model, usage):
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        self.attrs["prompt_tokens"] = self.attrs.get("prompt_tokens", 0) + prompt
+        self.attrs["completion_tokens"] = self.attrs.get("completion_tokens", 0) + completion
+        REGISTRY.inc("heatglass_tokens_total", prompt, modelo=model, tipo="prompt")
+        REGISTRY.inc("heatglass_tokens_total", completion, modelo=model, tipo="completion")
+        cost = chat_cost(model, prompt, completion)
+        if cost is not None:
+            self._add_cost(cost, model)
+
+    # Registra a duração do áudio enviado ao Whisper e o custo estimado
+    def add_audio(self, seconds):
+        if seconds is None:
+            return
+        self.attrs["audio_s"] = self.attrs.get("audio_s", 0) + seconds
+        REGISTRY.inc("heatglass_audio_segundos_total", seconds)
+        self._add_cost(seconds / 60 * PRECO_WHISPER_MINUTO, "whisper-1")
+
+    def _add_cost(self, cost, model):
+        self.attrs["custo_usd"] = round(self.attrs.get("custo_usd", 0) + cost, 6)
+        REGISTRY.inc("heatglass_custo_usd_total", cost, modelo=model)
+
+    def to_dict(self):
+        return {
+            "trace": self.name,
+            "inicio": self.started_at.isoformat(timespec="seconds"),
+            "total_s": round(self.total_s if self.finished else time.perf_counter() - self._start, 4),
+            "etapas": [{k: round(v, 4) if isinstance(v, float) else v for k, v in s.items()} for s in self.spans],
+            **self.attrs,
+        }
+
+    # Encerra a ligação: grava a linha no log estruturado e atualiza o arquivo de métricas
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.total_s = time.perf_counter() - self._start
+        REGISTRY.observe("total", self.total_s)
+        REGISTRY.inc("heatglass_ligacoes_total", 1, trace=self.name)
+        logger.info(json.dumps(self.to_dict(), ensure_ascii=False))
+        try:
+            REGISTRY.write_file()
+        except OSError:
+            pass
+
+
+# Configura o log estruturado (uma linha JSON por ligação) em arquivo
+def configure_log(path=None):
+    path = path or os.path.join(DIRETORIO_PADRAO, "chamadas.jsonl")
+    if any(getattr(h, "baseFilename", None) == os.path.abspath(path) for h in logger.handlers):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return path
+
+
+# Sobe o endpoint /metrics numa thread em segundo plano
+def serve_metrics(port, host="0.0.0.0"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="heatglass-metrics", daemon=True).start()
+    return server
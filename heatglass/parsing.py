@@ -0,0 +1,210 @@
+import json
+import re
+from collections import deque
+
+from .rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS, _entry_number, score_analysis
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Campos esperados na resposta do modelo e seus tipos
+SCHEMA_ANALISE = {
+    "status_final": dict,
+    "checklist": list,
+    "criterios_eliminatorios": list,
+    "uso_script": dict,
+    "resumo_geral": str,
+}
+# Campos do fim da resposta que uma resposta truncada pode perder sem invalidar a avaliação
+PADROES_REPARO = {
+    "uso_script": {"status": "não avaliado", "justificativa": "Resposta truncada antes desta parte."},
+    "resumo_geral": "",
+}
+
+
+# Próximo caractere relevante dentro e fora de strings - o resto é pulado sem iterar
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+
+
+# Varre o texto uma única vez, respeitando strings, e devolve:
+#  - os objetos de nível raiz completos como (início, fim)
+#  - o objeto raiz que ficou aberto no fim do texto (início) e os pontos de corte
+#    seguros dentro dele, cada um com a pilha de delimitadores abertos naquele ponto
+def _scan(text):
+    complete = []
+    stack = []
+    start = -1
+    in_string = False
+    is_key = False
+    expect_key = []  # por nível: o próximo string é chave?
+    safe_points = deque(maxlen=4)  # só os últimos pontos de corte interessam
+    i = 0
+    n = len(text)
+    while i < n:
+        if in_string:
+            match = _STRING_SPECIAL.search(text, i)
+            if match is None:
+                break
+            i = match.start()
+            if text[i] == "\\":
+                i += 2  # pula o caractere escapado
+                continue
+            in_string = False
+            if not is_key:
+                safe_points.append((i + 1, "".join(stack)))
+            i += 1
+            continue
+        if not stack:
+            i = text.find("{", i)
+            if i == -1:
+                break
+            stack.append("{")
+            expect_key.append(True)
+            start = i
+            safe_points.clear()
+            safe_points.append((i + 1, "{"))
+            i += 1
+            continue
+        match = _STRUCTURAL.search(text, i)
+        if match is None:
+            break
+        i = match.start()
+        ch = text[i]
+        if ch == '"':
+            in_string = True
+            is_key = stack[-1] == "{" and expect_key[-1]
+        elif ch in "{[":
+            stack.append(ch)
+            expect_key.append(ch == "{")
+            safe_points.append((i + 1, "".join(stack)))
+        elif ch in "}]":
+            if _CLOSERS[stack[-1]] != ch:
+                # Delimitador trocado: descarta o objeto e recomeça a busca
+                stack = []
+                expect_key = []
+                safe_points.clear()
+                i += 1
+                continue
+            stack.pop()
+            expect_key.pop()
+            if not stack:
+                complete.append((start, i + 1))
+                safe_points.clear()
+            else:
+                safe_points.append((i + 1, "".join(stack)))
+        elif ch == ",":
+            safe_points.append((i, "".join(stack)))
+            if stack[-1] == "{":
+                expect_key[-1] = True
+        else:  # ":"
+            expect_key[-1] = False
+        i += 1
+    open_start = start if stack else -1
+    return complete, open_start, safe_points, in_string, "".join(stack)
+
+
+def _close(prefix, stack):
+    return prefix + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+# Tenta fechar um objeto truncado (ex.: o modelo atingiu o limite de tokens)
+def _repair(text, start, safe_points, in_string, stack):
+    candidates = []
+    tail = text[start:]
+    if in_string:
+        candidates.append(_close(tail + '"', stack))
+    else:
+        candidates.append(_close(tail.rstrip().rstrip(","), stack))
+    # Volta aos últimos pontos seguros (depois de um valor completo)
+    for end, point_stack in reversed(safe_points):
+        candidates.append(_close(text[start:end].rstrip().rstrip(","), point_stack))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+# Função para verificar se o objeto tem a estrutura esperada da análise
+def validate_analysis(obj):
+    if not isinstance(obj, dict):
+        return ["a resposta não é um objeto JSON"]
+    problems = []
+    for field, expected in SCHEMA_ANALISE.items():
+        if field not in obj:
+            problems.append(f"campo '{field}' ausente")
+        elif not isinstance(obj[field], expected):
+            problems.append(f"campo '{field}' deveria ser {expected.__name__}")
+    for field in ("checklist", "criterios_eliminatorios"):
+        if isinstance(obj.get(field), list) and not all(isinstance(entry, dict) for entry in obj[field]):
+            problems.append(f"campo '{field}' deveria conter apenas objetos")
+    return problems
+
+
+# Itens do checklist e critérios eliminatórios que faltam na resposta
+def missing_entries(obj):
+    items = {_entry_number(e, "item", i) for i, e in enumerate(obj.get("checklist") or [], 1) if isinstance(e, dict)}
+    ids = {_entry_number(e, "id", i)
+           for i, e in enumerate(obj.get("criterios_eliminatorios") or [], 1) if isinstance(e, dict)}
+    return ([item["item"] for item in CHECKLIST if item["item"] not in items],
+            [criterio["id"] for criterio in CRITERIOS_ELIMINATORIOS if criterio["id"] not in ids])
+
+
+# Lança ValueError se faltar algum item (fora de `skip`) ou critério na resposta
+def check_complete(obj, skip=(), label="Avaliação"):
+    items, criterios = missing_entries(obj)
+    items = [item for item in items if item not in skip]
+    if items or criterios:
+        missing = ([f"itens {', '.join(map(str, items))}"] if items else []) + (
+            [f"critérios {', '.join(map(str, criterios))}"] if criterios else [])
+        reason = "resposta truncada" if obj.get("json_reparado") else "resposta incompleta"
+        raise ValueError(f"{label} incompleta ({reason}): faltam {'; '.join(missing)}")
+
+
+# Função para extrair JSON válido da resposta: percorre o texto uma vez, testa os
+# objetos completos do maior para o menor e, se o último ficou truncado, tenta repará-lo
+def extract_json(text):
+    complete, open_start, safe_points, in_string, stack = _scan(text)
+
+    candidates = sorted(complete, key=lambda span: span[1] - span[0], reverse=True)
+    fallback = None
+    for start, end in candidates:
+        try:
+            obj = json.loads(text[start:end])
+        except ValueError:
+            continue
+        if not validate_analysis(obj):
+            return obj
+        if fallback is None:
+            fallback = obj
+
+    if open_start != -1:
+        obj = _repair(text, open_start, safe_points, in_string, stack)
+        if isinstance(obj, dict) and "criterios_eliminatorios" in obj:
+            for field, default in PADROES_REPARO.items():
+                obj.setdefault(field, default)
+        if obj is not None and not validate_analysis(obj):
+            obj["json_reparado"] = True
+            return obj
+
+    if fallback is not None:
+        return fallback
+
+    # Se tudo falhar, lança um erro detalhado
+    raise ValueError(f"Não foi possível extrair JSON válido da resposta: {text[:100]}...")
+
+
+# Função para converter a resposta bruta do modelo em dicionário de análise (já pontuado).
+# Respostas sem algum item ou critério (ex.: truncadas e reparadas) são recusadas,
+# para não serem pontuadas como se o atendente tivesse falhado nos itens ausentes
+def parse_analysis(result):
+    try:
+        analysis = json.loads(result)
+    except ValueError:
+        analysis = extract_json(result)
+    problems = validate_analysis(analysis)
+    if problems:
+        raise ValueError("Resposta fora do formato esperado: " + "; ".join(problems))
+    check_complete(analysis)
+    return score_analysis(analysis)
@@ -0,0 +1,207 @@
+import contextlib
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .audio import merge_transcripts, needs_segmentation, probe_duration, split_segments
+from .mapreduce import TRECHOS_SIMULTANEOS, needs_windows, request_analysis_windows
+from .parsing import parse_analysis
+from .preprocess import preprocess_audio
+from .prescreen import apply_prescreen, facts_prompt, is_decided, prescreen, prescreen_events
+from .prompt import MODELO_PADRAO, TEMPERATURA, build_messages
+from .scheduler import SCHEDULER, estimate_tokens
+from .streaming import StreamingAnalysisParser
+from .tiers import escalation_reasons, split_tiers, tier_result
+
+
+# Função para transcrever um arquivo de áudio via Whisper (dentro dos limites do SCHEDULER)
+def transcribe_file(client, path):
+    def create():
+        with open(path, "rb") as audio_file:
+            return client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file
+            )
+    return SCHEDULER.call("whisper-1", create).text
+
+
+# Função para transcrever uma gravação de qualquer tamanho: o áudio é antes
+# pré-processado (mono 16 kHz, silêncios longos encurtados - ver preprocess.py) e
+# gravações longas são divididas em segmentos sobrepostos transcritos em paralelo
+# e depois emendados. Com trace (metrics.Trace) a duração do áudio enviado entra
+# na estimativa de custo e as medições do áudio ficam em trace.attrs["audio"]
+def transcribe_audio(client, path, max_workers=4, trace=None):
+    with tempfile.TemporaryDirectory(prefix="heatglass_") as directory:
+        path, info = preprocess_audio(path, directory)
+        duration = probe_duration(path)
+        if trace is not None:
+            trace.add_audio(duration)
+            trace.set(audio=info)
+        if not needs_segmentation(path, duration):
+            return transcribe_file(client, path)
+        segments = split_segments(path, directory, duration)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            texts = list(executor.map(lambda segment: transcribe_file(client, segment), segments))
+    return merge_transcripts(texts)
+
+
+# Função para pré-avaliar localmente os itens verificáveis (ver prescreen.py)
+def _prescreen(transcript_text, trace=None, audio=None):
+    screen = prescreen(transcript_text, audio)
+    if trace is not None:
+        trace.set(pre_triagem=sorted(screen["itens"]))
+    return screen
+
+
+# Função para pedir a avaliação do checklist - retorna a resposta bruta do modelo,
+# já com os itens da pré-triagem. Transcrições longas são avaliadas em trechos
+# paralelos, até max_workers por vez (ver mapreduce.py). audio = medições de
+# preprocess.preprocess_audio; screen = pré-triagem já feita (a avaliação escalonada
+# faz uma só para as duas camadas)
+def request_analysis(client, transcript_text, model=MODELO_PADRAO, trace=None, audio=None,
+                     max_workers=TRECHOS_SIMULTANEOS, screen=None):
+    tiers = split_tiers(model)
+    if tiers is not None:
+        return request_analysis_tiered(client, transcript_text, *tiers, trace=trace, audio=audio,
+                                       max_workers=max_workers)
+    if screen is None:
+        screen = _prescreen(transcript_text, trace, audio)
+    if needs_windows(transcript_text):
+        return apply_prescreen(_request_windows(client, transcript_text, model, trace, max_workers, screen), screen)
+    messages = build_messages(transcript_text, facts_prompt(screen))
+    reserved = estimate_tokens(messages)
+    response = SCHEDULER.call(model, lambda: client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=TEMPERATURA,
+        response_format={"type": "json_object"}  # Força resposta em formato JSON
+    ), tokens=reserved)
+    usage = getattr(response, "usage", None)
+    SCHEDULER.settle(model, reserved, getattr(usage, "total_tokens", None))
+    if trace is not None:
+        trace.add_usage(model, usage)
+    return apply_prescreen(response.choices[0].message.content.strip(), screen)
+
+
+# Registra no trace o tempo até o primeiro item do checklist vindo do modelo
+# (primeiro_item_s); os itens da pré-triagem, exibidos antes da chamada, não contam
+def _first_item(trace, key, started):
+    if key == "checklist" and trace is not None and "primeiro_item_s" not in trace.attrs:
+        trace.set(primeiro_item_s=time.perf_counter() - started)
+
+
+# Função para pedir a avaliação em streaming - chama on_event(campo, valor) a cada
+# parte da análise concluída e retorna a resposta bruta completa. started é o
+# instante (time.perf_counter) de início da avaliação, para o primeiro_item_s
+def stream_analysis(client, transcript_text, on_event, model=MODELO_PADRAO, trace=None, audio=None,
+                    max_workers=TRECHOS_SIMULTANEOS, started=None, screen=None):
+    started = time.perf_counter() if started is None else started
+    tiers = split_tiers(model)
+    if tiers is not None:
+        return stream_analysis_tiered(client, transcript_text, on_event, *tiers, trace=trace, audio=audio,
+                                      max_workers=max_workers, started=started)
+    if screen is None:
+        screen = _prescreen(transcript_text, trace, audio)
+    if needs_windows(transcript_text):
+        # Avaliação em trechos: os eventos saem de uma vez, a partir da análise consolidada
+        result = apply_prescreen(_request_windows(client, transcript_text, model, trace, max_workers, screen), screen)
+        for key, value in StreamingAnalysisParser().feed(result):
+            _first_item(trace, key, started)
+            on_event(key, value)
+        return result
+    # Os itens decididos localmente aparecem antes da primeira resposta do modelo
+    for key, value in prescreen_events(screen):
+        on_event(key, value)
+    messages = build_messages(transcript_text, facts_prompt(screen))
+    reserved = estimate_tokens(messages)
+    # Erros de limite chegam na abertura do stream, que é o trecho repetido pelo SCHEDULER
+    stream = SCHEDULER.call(model, lambda: client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=TEMPERATURA,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True},  # o último pedaço traz a contagem de tokens
+    ), tokens=reserved)
+    parser = StreamingAnalysisParser()
+    for chunk in stream:
+        if not chunk.choices:
+            usage = getattr(chunk, "usage", None)
+            SCHEDULER.settle(model, reserved, getattr(usage, "total_tokens", None))
+            if trace is not None:
+                trace.add_usage(model, usage)
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            for key, value in parser.feed(delta):
+                if not is_decided(screen, key, value):
+                    _first_item(trace, key, started)
+                    on_event(key, value)
+    return apply_prescreen(parser.text().strip(), screen)
+
+
+# Avaliação em trechos com os mesmos fatos da pré-triagem da chamada única
+def _request_windows(client, transcript_text, model, trace, max_workers, screen):
+    return request_analysis_windows(client, transcript_text, model, trace, max_workers,
+                                    facts_prompt(screen), skip=screen["itens"], script=screen["uso_script"])
+
+
+def _span(trace, stage):
+    return trace.span(stage) if trace is not None else contextlib.nullcontext()
+
+
+# Camada rápida da avaliação escalonada - devolve (resposta ou None, motivos para
+# escalar). Se ela falhar (resposta fora do formato, trecho recusado ou erro da API
+# que não vale repetir), a ligação vai para o modelo completo em vez de falhar
+def _fast_tier(client, transcript_text, fast_model, trace, audio, max_workers, screen):
+    try:
+        with _span(trace, "analise_rapida"):
+            fast = request_analysis(client, transcript_text, fast_model, trace, audio, max_workers, screen)
+    except ValueError as e:
+        if trace is not None:
+            trace.set(erro_modelo_rapido=str(e))
+        return None, ["formato"]
+    except Exception as e:
+        if trace is not None:
+            trace.set(erro_modelo_rapido=str(e))
+        return None, ["erro"]
+    return fast, escalation_reasons(fast)
+
+
+# Função para a avaliação escalonada (ver tiers.py): o modelo rápido avalia
+# primeiro e o completo só reavalia as ligações duvidosas. A pré-triagem é feita
+# uma vez e vale para as duas camadas
+def request_analysis_tiered(client, transcript_text, fast_model, heavy_model, trace=None, audio=None,
+                            max_workers=TRECHOS_SIMULTANEOS):
+    screen = _prescreen(transcript_text, trace, audio)
+    fast, reasons = _fast_tier(client, transcript_text, fast_model, trace, audio, max_workers, screen)
+    if not reasons:
+        return tier_result(fast, None, fast_model, heavy_model, reasons, trace)
+    with _span(trace, "analise_completa"):
+        heavy = request_analysis(client, transcript_text, heavy_model, trace, audio, max_workers, screen)
+    return tier_result(fast, heavy, fast_model, heavy_model, reasons, trace)
+
+
+# Avaliação escalonada em streaming: a resposta rápida vem inteira (é curta) e só a
+# do modelo completo, quando necessária, é transmitida em partes
+def stream_analysis_tiered(client, transcript_text, on_event, fast_model, heavy_model, trace=None, audio=None,
+                           max_workers=TRECHOS_SIMULTANEOS, started=None):
+    started = time.perf_counter() if started is None else started
+    screen = _prescreen(transcript_text, trace, audio)
+    fast, reasons = _fast_tier(client, transcript_text, fast_model, trace, audio, max_workers, screen)
+    if reasons:
+        with _span(trace, "analise_completa"):
+            heavy = stream_analysis(client, transcript_text, on_event, heavy_model, trace, audio, max_workers,
+                                    started, screen)
+        return tier_result(fast, heavy, fast_model, heavy_model, reasons, trace)
+    result = tier_result(fast, None, fast_model, heavy_model, reasons, trace)
+    for key, value in StreamingAnalysisParser().feed(result):
+        _first_item(trace, key, started)
+        on_event(key, value)
+    return result
+
+
+# Função para avaliar a transcrição com o checklist - retorna (análise, resposta bruta)
+def analyze_transcript(client, transcript_text, model=MODELO_PADRAO, trace=None, audio=None):
+    result = request_analysis(client, transcript_text, model, trace, audio)
+    return parse_analysis(result), result
@@ -0,0 +1,180 @@
+# Pré-processamento do áudio antes do Whisper: a gravação é decodificada uma
+# única vez pelo ffmpeg já em mono 16 kHz (banda de voz), os silêncios longos
+# são encurtados com NumPy sobre o PCM e o resultado volta a ser um mp3 mono de
+# baixa taxa. Na mesma passada são medidos o silêncio inicial e o instante da
+# primeira fala, que servem de dado objetivo para o item 1 ("dentro de 5 seg.").
+# O PCM nunca fica inteiro na memória: a saída do ffmpeg é lida em blocos de
+# BLOCO_S (nível de cada quadro calculado por bloco) e gravada num arquivo
+# temporário, que depois é relido em blocos e enviado ao codificador só com os
+# quadros mantidos. Sem ffmpeg, se ele falhar ou se o arquivo não diminuir, o
+# áudio original é enviado.
+import os
+import subprocess
+
+from .audio import has_ffmpeg, probe_duration
+
+TAXA_AMOSTRAGEM = 16000  # Hz - o Whisper reamostra para 16 kHz de qualquer forma
+TAXA_MP3 = "32k"
+QUADRO_S = 0.03
+LIMIAR_SILENCIO_DB = -45.0  # dBFS; abaixo disso o quadro é silêncio
+MARGEM_RUIDO_DB = 10.0  # acima do ruído de fundo da própria gravação
+FOLGA_FALA_S = 0.2  # margem mantida em volta de cada trecho de fala
+MIN_FALA_S = 0.3  # duração mínima para contar como primeira fala (ignora cliques)
+SILENCIO_LONGO_S = 2.0  # silêncios maiores que isso são encurtados...
+SILENCIO_MANTIDO_S = 0.6  # ...para esta duração
+BLOCO_S = 30.0  # PCM lido e processado por vez (~1 MB)
+PROCESSAR_ATE_S = 3 * 3600  # o PCM temporário em disco ocupa ~115 MB por hora
+
+
+def _np():
+    import numpy
+
+    return numpy
+
+
+def _frame_size(rate, frame_s):
+    return max(1, int(rate * frame_s))
+
+
+# Quadros por bloco de leitura (o bloco sempre termina no fim de um quadro)
+def _block_frames(frame_s=QUADRO_S):
+    return max(1, int(BLOCO_S / frame_s))
+
+
+# Função para decodificar o áudio em PCM mono 16 kHz (int16) gravado em pcm_path -
+# devolve (nível de cada quadro, número de amostras). O downmix e a reamostragem
+# são feitos pelo próprio decodificador, com filtro anti-aliasing
+def decode_levels(path, pcm_path, rate=TAXA_AMOSTRAGEM, frame_s=QUADRO_S):
+    np = _np()
+    block = _block_frames(frame_s) * _frame_size(rate, frame_s) * 2
+    command = ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "-"]
+    levels = []
+    total = 0
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc, \
+            open(pcm_path, "wb") as pcm:
+        while True:
+            raw = proc.stdout.read(block)
+            if not raw:
+                break
+            raw = raw[:len(raw) // 2 * 2]
+            pcm.write(raw)
+            total += len(raw) // 2
+            levels.append(frame_levels(np.frombuffer(raw, dtype=np.int16), rate, frame_s))
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+    return (np.concatenate(levels) if levels else np.zeros(0)), total
+
+
+# Função para codificar em mp3 o PCM de pcm_path, só com os quadros marcados em keep
+# (as amostras depois do último quadro completo são mantidas)
+def encode_kept(pcm_path, keep, out_path, rate=TAXA_AMOSTRAGEM, bitrate=TAXA_MP3, frame_s=QUADRO_S):
+    np = _np()
+    size = _frame_size(rate, frame_s)
+    per_block = _block_frames(frame_s)
+    command = ["ffmpeg", "-v", "error", "-y", "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "-",
+               "-c:a", "libmp3lame", "-b:a", bitrate, out_path]
+    with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL) as proc, open(pcm_path, "rb") as pcm:
+        for first in range(0, max(len(keep), 1), per_block):
+            block_keep = keep[first:first + per_block]
+            samples = np.frombuffer(pcm.read(per_block * size * 2), dtype=np.int16)
+            frames = len(block_keep) * size
+            proc.stdin.write(samples[:frames].reshape(-1, size)[block_keep].tobytes())
+            proc.stdin.write(samples[frames:].tobytes())  # só no último bloco
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+    return out_path
+
+
+# Nível de cada quadro em dBFS
+def frame_levels(samples, rate=TAXA_AMOSTRAGEM, frame_s=QUADRO_S):
+    np = _np()
+    size = max(1, int(rate * frame_s))
+    count = len(samples) // size
+    if count == 0:
+        return np.zeros(0)
+    frames = samples[:count * size].reshape(count, size).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+
+# Quadros com som: acima do limiar absoluto e do ruído de fundo da gravação
+def active_frames(levels):
+    np = _np()
+    if len(levels) == 0:
+        return np.zeros(0, dtype=bool)
+    return levels > max(LIMIAR_SILENCIO_DB, float(np.percentile(levels, 10)) + MARGEM_RUIDO_DB)
+
+
+# Quadros mantidos como fala: os ativos estendidos pela folga, para não cortar
+# o início e o fim das palavras
+def speech_mask(active, frame_s=QUADRO_S):
+    np = _np()
+    pad = int(round(FOLGA_FALA_S / frame_s))
+    if not pad or len(active) == 0:
+        return active
+    return np.convolve(active.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+
+
+# Trechos contínuos de valor `value` na máscara: [(início, fim)] em quadros
+def runs(mask, value):
+    np = _np()
+    padded = np.concatenate(([False], mask == value, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+# Instante (s) do primeiro trecho de fala com pelo menos MIN_FALA_S, ou None
+def first_speech(mask, frame_s=QUADRO_S):
+    for start, end in runs(mask, True):
+        if (end - start) * frame_s >= MIN_FALA_S:
+            return start * frame_s
+    return None
+
+
+# Função para encurtar os silêncios longos - devolve (quadros mantidos, segundos removidos)
+def compress_silences(mask, frame_s=QUADRO_S):
+    np = _np()
+    keep = np.ones(len(mask), dtype=bool)
+    half = int(SILENCIO_MANTIDO_S / frame_s / 2)
+    for start, end in runs(mask, False):
+        if (end - start) * frame_s > SILENCIO_LONGO_S:
+            keep[start + half:end - half] = False
+    return keep, int(len(keep) - keep.sum()) * frame_s
+
+
+# Função para pré-processar a gravação dentro de `directory` - devolve
+# (caminho a enviar, medições). As medições são None sem ffmpeg ou se ele falhar
+def preprocess_audio(path, directory, duration=None):
+    if not has_ffmpeg():
+        return path, None
+    if duration is None:
+        duration = probe_duration(path)
+    if duration is not None and duration > PROCESSAR_ATE_S:
+        return path, None
+    pcm_path = os.path.join(directory, "preprocessado.pcm")
+    try:
+        levels, total = decode_levels(path, pcm_path)
+        active = active_frames(levels)
+        sounds = runs(active, True)
+        speech_at = first_speech(active)
+        keep, removed = compress_silences(speech_mask(active))
+        out_path = encode_kept(pcm_path, keep, os.path.join(directory, "preprocessado.mp3"))
+    except (subprocess.CalledProcessError, OSError):
+        return path, None  # arquivo que o ffmpeg não lê (ou falha ao gravar): segue o original
+    finally:
+        if os.path.exists(pcm_path):
+            os.remove(pcm_path)
+    info = {
+        "duracao_original_s": round(total / TAXA_AMOSTRAGEM, 2),
+        "silencio_inicial_s": round(float(sounds[0][0]) * QUADRO_S, 2) if sounds else None,
+        "primeira_fala_s": round(float(speech_at), 2) if speech_at is not None else None,
+        "silencio_removido_s": round(removed, 2),
+        "bytes_originais": os.path.getsize(path),
+        "bytes_enviados": os.path.getsize(out_path),
+    }
+    if info["bytes_enviados"] >= info["bytes_originais"]:
+        info["bytes_enviados"] = info["bytes_originais"]
+        info["silencio_removido_s"] = 0.0
+        return path, info
+    return out_path, info
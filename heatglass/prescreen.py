@@ -0,0 +1,329 @@
+# Pré-triagem local dos itens que dá para verificar mecanicamente na transcrição:
+# script LGPD (item 3), técnica do eco com números (item 4), script de
+# encerramento (item 11 / uso_script) e pesquisa de satisfação (item 12). As
+# medições do áudio (preprocess.py) entram como dado objetivo para o item 1.
+# O texto é normalizado (minúsculas, sem acentos, números por extenso viram
+# dígitos) e percorrido com expressões pré-compiladas. Só os achados de alta
+# confiança viram fato - o script LGPD com o pedido de consentimento e os
+# elementos de encerramento ditos como afirmação na parte final da ligação - e
+# o modelo deixa de avaliar esses itens. Os demais achados (ex.: "franquia?" numa
+# pergunta do cliente), o eco de números (a transcrição não diz quem repetiu) e
+# o que não é encontrado vão só como pista.
+import bisect
+import functools
+import json
+import re
+import unicodedata
+
+from .parsing import extract_json
+
+# Versão da pré-triagem - entra na chave do cache de análises
+VERSAO_PRE_TRIAGEM = "3"
+
+NUMEROS = {
+    "zero": "0", "um": "1", "uma": "1", "dois": "2", "duas": "2", "tres": "3", "quatro": "4",
+    "cinco": "5", "seis": "6", "meia": "6", "sete": "7", "oito": "8", "nove": "9",
+}
+MIN_DIGITOS_ECO = 8  # telefone ou CPF; anos e datas curtas ficam de fora
+JANELA_ECO = 40  # palavras entre a informação e a repetição
+JANELA_LGPD = 25
+JANELA_CONSENTIMENTO = 8  # palavras antes da frase do LGPD onde o verbo pode estar ("você autoriza o ...")
+# Parte final da ligação, onde o script de encerramento é procurado: os últimos 30%
+# das palavras, e pelo menos as últimas PALAVRAS_ENCERRAMENTO em ligações curtas
+FRACAO_ENCERRAMENTO = 0.3
+PALAVRAS_ENCERRAMENTO = 250
+ATENDER_EM_S = 5  # item 1: "atendeu a ligação prontamente, dentro de 5 seg."
+
+# Conceitos do script LGPD (ver rubric.LGPD_VARIANTES): compartilhar/informar + telefone + prestador
+_LGPD = (
+    re.compile(r"\b(compartilh\w*|informad\w*|acesso|passar|repassar)\b"),
+    re.compile(r"\b(telefone|numero|contato|celular)\b"),
+    re.compile(r"\bprestador\w*\b"),
+)
+# Verbo de consentimento - uma pergunta sem ele ("o prestador pode ter acesso ao meu
+# número?") pode ser do cliente e não basta
+_CONSENTIMENTO = re.compile(r"\b(permite|permissao|autoriza\w*|consent\w*|podemos|concorda)\b")
+# Elementos do script de encerramento (rubric.ELEMENTOS_SCRIPT), mais a orientação de aguardar o agendamento
+ELEMENTOS_ENCERRAMENTO = {
+    "validade": re.compile(r"\bvalidade\b|\bprazo\b(\s+\w+){0,3}\s+valid\w*|\bvalid[oa]\s+(por|ate)\b"),
+    "franquia": re.compile(r"\bfranquia\b"),
+    "link": re.compile(r"\b(links?|whats ?app|zap)\b"),
+    "pesquisa de satisfação": re.compile(r"\bpesquisa\b(\s+\w+){0,3}\s+satisfacao\b|\bnota\s+(5|cinco)\b"),
+    "despedida": re.compile(
+        r"\b(agradeco|obrigad[oa])\b(\s+\w+){0,4}\s+(contato|ligacao)\b"
+        r"|\btenha\s+(um|uma)\s+(otim[oa]|excelente|bo[ma])\s+(dia|tarde|noite)\b"
+    ),
+    "agendamento": re.compile(
+        r"\baguard\w*\b(\s+\w+){0,6}\s+(contato|agendamento|ligacao)\b"
+        r"|\bentrar\w*\s+em\s+contato\b(\s+\w+){0,6}\s+agend\w*"
+    ),
+}
+ELEMENTOS_ITEM_11 = ("validade", "franquia", "link", "agendamento")
+ELEMENTOS_USO_SCRIPT = ("validade", "franquia", "link", "pesquisa de satisfação", "despedida")
+# Palavras em volta de um valor em dinheiro ("R$ 1.500,00", "1500 reais") - não é eco de dado
+_MOEDA_ANTES = {"r", "rs"}
+_MOEDA_DEPOIS = {"reais", "real", "centavos"}
+
+_PALAVRA = re.compile(r"\S+")
+_FIM_DE_FRASE = re.compile(r"[.!?]")
+_DIGITO = re.compile(r"\d")
+
+
+# Palavras se repetem muito numa conversa: a normalização de cada uma é feita uma vez
+@functools.lru_cache(maxsize=65536)
+def _fold(word):
+    word = unicodedata.normalize("NFKD", word.lower())
+    return re.sub(r"[^\w]", "", "".join(c for c in word if not unicodedata.combining(c)))
+
+
+class Transcript:
+    def __init__(self, text):
+        self.text = text
+        self.spans = [(m.start(), m.end()) for m in _PALAVRA.finditer(text)]
+        self.words = [_fold(text[start:end]) for start, end in self.spans]
+        # Texto normalizado com uma palavra por posição, e o início de cada uma nele
+        self.starts = []
+        position = 0
+        for word in self.words:
+            self.starts.append(position)
+            position += len(word) + 1
+        self.folded = " ".join(self.words)
+
+    def word_at(self, offset):
+        return bisect.bisect_right(self.starts, offset) - 1
+
+    # Trecho original entre as palavras first e last (inclusive)
+    def excerpt(self, first, last, margin=3):
+        first = max(0, first - margin)
+        last = min(len(self.spans) - 1, last + margin)
+        return self.text[self.spans[first][0]:self.spans[last][1]].strip()
+
+    # A frase que contém a palavra termina com "?"
+    def is_question(self, index):
+        end = _FIM_DE_FRASE.search(self.text, self.spans[index][0])
+        return end is not None and end.group() == "?"
+
+    # Primeira palavra da parte final da ligação
+    def closing_start(self):
+        size = max(PALAVRAS_ENCERRAMENTO, int(len(self.words) * FRACAO_ENCERRAMENTO))
+        return max(0, len(self.words) - size)
+
+    # Trecho do primeiro achado a partir da palavra `first`; statements_only ignora perguntas
+    def find(self, pattern, first=0, statements_only=False):
+        if first >= len(self.words):
+            return None
+        for match in pattern.finditer(self.folded, self.starts[first]):
+            start, end = self.word_at(match.start()), self.word_at(match.end() - 1)
+            if statements_only and self.is_question(end):
+                continue
+            return self.excerpt(start, end)
+        return None
+
+
+# Posição mais próxima de `anchor` numa lista ordenada de posições (None se vazia)
+def _nearest(positions, anchor):
+    i = bisect.bisect_left(positions, anchor)
+    return min(positions[max(0, i - 1):i + 1], key=lambda p: abs(p - anchor), default=None)
+
+
+# Script LGPD: os três conceitos próximos entre si - devolve (trecho, pediu
+# consentimento), preferindo uma ocorrência com o verbo de consentimento, ou (None, False)
+def check_lgpd(transcript):
+    hits = [
+        sorted({transcript.word_at(m.start()) for m in pattern.finditer(transcript.folded)})
+        for pattern in _LGPD
+    ]
+    found = None
+    for anchor in hits[2]:
+        near = [_nearest(group, anchor) for group in hits[:2]]
+        if all(i is not None and abs(i - anchor) <= JANELA_LGPD for i in near):
+            first, last = min(anchor, *near), max(anchor, *near)
+            if _CONSENTIMENTO.search(" ".join(transcript.words[max(0, first - JANELA_CONSENTIMENTO):last + 1])):
+                return transcript.excerpt(first, last), True
+            found = found or transcript.excerpt(first, last)
+    return found, False
+
+
+@functools.lru_cache(maxsize=65536)
+def _digits(word):
+    return "".join(_DIGITO.findall(word))
+
+
+# Sequências de dígitos ditas em sequência (números ou por extenso): [(dígitos, primeira, última palavra)]
+def digit_runs(transcript):
+    runs = []
+    digits, first = "", None
+    for i, word in enumerate(transcript.words + [""]):
+        token = NUMEROS.get(word) or _digits(word)
+        if token:
+            if first is None:
+                first = i
+            digits += token
+            continue
+        if len(digits) >= MIN_DIGITOS_ECO:
+            runs.append((digits, first, i - 1))
+        digits, first = "", None
+    return runs
+
+
+def _is_amount(transcript, first, last):
+    before = transcript.words[first - 1] if first > 0 else ""
+    after = transcript.words[last + 1] if last + 1 < len(transcript.words) else ""
+    return before in _MOEDA_ANTES or after in _MOEDA_DEPOIS
+
+
+# Técnica do eco: a mesma sequência de dígitos (telefone, CPF) repetida logo em
+# seguida. Sem saber quem falou, é só indício - o cliente pode ter repetido o próprio número
+def check_echo(transcript):
+    last_seen = {}
+    for digits, first, last in digit_runs(transcript):
+        if _is_amount(transcript, first, last):
+            continue
+        previous = last_seen.get(digits)
+        if previous is not None and first - previous[1] <= JANELA_ECO:
+            return transcript.excerpt(previous[0], last)
+        last_seen[digits] = (first, last)
+    return None
+
+
+# Elementos do encerramento: {nome: trecho ou None}. strict procura só afirmações
+# na parte final da ligação
+def check_closing(transcript, strict=False):
+    first = transcript.closing_start() if strict else 0
+    return {name: transcript.find(pattern, first, statements_only=strict)
+            for name, pattern in ELEMENTOS_ENCERRAMENTO.items()}
+
+
+# Medições do áudio que vão para o modelo como dado objetivo (item 1)
+def audio_facts(audio):
+    if not audio or audio.get("primeira_fala_s") is None:
+        return []
+    speech_at = audio["primeira_fala_s"]
+    within = "dentro" if speech_at <= ATENDER_EM_S else "depois"
+    return [f"Item 1: a primeira fala da gravação começa aos {speech_at:.1f} s ({within} dos {ATENDER_EM_S} s do "
+            f"critério; silêncio inicial de {audio.get('silencio_inicial_s') or 0:.1f} s). "
+            "Avalie a saudação normalmente."]
+
+
+# Função para pré-avaliar a transcrição - retorna os itens decididos localmente,
+# o uso do script (se completo), as pistas para os itens não confirmados e as
+# medições do áudio (audio = medições de preprocess.preprocess_audio, se houver)
+def prescreen(transcript_text, audio=None):
+    transcript = Transcript(transcript_text)
+    itens = {}
+    pistas = []
+
+    lgpd, consent = check_lgpd(transcript)
+    if consent:
+        itens[3] = {"item": 3, "resposta": "sim", "justificativa": f'Script LGPD verbalizado: "{lgpd}"'}
+    elif lgpd:
+        pistas.append(f'Item 3: telefone e prestador são mencionados juntos, mas sem pedido de consentimento: "{lgpd}".')
+    else:
+        pistas.append("Item 3: nenhuma frase sobre compartilhar o telefone com o prestador foi encontrada.")
+
+    echo = check_echo(transcript)
+    if echo:
+        pistas.append(f'Item 4: um número foi repetido logo após ser informado: "{echo}". '
+                      "Confira se foi o atendente que repetiu para confirmar.")
+    else:
+        pistas.append("Item 4: nenhum número (telefone, CPF, placa) repetido logo após ser informado foi encontrado.")
+
+    # Encerramento: só decide com afirmações na parte final; o resto é pista
+    closing = check_closing(transcript, strict=True)
+    anywhere = check_closing(transcript)
+    survey = closing["pesquisa de satisfação"]
+    if survey:
+        itens[12] = {"item": 12, "resposta": "sim", "justificativa": f'Orientou sobre a pesquisa: "{survey}"'}
+    elif anywhere["pesquisa de satisfação"]:
+        pistas.append("Item 12: a pesquisa de satisfação só aparece fora do encerramento ou numa pergunta: "
+                      f'"{anywhere["pesquisa de satisfação"]}".')
+    else:
+        pistas.append("Item 12: a pesquisa de satisfação não é mencionada na transcrição.")
+    if all(closing[name] for name in ELEMENTOS_ITEM_11):
+        itens[11] = {"item": 11, "resposta": "sim", "justificativa": "Script de encerramento completo - " + "; ".join(
+            f'{name}: "{closing[name]}"' for name in ELEMENTOS_ITEM_11)}
+    uso_script = None
+    if all(closing[name] for name in ELEMENTOS_USO_SCRIPT):
+        uso_script = {"status": "completo", "justificativa": "Todos os elementos presentes - " + "; ".join(
+            f'{name}: "{closing[name]}"' for name in ELEMENTOS_USO_SCRIPT)}
+    if uso_script is None or 11 not in itens:
+        names = dict.fromkeys(ELEMENTOS_USO_SCRIPT + ELEMENTOS_ITEM_11)
+        confirmed = [f'{name}: "{closing[name]}"' for name in names if closing[name]]
+        loose = [f'{name}: "{anywhere[name]}"' for name in names if anywhere[name] and not closing[name]]
+        missing = [name for name in names if not anywhere[name]]
+        pistas.append("Script de encerramento: "
+                      + "; ".join(part for part in (
+                          f"não encontrados {', '.join(missing)}" if missing else "",
+                          f"no encerramento {'; '.join(confirmed)}" if confirmed else "",
+                          f"fora do encerramento ou em perguntas {'; '.join(loose)}" if loose else "",
+                      ) if part) + ".")
+    return {"itens": itens, "uso_script": uso_script, "pistas": pistas, "medicoes": audio_facts(audio)}
+
+
+# Texto acrescentado à mensagem do usuário com os fatos apurados localmente
+def facts_prompt(screen):
+    lines = []
+    for number, entry in sorted(screen["itens"].items()):
+        lines.append(f'- Item {number}: "sim" ({entry["justificativa"]}).')
+    if screen["uso_script"] is not None:
+        lines.append(f'- uso_script: "completo" ({screen["uso_script"]["justificativa"]}).')
+    blocks = []
+    if screen["medicoes"]:
+        blocks.append("MEDIÇÕES DO ÁUDIO (feitas localmente na gravação):\n" + "\n".join(
+            f"- {medicao}" for medicao in screen["medicoes"]))
+    if lines:
+        skipped = [f"item {n}" for n in sorted(screen["itens"])] + (["uso_script"] if screen["uso_script"] else [])
+        blocks.append("VERIFICAÇÃO AUTOMÁTICA - fatos já confirmados na transcrição. Não reavalie e OMITA da resposta: "
+                      + ", ".join(skipped) + ".\n" + "\n".join(lines))
+    if screen["pistas"]:
+        blocks.append("PISTAS DA VERIFICAÇÃO AUTOMÁTICA (avalie normalmente):\n" + "\n".join(
+            f"- {pista}" for pista in screen["pistas"]))
+    return "\n\n".join(blocks)
+
+
+# Função para completar a resposta do modelo com os itens decididos localmente.
+# Se a resposta não for JSON válido, ela volta sem alterações (o erro aparece no parse)
+def apply_prescreen(result, screen):
+    if not screen["itens"] and screen["uso_script"] is None:
+        return result
+    try:
+        try:
+            analysis = json.loads(result)
+        except ValueError:
+            analysis = extract_json(result)
+    except ValueError:
+        return result
+    if not isinstance(analysis, dict) or not isinstance(analysis.get("checklist", []), list):
+        return result
+    checklist = [
+        entry for entry in analysis.get("checklist", [])
+        if not (isinstance(entry, dict) and _item_number(entry) in screen["itens"])
+    ]
+    checklist.extend(screen["itens"].values())
+    analysis["checklist"] = sorted(checklist, key=lambda e: _item_number(e) if isinstance(e, dict) else 0)
+    if screen["uso_script"] is not None:
+        analysis["uso_script"] = screen["uso_script"]
+    analysis["itens_pre_triagem"] = sorted(screen["itens"])
+    return json.dumps(analysis, ensure_ascii=False)
+
+
+# Eventos (campo, valor) dos itens decididos localmente, para a exibição em streaming
+def prescreen_events(screen):
+    events = [("checklist", entry) for _, entry in sorted(screen["itens"].items())]
+    if screen["uso_script"] is not None:
+        events.insert(0, ("uso_script", screen["uso_script"]))
+    return events
+
+
+# Função para saber se um evento do modelo repete algo já decidido localmente
+def is_decided(screen, key, value):
+    if key == "checklist":
+        return isinstance(value, dict) and _item_number(value) in screen["itens"]
+    return key == "uso_script" and screen["uso_script"] is not None
+
+
+def _item_number(entry):
+    try:
+        return int(entry.get("item"))
+    except (TypeError, ValueError):
+        return 0
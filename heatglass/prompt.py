@@ -0,0 +1,56 @@
+# Prompt de avaliação do atendimento. Todo o conteúdo estático (instruções e
+# rubrica) vai primeiro e a transcrição por último, para que o prefixo seja
+# idêntico entre chamadas e aproveite o cache de prompt do provedor.
+import hashlib
+
+from .rubric import RUBRIC_VERSION, build_rubric_prompt
+
+# Modelo fixo: GPT-4 Turbo
+MODELO_PADRAO = "gpt-4-turbo"
+TEMPERATURA = 0.3
+
+SYSTEM_PROMPT = (
+    "Você é um analista especializado em atendimento ao cliente. Responda APENAS com o JSON solicitado, "
+    "sem texto adicional, sem marcadores de código como ```json, e sem explicações.\n\n"
+    + build_rubric_prompt()
+)
+
+# Prompt de cada trecho de uma ligação longa (ver mapreduce.py): a mesma rubrica,
+# avaliando só o que aparece no trecho
+SYSTEM_PROMPT_TRECHO = SYSTEM_PROMPT + """
+
+AVALIAÇÃO POR TRECHOS: a transcrição enviada é apenas um trecho de uma ligação longa (os trechos vizinhos se sobrepõem um pouco). Avalie somente o que aparece neste trecho:
+- checklist: responda "sim" se o trecho mostra o item realizado, "não" se mostra o item descumprido e "sem evidência" se o trecho não trata do item. Na justificativa, cite a evidência encontrada.
+- criterios_eliminatorios: "ocorreu": true somente se a violação aparece neste trecho.
+- uso_script: avalie apenas os elementos do script de encerramento presentes neste trecho ("não utilizado" se nenhum aparece).
+- status_final: como o cliente e a ligação estão ao fim deste trecho.
+- resumo_geral: uma ou duas frases sobre o que acontece neste trecho."""
+
+# Versão do prompt - muda sempre que a rubrica ou o texto mudam, invalidando análises em cache
+_PROMPT_HASH = hashlib.sha256((SYSTEM_PROMPT + SYSTEM_PROMPT_TRECHO).encode("utf-8")).hexdigest()[:12]
+PROMPT_VERSION = f"{RUBRIC_VERSION}-{_PROMPT_HASH}"
+
+
+# Função para montar a mensagem com a transcrição (única parte variável do prompt),
+# seguida dos fatos da pré-triagem local, se houver
+def build_prompt(transcript_text, facts=""):
+    prompt = f'TRANSCRIÇÃO:\n"""{transcript_text}"""'
+    return f"{prompt}\n\n{facts}" if facts else prompt
+
+
+# Função para montar as mensagens da chamada de chat
+def build_messages(transcript_text, facts=""):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_prompt(transcript_text, facts)},
+    ]
+
+
+# Função para montar as mensagens de um trecho (posição começa em 1), seguidas dos
+# fatos da pré-triagem da ligação inteira, se houver
+def build_window_messages(window_text, position, total, facts=""):
+    prompt = f'TRECHO {position} DE {total} DA TRANSCRIÇÃO:\n"""{window_text}"""'
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT_TRECHO},
+        {"role": "user", "content": f"{prompt}\n\n{facts}" if facts else prompt},
+    ]
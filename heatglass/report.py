@@ -0,0 +1,190 @@
+# Relatórios em PDF: geração sob demanda e exportação em lote (ZIP)
+import hashlib
+import json
+import os
+import sys
+import zipfile
+from datetime import datetime
+
+from .rubric import PONTUACAO_MAXIMA
+
+BLOCO_TRANSCRICAO = 2000  # caracteres por chamada de multi_cell
+
+
+# Função para quebrar a transcrição em blocos de até `size` caracteres, respeitando palavras
+def transcript_blocks(transcript_text, size=BLOCO_TRANSCRICAO):
+    for line in transcript_text.splitlines():
+        while len(line) > size:
+            cut = line.rfind(" ", 0, size)
+            if cut <= 0:
+                cut = size
+            yield line[:cut]
+            line = line[cut:].lstrip()
+        if line:
+            yield line
+
+
+# Função para criar PDF
+def create_pdf(analysis, transcript_text, model_name, analyzed_at=None):
+    from fpdf import FPDF  # importado só quando um relatório é gerado
+
+    pdf = FPDF()
+    pdf.add_page()
+    
+    # Configurações de fonte
+    pdf.set_font("Arial", "B", 16)
+    
+    # Cabeçalho
+    pdf.set_fill_color(193, 0, 0)
+    pdf.set_text_color(255, 255, 255)
+    pdf.cell(0, 10, "HeatGlass - Relatório de Atendimento", 1, 1, "C", True)
+    pdf.ln(5)
+    
+    # Informações gerais
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", "B", 12)
+    analyzed_at = analyzed_at or datetime.now()
+    pdf.cell(0, 10, f"Data da análise: {analyzed_at.strftime('%d/%m/%Y %H:%M')}", 0, 1)
+    pdf.cell(0, 10, f"Modelo utilizado: {model_name}", 0, 1)
+    pdf.ln(5)
+    
+    # Status Final
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Status Final", 0, 1)
+    pdf.set_font("Arial", "", 12)
+    final = analysis.get("status_final", {})
+    pdf.cell(0, 10, f"Cliente: {final.get('satisfacao', 'N/A')}", 0, 1)
+    pdf.cell(0, 10, f"Desfecho: {final.get('desfecho', 'N/A')}", 0, 1)
+    pdf.cell(0, 10, f"Risco: {final.get('risco', 'N/A')}", 0, 1)
+    pdf.ln(5)
+    
+    # Script de Encerramento
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Script de Encerramento", 0, 1)
+    pdf.set_font("Arial", "", 12)
+    script_info = analysis.get("uso_script", {})
+    pdf.cell(0, 10, f"Status: {script_info.get('status', 'N/A')}", 0, 1)
+    pdf.multi_cell(0, 10, f"Justificativa: {script_info.get('justificativa', 'N/A')}")
+    pdf.ln(5)
+    
+    # Pontuação Total
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Pontuação Total", 0, 1)
+    pdf.set_font("Arial", "B", 12)
+    total = analysis.get("pontuacao_total", "N/A")
+    pdf.cell(0, 10, f"{total} pontos de {PONTUACAO_MAXIMA}", 0, 1)
+    pdf.ln(5)
+    
+    # Resumo Geral
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Resumo Geral", 0, 1)
+    pdf.set_font("Arial", "", 12)
+    pdf.multi_cell(0, 10, analysis.get("resumo_geral", "N/A"))
+    pdf.ln(5)
+    
+    # Checklist (nova página)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Checklist Técnico", 0, 1)
+    pdf.ln(5)
+    
+    # Itens do checklist
+    checklist = analysis.get("checklist", [])
+    for item in checklist:
+        item_num = item.get('item', '')
+        criterio = item.get('criterio', '')
+        pontos = item.get('pontos', 0)
+        resposta = str(item.get('resposta', ''))
+        justificativa = item.get('justificativa', '')
+        
+        pdf.set_font("Arial", "B", 12)
+        pdf.multi_cell(0, 10, f"{item_num}. {criterio} ({pontos} pts)")
+        pdf.set_font("Arial", "", 12)
+        pdf.cell(0, 10, f"Resposta: {resposta}", 0, 1)
+        pdf.multi_cell(0, 10, f"Justificativa: {justificativa}")
+        pdf.ln(5)
+    
+    # Transcrição na última página
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Transcrição da Ligação", 0, 1)
+    pdf.set_font("Arial", "", 10)
+    # Escreve em blocos para não montar uma única string gigante em multi_cell
+    for block in transcript_blocks(transcript_text):
+        pdf.multi_cell(0, 10, block)
+    
+    return pdf.output(dest="S").encode("latin1")
+
+
+# Função para montar a chave de um relatório (mesma análise + transcrição + modelo = mesmo PDF)
+def report_key(result, transcript_text, model_name):
+    digest = hashlib.sha256()
+    for part in (result, transcript_text, model_name):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Função para nomear o PDF de uma análise
+def report_filename(name=None, analyzed_at=None):
+    if name:
+        return os.path.splitext(os.path.basename(name))[0] + ".pdf"
+    return f"HeatGlass_Relatorio_{(analyzed_at or datetime.now()).strftime('%Y%m%d_%H%M%S')}.pdf"
+
+
+# Função para gravar um ZIP de relatórios em `fileobj`, um PDF por vez: cada
+# relatório é gerado, comprimido e descartado antes do próximo
+# records: iterável de (nome do arquivo, análise, transcrição, modelo, data da análise)
+def write_reports_zip(records, fileobj):
+    names = set()
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, analysis, transcript_text, model_name, analyzed_at in records:
+            base, ext = os.path.splitext(filename)
+            unique = filename
+            n = 1
+            while unique in names:
+                n += 1
+                unique = f"{base}_{n}{ext}"
+            names.add(unique)
+            archive.writestr(unique, create_pdf(analysis, transcript_text, model_name, analyzed_at))
+            count += 1
+    return count
+
+
+# Função para ler os resultados do modo em lote (JSONL) um por vez, já no formato de write_reports_zip
+def jsonl_records(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "erro" in record or "checklist" not in record:
+                continue
+            analyzed_at = record.get("analisado_em")
+            yield (
+                report_filename(record.get("arquivo")),
+                record,
+                record.get("transcricao", ""),
+                record.get("modelo", ""),
+                datetime.fromisoformat(analyzed_at) if analyzed_at else None,
+            )
+
+
+# Exportação em lote: python -m heatglass.report resultados.jsonl -o relatorios.zip
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HeatGlass - relatórios em PDF a partir do JSONL do modo em lote")
+    parser.add_argument("resultados", help="Arquivo JSONL gerado por heatglass.batch")
+    parser.add_argument("-o", "--saida", default="relatorios.zip", help="Arquivo ZIP de saída")
+    args = parser.parse_args(argv)
+
+    with open(args.saida, "wb") as output:
+        count = write_reports_zip(jsonl_records(args.resultados), output)
+    print(f"{count} relatórios gravados em {args.saida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Rubrica de avaliação como dados: itens do checklist, critérios eliminatórios,
+# variações aceitas do script LGPD e script de encerramento. O prompt é montado
+# a partir daqui e a pontuação é calculada localmente a partir das respostas.
+import unicodedata
+
+# Versão da rubrica - altere sempre que itens, pontos ou instruções mudarem
+RUBRIC_VERSION = "1"
+
+CHECKLIST = [
+    {"item": 1, "pontos": 10, "criterio": "Atendeu a ligação prontamente, dentro de 5 seg. e utilizou a saudação correta com as técnicas do atendimento encantador?"},
+    {"item": 2, "pontos": 6, "criterio": "Solicitou os dados do cadastro do cliente e pediu 2 telefones para contato, nome, cpf, placa do veículo e endereço ? Só é \"sim\" se todas as informações forem solicitadas"},
+    {"item": 3, "pontos": 2, "criterio": "O Atendente Verbalizou o script LGPD? Script informado em Instruções Adicionais de Avaliação tópico 2."},
+    {"item": 4, "pontos": 5, "criterio": "Utilizou a técnica do eco para garantir o entendimento sobre as informações coletadas, evitando erros no processo e recontato do cliente?"},
+    {"item": 5, "pontos": 3, "criterio": "Escutou atentamente a solicitação do segurado evitando solicitações em duplicidade?"},
+    {"item": 6, "pontos": 5, "criterio": "Compreendeu a solicitação do cliente em linha e demonstrou que entende sobre os serviços da empresa?"},
+    {"item": 7, "pontos": 10, "criterio": "Confirmou as informações completas sobre o dano no veículo? Confirmou data e motivo da quebra, registro do item, dano na pintura e demais informações necessárias para o correto fluxo de atendimento. (tamanho da trinca, LED, Xenon, etc)"},
+    {"item": 8, "pontos": 10, "criterio": "Confirmou cidade para o atendimento e selecionou corretamente a primeira opção de loja identificada pelo sistema?"},
+    {"item": 9, "pontos": 5, "criterio": "A comunicação com o cliente foi eficaz: não houve uso de gírias, linguagem inadequada ou conversas paralelas? O analista informou quando ficou ausente da linha e quando retornou?"},
+    {"item": 10, "pontos": 4, "criterio": "A conduta do analista foi acolhedora, com sorriso na voz, empatia e desejo verdadeiro em entender e solucionar a solicitação do cliente?"},
+    {"item": 11, "pontos": 15, "criterio": "Realizou o script de encerramento completo, informando: prazo de validade, franquia, link de acompanhamento e vistoria, e orientou que o cliente aguarde o contato para agendamento?"},
+    {"item": 12, "pontos": 6, "criterio": "Orientou o cliente sobre a pesquisa de satisfação do atendimento?"},
+]
+
+PONTUACAO_MAXIMA = sum(item["pontos"] for item in CHECKLIST)
+
+# Itens que valem para a ligação inteira: na avaliação por trechos, um "não" em
+# qualquer trecho reprova o item (nos demais, basta um trecho com "sim")
+ITENS_LIGACAO_INTEIRA = {5, 9, 10}
+
+LGPD_VARIANTES = [
+    "Você permite que a nossa empresa compartilhe o seu telefone com o prestador que irá lhe atender?",
+    "Podemos compartilhar seu telefone com o prestador que irá realizar o serviço?",
+    "Seu telefone pode ser informado ao prestador que irá realizar o serviço?",
+    "O prestador pode ter acesso ao seu número para realizar o agendamento do serviço?",
+    "Podemos compartilhar seu telefone com o prestador que irá te atender?",
+    "Você autoriza o compartilhamento do telefone informado com o prestador que irá te atender?",
+]
+
+ELEMENTOS_SCRIPT = ["validade", "franquia", "link", "pesquisa de satisfação", "despedida"]
+
+DADOS_CADASTRO = ["Name", "CPF", "License Plate", "Email", "Vehicle", "Address", "2 phone numbers"]
+
+CRITERIOS_ELIMINATORIOS = [
+    {"id": 1, "criterio": "Ofereceu/garantiu algum serviço que o cliente não tinha direito?",
+     "exemplos": "Prometer serviços fora da cobertura, dar garantias não previstas no contrato."},
+    {"id": 2, "criterio": "Preencheu ou selecionou o Veículo/peça incorretos?",
+     "exemplos": "Registrar modelo diferente do informado, selecionar peça diferente da solicitada."},
+    {"id": 3, "criterio": "Agiu de forma rude, grosseira, não deixando o cliente falar e/ou se alterou na ligação?",
+     "exemplos": "Interrupções constantes, tom agressivo, impedir cliente de explicar situação."},
+    {"id": 4, "criterio": "Encerrou a chamada ou transferiu o cliente sem o seu conhecimento?",
+     "exemplos": "Desligar abruptamente, transferir sem explicar ou obter consentimento."},
+    {"id": 5, "criterio": "Falou negativamente sobre a Carglass, afiliados, seguradoras ou colegas de trabalho?",
+     "exemplos": "Criticar atendimento prévio, fazer comentários pejorativos sobre a empresa."},
+    {"id": 6, "criterio": "Forneceu informações incorretas ou fez suposições infundadas sobre garantias, serviços ou procedimentos?",
+     "exemplos": "\"Como a lataria já passou para nós, então provavelmente a sua garantia é motor e câmbio\" sem ter certeza disso, sugerir que o cliente pode perder a garantia do veículo."},
+    {"id": 7, "criterio": "Comentou sobre serviços de terceiros ou orientou o cliente para serviços externos sem autorização?",
+     "exemplos": "Sugerir que o cliente verifique procedimentos com a concessionária primeiro, fazer comparações com outros serviços, discutir políticas de garantia de outras empresas sem necessidade."},
+]
+
+ATENCAO_ELIMINATORIOS = (
+    "ATENÇÃO: Avalie com rigor frases como \"Não teria problema em mexer na lataria e o senhor perder a garantia?\" "
+    "ou \"provavelmente a sua garantia é motor e câmbio\" - estas constituem informações incorretas ou suposições "
+    "sem confirmação que podem confundir o cliente e são consideradas violações de critérios eliminatórios."
+)
+
+SCRIPT_ENCERRAMENTO = """"*obrigada por me aguardar! O seu atendimento foi gerado, e em breve receberá dois links no whatsapp informado, para acompanhar o pedido e realizar a vistoria.*
+*Lembrando que o seu atendimento tem uma franquia de XXX que deverá ser paga no ato do atendimento. (****acessórios/RRSM ****- tem uma franquia que será confirmada após a vistoria).*
+*Te ajudo com algo mais?*
+*Ao final do atendimento terá uma pesquisa de Satisfação, a nota 5 é a máxima, tudo bem?*
+*Agradeço o seu contato, tenha um excelente dia!"*"""
+
+
+# Função para montar as instruções adicionais de avaliação
+def _instrucoes():
+    lgpd = "\n".join(f"    2.{i} {frase}" for i, frase in enumerate(LGPD_VARIANTES, 1))
+    return f"""INSTRUÇÕES ADICIONAIS DE AVALIAÇÃO:
+1. Técnica do eco: Marque como "sim" somente se o atendente repetir verbalmente informações essenciais como telefones, placa ou CPF após coletá-las. O eco deve ser claro, objetivo e demonstrar validação do entendimento. Caso contrário, marque como "não".
+2. Script LGPD: O atendente deve mencionar explicitamente que o telefone será compartilhado com o prestador de serviço, com ênfase em privacidade ou consentimento. As seguintes variações são válidas e devem ser aceitas como equivalentes:
+{lgpd}
+3. Confirmação de histórico: Verifique se há menção explícita ao histórico de utilização do serviço pelo cliente. A simples localização do cliente no sistema NÃO constitui confirmação de histórico.
+4. Respostas: Responda "sim" somente se o item foi realizado integralmente; caso contrário responda "não". A pontuação é calculada pelo sistema a partir dessas respostas.
+5. Critérios eliminatórios: Avalie com alto rigor - qualquer ocorrência, mesmo que sutil, deve ser marcada.
+6. Script de encerramento: Compare literalmente com o modelo fornecido - só marque como "completo" se TODOS os elementos estiverem presentes ({", ".join(ELEMENTOS_SCRIPT)}).
+7. Registration data confirmation (Item 2): Be extremely rigorous in the evaluation. Verify if the attendant collected/confirmed EACH of the {len(DADOS_CADASTRO)} mandatory elements:
+    7.1 {", ".join(DADOS_CADASTRO[:-1])}, and {DADOS_CADASTRO[-1]}.
+    7.2 The absence of ANY element results in "no".
+    7.3 In the justification, specifically list which data was missing.
+    7.4 Exemple: "Faltou confirmação do endereço do cliente" ou "Não coletou o nome do cliente"."""
+
+
+# Função para montar o bloco estático do prompt (não depende da transcrição)
+def build_rubric_prompt():
+    checklist = "\n".join(f"{c['item']}. {c['criterio']} ({c['pontos']} Pontos)" for c in CHECKLIST)
+    eliminatorios = "\n".join(
+        f"{c['id']}. {c['criterio']}\n   Exemplos: {c['exemplos']}" for c in CRITERIOS_ELIMINATORIOS
+    )
+    return f"""Avalie a transcrição enviada pelo usuário.
+
+Retorne APENAS um JSON com os seguintes campos, sem texto adicional antes ou depois:
+
+{{
+  "status_final": {{"satisfacao": "...", "risco": "...", "desfecho": "..."}},
+  "checklist": [
+    {{"item": 1, "resposta": "sim/não", "justificativa": "..."}},
+    ... (um objeto para cada item de 1 a {len(CHECKLIST)})
+  ],
+  "criterios_eliminatorios": [
+    {{"id": 1, "ocorreu": true/false, "justificativa": "..."}},
+    ... (um objeto para cada critério de 1 a {len(CRITERIOS_ELIMINATORIOS)})
+  ],
+  "uso_script": {{"status": "completo/parcial/não utilizado", "justificativa": "..."}},
+  "resumo_geral": "..."
+}}
+
+Checklist ({PONTUACAO_MAXIMA} pts totais):
+{checklist}
+
+{_instrucoes()}
+
+Critérios Eliminatórios (cada um resulta em 0 pontos se ocorrer):
+{eliminatorios}
+
+{ATENCAO_ELIMINATORIOS}
+
+O script correto de encerramento é:
+{SCRIPT_ENCERRAMENTO}
+
+Avalie se o script acima foi utilizado completamente ou não foi utilizado.
+
+IMPORTANTE: Retorne APENAS o JSON, sem nenhum texto adicional, sem decoradores de código como ```json ou ```, e sem explicações adicionais."""
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text).strip().lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# Função para interpretar a resposta de um item ("sim", "Sim.", "yes"...)
+def is_yes(resposta):
+    return _normalize(resposta).rstrip(".!") in ("sim", "s", "yes", "true")
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return _normalize(value) in ("true", "sim", "yes", "1")
+
+
+CHECKLIST_POR_ITEM = {item["item"]: item for item in CHECKLIST}
+ELIMINATORIOS_POR_ID = {criterio["id"]: criterio for criterio in CRITERIOS_ELIMINATORIOS}
+
+
+def _entry_number(entry, field, position):
+    try:
+        return int(entry.get(field, position))
+    except (TypeError, ValueError):
+        return position
+
+
+# Função para completar um item do checklist devolvido pelo modelo com critério e pontos da rubrica
+def checklist_entry(entry, position=None):
+    number = _entry_number(entry, "item", position)
+    item = CHECKLIST_POR_ITEM.get(number, {"criterio": entry.get("criterio", ""), "pontos": 0})
+    return {
+        "item": number,
+        "criterio": item["criterio"],
+        "pontos": item["pontos"],
+        "resposta": str(entry.get("resposta", "não avaliado")),
+        "justificativa": entry.get("justificativa", ""),
+    }
+
+
+# Função para completar um critério eliminatório devolvido pelo modelo com o texto da rubrica
+def eliminatorio_entry(entry, position=None):
+    number = _entry_number(entry, "id", position)
+    criterio = ELIMINATORIOS_POR_ID.get(number, {"criterio": entry.get("criterio", "")})
+    return {
+        "criterio": criterio["criterio"],
+        "ocorreu": _as_bool(entry.get("ocorreu", False)),
+        "justificativa": entry.get("justificativa", ""),
+    }
+
+
+# Função para completar a análise do modelo com os dados da rubrica e calcular a pontuação.
+# O modelo devolve só item/resposta/justificativa; critério, pontos e total vêm daqui.
+def score_analysis(analysis):
+    answers = {}
+    for position, entry in enumerate(analysis.get("checklist") or [], 1):
+        if isinstance(entry, dict):
+            answers[_entry_number(entry, "item", position)] = entry
+
+    checklist = []
+    pontuacao = 0
+    for item in CHECKLIST:
+        entry = checklist_entry(answers.get(item["item"], {}), item["item"])
+        if is_yes(entry["resposta"]):
+            pontuacao += item["pontos"]
+        checklist.append(entry)
+
+    occurrences = {}
+    for position, entry in enumerate(analysis.get("criterios_eliminatorios") or [], 1):
+        if isinstance(entry, dict):
+            occurrences[_entry_number(entry, "id", position)] = entry
+
+    eliminatorios = [
+        eliminatorio_entry(occurrences.get(criterio["id"], {}), criterio["id"])
+        for criterio in CRITERIOS_ELIMINATORIOS
+    ]
+
+    violado = any(c["ocorreu"] for c in eliminatorios)
+    result = dict(analysis)
+    result["checklist"] = checklist
+    result["criterios_eliminatorios"] = eliminatorios
+    result["pontuacao_checklist"] = pontuacao
+    result["pontuacao_total"] = 0 if violado else pontuacao
+    result["versao_rubrica"] = RUBRIC_VERSION
+    return result
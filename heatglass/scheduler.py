@@ -0,0 +1,195 @@
+# Agendamento das chamadas à OpenAI respeitando os limites da conta. Cada modelo
+# tem um balde de requisições por minuto (RPM) e, para o chat, outro de tokens
+# por minuto (TPM); quem chega primeiro é atendido primeiro, então sessões
+# simultâneas dividem a capacidade por ordem de chegada. Erros transitórios
+# (429, 5xx, conexão) são repetidos com espera exponencial com jitter, usando o
+# Retry-After quando a API informa; um 429 pausa o balde do modelo para todas as
+# sessões, evitando uma rajada de novas tentativas.
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from .metrics import REGISTRY
+
+# Limites por modelo (prefixo do nome); sobrescreva com HEATGLASS_LIMITES, ex.:
+#   HEATGLASS_LIMITES='{"gpt-4-turbo": {"rpm": 5000, "tpm": 600000}}'
+LIMITES_PADRAO = {
+    "whisper-1": {"rpm": 50, "tpm": None},
+    "gpt-4-turbo": {"rpm": 500, "tpm": 300000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4o": {"rpm": 500, "tpm": 300000},
+}
+LIMITE_DESCONHECIDO = {"rpm": 500, "tpm": None}
+TENTATIVAS = 5
+ESPERA_BASE_S = 0.5
+ESPERA_MAXIMA_S = 30.0
+RESPOSTA_ESTIMADA_TOKENS = 1500  # reservados para a resposta até a contagem real chegar
+STATUS_TRANSITORIOS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._queue = deque()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Espera a vez (ordem de chegada) e a capacidade; devolve os segundos de espera
+    def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._queue[0] is not ticket:
+                        self._cond.wait()
+                        continue
+                    if now >= self.blocked_until and self.tokens >= amount:
+                        self.tokens -= amount
+                        return now - start
+                    self._cond.wait(max(self.blocked_until - now, (amount - self.tokens) / self.rate, 0.001))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    # Corrige o saldo quando o consumo real difere do reservado (positivo = gastou mais)
+    def adjust(self, delta):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.tokens = max(-self.capacity, min(self.capacity, self.tokens - delta))
+            self._cond.notify_all()
+
+    # Segura todas as requisições do balde por alguns segundos (após um 429)
+    def pause(self, seconds):
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+# Estimativa de tokens de uma chamada de chat: ~4 caracteres por token + a resposta
+def estimate_tokens(messages):
+    return sum(len(m.get("content") or "") for m in messages) // 4 + RESPOSTA_ESTIMADA_TOKENS
+
+
+# Segundos pedidos pela API no cabeçalho Retry-After (ou retry-after-ms), se houver
+def retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_transient(exc):
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in STATUS_TRANSITORIOS
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class RequestScheduler:
+    def __init__(self, limits=None, max_retries=TENTATIVAS, base_delay=ESPERA_BASE_S, max_delay=ESPERA_MAXIMA_S):
+        self.limits = dict(LIMITES_PADRAO)
+        self.limits.update(limits if limits is not None else json.loads(os.environ.get("HEATGLASS_LIMITES", "{}")))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"requisicoes": 0, "retentativas": 0, "limitadas": 0, "fila": 0, "fila_maxima": 0,
+                      "espera_s": 0.0}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    # Baldes (RPM, TPM) do modelo, criados na primeira chamada
+    def buckets(self, model):
+        with self._lock:
+            if model not in self._buckets:
+                limit = next((v for k, v in self.limits.items() if model.startswith(k)), LIMITE_DESCONHECIDO)
+                self._buckets[model] = (
+                    TokenBucket(limit["rpm"]),
+                    TokenBucket(limit["tpm"]) if limit.get("tpm") else None,
+                )
+            return self._buckets[model]
+
+    def _queue(self, delta):
+        with self._lock:
+            self.stats["fila"] += delta
+            self.stats["fila_maxima"] = max(self.stats["fila_maxima"], self.stats["fila"])
+            depth = self.stats["fila"]
+        REGISTRY.set_gauge("heatglass_fila_requisicoes", depth)
+
+    def _count(self, field, value=1):
+        with self._lock:
+            self.stats[field] += value
+
+    def backoff(self, attempt, requested=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if requested is not None:
+            delay = requested + random.uniform(0, self.base_delay)
+        return delay
+
+    # Executa fn() dentro dos limites do modelo, repetindo em erros transitórios.
+    # tokens é a reserva no balde de TPM (veja settle para corrigir com o uso real)
+    def call(self, model, fn, tokens=0):
+        rpm, tpm = self.buckets(model)
+        for attempt in range(self.max_retries + 1):
+            self._queue(1)
+            try:
+                waited = rpm.acquire(1)
+                if tpm is not None and tokens:
+                    waited += tpm.acquire(tokens)
+            finally:
+                self._queue(-1)
+            self._count("espera_s", waited)
+            REGISTRY.observe("fila", waited)
+            self._count("requisicoes")
+            try:
+                return fn()
+            except Exception as exc:
+                if attempt == self.max_retries or not is_transient(exc):
+                    raise
+                if tpm is not None and tokens:
+                    tpm.adjust(-tokens)  # a requisição recusada não consumiu tokens
+                delay = self.backoff(attempt, retry_after(exc))
+                if getattr(exc, "status_code", None) == 429:
+                    rpm.pause(delay)
+                    self._count("limitadas")
+                    REGISTRY.inc("heatglass_limitadas_total", 1, modelo=model)
+                self._count("retentativas")
+                REGISTRY.inc("heatglass_retentativas_total", 1, modelo=model)
+                time.sleep(delay)
+
+    # Corrige a reserva de tokens com a contagem real devolvida pela API
+    def settle(self, model, reserved, used):
+        _, tpm = self.buckets(model)
+        if tpm is not None and used is not None:
+            tpm.adjust(used - reserved)
+
+
+SCHEDULER = RequestScheduler()
+
+
+# Cliente OpenAI único por processo (por chave/URL); o cliente já mantém um pool
+# de conexões HTTP abertas. As novas tentativas ficam a cargo do RequestScheduler
+@functools.lru_cache(maxsize=None)
+def shared_client(api_key=None, base_url=None):
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
@@ -0,0 +1,228 @@
+# Armazenamento persistente das análises em SQLite (modo WAL). As gravações são
+# acumuladas e enviadas em lote numa única transação; as colunas usadas em
+# filtros (data, pontuação, status do script, critérios eliminatórios) têm
+# índice e a paginação é por cursor, sem OFFSET, para continuar rápida com
+# dezenas de milhares de ligações.
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from .rubric import CRITERIOS_ELIMINATORIOS, RUBRIC_VERSION, is_yes
+
+DB_PADRAO = os.environ.get(
+    "HEATGLASS_DB", os.path.join(os.path.expanduser("~"), ".local", "share", "heatglass", "resultados.db")
+)
+LOTE_PADRAO = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analises (
+    id INTEGER PRIMARY KEY,
+    analisado_em TEXT NOT NULL,
+    audio_sha256 TEXT,
+    arquivo TEXT,
+    modelo TEXT,
+    versao_rubrica TEXT,
+    pontuacao_total INTEGER,
+    uso_script_status TEXT,
+    eliminatorio_violado INTEGER NOT NULL DEFAULT 0,
+    eliminatorios_mask INTEGER NOT NULL DEFAULT 0,
+    checklist_mask INTEGER NOT NULL DEFAULT 0,
+    tempos TEXT,
+    analise TEXT NOT NULL,
+    transcricao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analises_data ON analises (analisado_em, id);
+CREATE INDEX IF NOT EXISTS idx_analises_pontuacao ON analises (pontuacao_total);
+CREATE INDEX IF NOT EXISTS idx_analises_script ON analises (uso_script_status);
+CREATE INDEX IF NOT EXISTS idx_analises_violado ON analises (eliminatorio_violado, analisado_em);
+CREATE INDEX IF NOT EXISTS idx_analises_audio ON analises (audio_sha256);
+"""
+
+# Colunas leves usadas na listagem (sem a análise completa e a transcrição)
+COLUNAS_LISTA = (
+    "id", "analisado_em", "arquivo", "modelo", "pontuacao_total",
+    "uso_script_status", "eliminatorio_violado", "eliminatorios_mask",
+)
+
+
+# Função para calcular os campos indexados a partir de uma análise já pontuada.
+# As máscaras guardam um bit por critério eliminatório ocorrido / item do checklist com "sim"
+def summarize(analysis):
+    mask = 0
+    for position, criterio in enumerate(analysis.get("criterios_eliminatorios") or []):
+        if criterio.get("ocorreu"):
+            mask |= 1 << position
+    checklist_mask = 0
+    for position, item in enumerate(analysis.get("checklist") or []):
+        if is_yes(item.get("resposta", "")):
+            checklist_mask |= 1 << position
+    script_status = (analysis.get("uso_script") or {}).get("status")
+    return {
+        "pontuacao_total": analysis.get("pontuacao_total"),
+        "uso_script_status": script_status.lower() if isinstance(script_status, str) else None,
+        "eliminatorio_violado": int(mask != 0),
+        "eliminatorios_mask": mask,
+        "checklist_mask": checklist_mask,
+    }
+
+
+# Função para listar os critérios eliminatórios marcados em uma máscara de bits
+def mask_criteria(mask):
+    return [c["criterio"] for i, c in enumerate(CRITERIOS_ELIMINATORIOS) if mask & (1 << i)]
+
+
+class ResultStore:
+    def __init__(self, path=DB_PADRAO, batch_size=LOTE_PADRAO):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+
+    # Bancos criados antes da coluna checklist_mask: cria e preenche a partir do JSON
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(analises)")}
+        if not columns or "checklist_mask" in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE analises ADD COLUMN checklist_mask INTEGER NOT NULL DEFAULT 0")
+            rows = self._conn.execute("SELECT id, analise FROM analises").fetchall()
+            self._conn.executemany(
+                "UPDATE analises SET checklist_mask = ? WHERE id = ?",
+                [(summarize(json.loads(r["analise"]))["checklist_mask"], r["id"]) for r in rows],
+            )
+
+    # Enfileira uma análise; grava quando o lote enche
+    def add(self, analysis, transcript_text=None, model=None, audio_hash=None, arquivo=None,
+            timings=None, analyzed_at=None):
+        analyzed_at = analyzed_at or datetime.now()
+        if isinstance(analyzed_at, datetime):
+            analyzed_at = analyzed_at.isoformat(timespec="seconds")
+        summary = summarize(analysis)
+        row = (
+            analyzed_at, audio_hash, arquivo, model, analysis.get("versao_rubrica", RUBRIC_VERSION),
+            summary["pontuacao_total"], summary["uso_script_status"],
+            summary["eliminatorio_violado"], summary["eliminatorios_mask"], summary["checklist_mask"],
+            json.dumps(timings or {}), json.dumps(analysis, ensure_ascii=False), transcript_text,
+        )
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    # Grava as análises pendentes numa única transação
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO analises (analisado_em, audio_sha256, arquivo, modelo, versao_rubrica, "
+                    "pontuacao_total, uso_script_status, eliminatorio_violado, eliminatorios_mask, checklist_mask, "
+                    "tempos, analise, transcricao) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return len(rows)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _where(self, since=None, until=None, min_score=None, max_score=None, script_status=None, violated=None):
+        clauses = []
+        params = []
+        if since is not None:
+            clauses.append("analisado_em >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else str(since))
+        if until is not None:
+            clauses.append("analisado_em < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else str(until))
+        if min_score is not None:
+            clauses.append("pontuacao_total >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("pontuacao_total <= ?")
+            params.append(max_score)
+        if script_status:
+            clauses.append("uso_script_status = ?")
+            params.append(script_status.lower())
+        if violated is not None:
+            clauses.append("eliminatorio_violado = ?")
+            params.append(int(bool(violated)))
+        return clauses, params
+
+    # Página de resultados, mais recentes primeiro. `cursor` é o (analisado_em, id)
+    # da última linha da página anterior; devolve (linhas, cursor da próxima página)
+    def page(self, limit=50, cursor=None, **filters):
+        clauses, params = self._where(**filters)
+        if cursor is not None:
+            clauses.append("(analisado_em, id) < (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT {', '.join(COLUNAS_LISTA)} FROM analises {where} "
+               "ORDER BY analisado_em DESC, id DESC LIMIT ?")
+        with self._lock:
+            rows = [dict(r) for r in self._conn.execute(sql, (*params, limit))]
+        next_cursor = (rows[-1]["analisado_em"], rows[-1]["id"]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def count(self, **filters):
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM analises {where}", params).fetchone()[0]
+
+    # Registro completo (análise, transcrição e tempos) de uma ligação
+    def get(self, analysis_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM analises WHERE id = ?", (analysis_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["analise"] = json.loads(record["analise"])
+        record["tempos"] = json.loads(record["tempos"] or "{}")
+        return record
+
+    # Percorre todas as análises em blocos, sem carregar a tabela inteira na memória
+    def iter_analyses(self, columns=("id", "analisado_em", "analise"), chunk_size=1000, **filters):
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(columns)} FROM analises {where} ORDER BY id", params
+            )
+            rows = cursor.fetchmany(chunk_size)
+        while rows:
+            for row in rows:
+                yield dict(row)
+            with self._lock:
+                rows = cursor.fetchmany(chunk_size)
+
+    # Colunas resumidas das análises com id > after_id, em blocos de tuplas - usado
+    # pelo painel para carregar/atualizar as agregações sem decodificar o JSON
+    def iter_summaries(self, after_id=0, chunk_size=20000):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                "SELECT id, analisado_em, pontuacao_total, checklist_mask, eliminatorios_mask, uso_script_status "
+                "FROM analises WHERE id > ? ORDER BY id",
+                (after_id,),
+            )
+            rows = cursor.fetchmany(chunk_size)
+        while rows:
+            yield rows
+            with self._lock:
+                rows = cursor.fetchmany(chunk_size)
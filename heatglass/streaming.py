@@ -0,0 +1,85 @@
+# Parser incremental da resposta em streaming: recebe os pedaços de texto à
+# medida que chegam e emite cada parte da análise assim que o objeto termina -
+# status_final, uso_script e resumo_geral inteiros, e checklist /
+# criterios_eliminatorios item a item.
+import json
+
+
+class StreamingAnalysisParser:
+    def __init__(self):
+        self._chunks = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._last_string = None
+        self._expect_value = False
+        self._capture = None
+        self._capture_depth = 0
+
+    # Recebe um pedaço da resposta - retorna a lista de eventos (campo, valor) completados nele
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        events = []
+        for ch in chunk:
+            if self._capture is not None:
+                self._capture.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._end_root_string(events)
+                continue
+
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                if depth == 1:
+                    self._capture = ['"']
+            elif ch in "{[":
+                self._stack.append(ch)
+                starts_value = depth == 1 and ch == "{" and self._expect_value
+                starts_item = depth == 2 and ch == "{" and self._stack[1] == "["
+                if self._capture is None and (starts_value or starts_item):
+                    self._capture = [ch]
+                    self._capture_depth = len(self._stack)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._capture is not None and len(self._stack) == self._capture_depth - 1:
+                    self._end_object(events)
+                if len(self._stack) == 1:
+                    self._expect_value = False
+            elif depth == 1 and ch == ":":
+                self._key = self._last_string
+                self._expect_value = True
+            elif depth == 1 and ch == ",":
+                self._expect_value = False
+        return events
+
+    def _end_root_string(self, events):
+        value = json.loads("".join(self._capture))
+        self._capture = None
+        if self._expect_value:
+            events.append((self._key, value))
+            self._expect_value = False
+        else:
+            self._last_string = value
+
+    def _end_object(self, events):
+        text = "".join(self._capture)
+        self._capture = None
+        try:
+            events.append((self._key, json.loads(text)))
+        except ValueError:
+            pass
+
+    # Texto completo recebido até agora
+    def text(self):
+        return "".join(self._chunks)
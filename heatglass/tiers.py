@@ -0,0 +1,156 @@
+# Avaliação escalonada: um modelo menor e mais rápido avalia a ligação inteira
+# primeiro e só as ligações duvidosas são reavaliadas pelo modelo completo -
+# resposta fora do formato (ou falha da camada rápida, motivo "erro" para erros da
+# API), algum critério eliminatório marcado ou pontuação
+# a poucos pontos das faixas de corte (50 e 70 pontos). O modo é escolhido pelo nome do
+# modelo, "rápido+completo" (ex.: MODELO_ESCALONADO), e a orquestração fica em
+# pipeline.request_analysis. A taxa de escalonamento e a concordância entre as
+# duas camadas nas ligações escaladas ficam em STATS e nas métricas do Prometheus.
+import json
+import os
+import threading
+
+from .metrics import REGISTRY
+from .parsing import extract_json, parse_analysis
+from .prompt import MODELO_PADRAO
+from .rubric import is_yes
+
+SEPARADOR = "+"
+MODELO_RAPIDO = os.environ.get("HEATGLASS_MODELO_RAPIDO", "gpt-4o-mini")
+MODELO_ESCALONADO = f"{MODELO_RAPIDO}{SEPARADOR}{MODELO_PADRAO}"
+FAIXAS_CORTE = (50, 70)  # as mesmas faixas de cor da pontuação no app
+# Pontos de distância de uma faixa de corte em que a ligação é limítrofe. Com 3, só
+# escala quando uma única divergência num dos itens menores (2 e 3 pontos) mudaria a
+# faixa; uma margem do tamanho dos itens grandes (10 pontos) cobriria quase toda a
+# faixa de 40 a 80 pontos, onde fica a maior parte das ligações, e escalaria quase tudo
+MARGEM_LIMITROFE = float(os.environ.get("HEATGLASS_MARGEM_LIMITROFE", "3"))
+
+
+# Função para separar o nome escalonado em (modelo rápido, modelo completo) - None se for um modelo só
+def split_tiers(model):
+    if SEPARADOR not in model:
+        return None
+    fast, heavy = (part.strip() for part in model.split(SEPARADOR, 1))
+    return fast, heavy
+
+
+# Motivos para levar a ligação ao modelo completo (lista vazia = resposta rápida aceita)
+def escalation_reasons(result):
+    try:
+        analysis = parse_analysis(result)
+    except ValueError:
+        return ["formato"]
+    reasons = []
+    if analysis.get("json_reparado"):
+        reasons.append("formato")
+    if any(c["ocorreu"] for c in analysis["criterios_eliminatorios"]):
+        reasons.append("eliminatorio")
+    if any(abs(analysis["pontuacao_checklist"] - corte) <= MARGEM_LIMITROFE for corte in FAIXAS_CORTE):
+        reasons.append("limitrofe")
+    return reasons
+
+
+# Concordância entre as camadas: fração de itens e critérios com a mesma resposta
+# e diferença de pontuação (None se alguma das respostas não puder ser lida). Os
+# itens da pré-triagem são iguais nas duas camadas por construção e ficam de fora
+def agreement(fast_result, heavy_result):
+    try:
+        fast = parse_analysis(fast_result)
+        heavy = parse_analysis(heavy_result)
+    except ValueError:
+        return None
+    screened = set(fast.get("itens_pre_triagem", [])) | set(heavy.get("itens_pre_triagem", []))
+    same = [is_yes(a["resposta"]) == is_yes(b["resposta"]) for a, b in zip(fast["checklist"], heavy["checklist"])
+            if a["item"] not in screened]
+    same += [a["ocorreu"] == b["ocorreu"]
+             for a, b in zip(fast["criterios_eliminatorios"], heavy["criterios_eliminatorios"])]
+    return {
+        "itens_iguais": sum(same),
+        "itens_comparados": len(same),
+        "concordancia": round(sum(same) / len(same), 3) if same else None,
+        "diferenca_pontos": heavy["pontuacao_total"] - fast["pontuacao_total"],
+    }
+
+
+class TierStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"avaliacoes": 0, "escaladas": 0, "itens_comparados": 0, "itens_iguais": 0, "motivos": {}}
+
+    def record(self, reasons, compared):
+        with self._lock:
+            self.stats["avaliacoes"] += 1
+            if reasons:
+                self.stats["escaladas"] += 1
+            for reason in reasons:
+                self.stats["motivos"][reason] = self.stats["motivos"].get(reason, 0) + 1
+            if compared is not None:
+                self.stats["itens_comparados"] += compared["itens_comparados"]
+                self.stats["itens_iguais"] += compared["itens_iguais"]
+        REGISTRY.inc("heatglass_avaliacoes_escalonadas_total", 1, escalada="sim" if reasons else "nao")
+        for reason in reasons:
+            REGISTRY.inc("heatglass_escaladas_motivo_total", 1, motivo=reason)
+        if compared is not None:
+            REGISTRY.inc("heatglass_concordancia_itens_total", compared["itens_iguais"], resultado="igual")
+            REGISTRY.inc("heatglass_concordancia_itens_total",
+                         compared["itens_comparados"] - compared["itens_iguais"], resultado="diferente")
+
+    # Taxa de escalonamento e concordância acumuladas no processo
+    def summary(self):
+        with self._lock:
+            stats = dict(self.stats, motivos=dict(self.stats["motivos"]))
+        total = stats["avaliacoes"]
+        stats["taxa_escalonamento"] = round(stats["escaladas"] / total, 3) if total else None
+        compared = stats["itens_comparados"]
+        stats["concordancia"] = round(stats["itens_iguais"] / compared, 3) if compared else None
+        return stats
+
+
+STATS = TierStats()
+
+
+def _readable(result):
+    try:
+        parse_analysis(result)
+    except ValueError:
+        return False
+    return True
+
+
+# Função para montar a resposta final da avaliação escalonada: a do modelo
+# completo quando houve escalonamento, senão a do rápido, com o campo
+# "escalonamento" (modelo usado, motivos, concordância). Se a resposta do modelo
+# completo não puder ser lida e a do rápido sim, vale a do rápido; fast_result é
+# None quando a camada rápida falhou. Registra as estatísticas
+def tier_result(fast_result, heavy_result, fast_model, heavy_model, reasons, trace=None):
+    compared = (agreement(fast_result, heavy_result)
+                if heavy_result is not None and fast_result is not None else None)
+    STATS.record(reasons, compared)
+    escalated = heavy_result is not None
+    if escalated and fast_result is not None and not _readable(heavy_result) and _readable(fast_result):
+        heavy_result = None
+    info = {
+        "modelo_rapido": fast_model,
+        "modelo_completo": heavy_model,
+        "modelo_usado": heavy_model if heavy_result is not None else fast_model,
+        "escalado": escalated,
+        "motivos": reasons,
+    }
+    if escalated and heavy_result is None:
+        info["falha_modelo_completo"] = True
+    if compared is not None:
+        info.update(concordancia=compared["concordancia"], diferenca_pontos=compared["diferenca_pontos"])
+    if trace is not None:
+        trace.set(escalonamento=info)
+    result = heavy_result if heavy_result is not None else fast_result
+    try:
+        try:
+            analysis = json.loads(result)
+        except ValueError:
+            analysis = extract_json(result)
+    except ValueError:
+        return result  # resposta fora do formato: segue como veio, o erro aparece no parse
+    if not isinstance(analysis, dict):
+        return result
+    analysis["escalonamento"] = info
+    return json.dumps(analysis, ensure_ascii=False)
@@ -0,0 +1,116 @@
+import streamlit as st
+st.set_page_config(page_title="HeatGlass - Histórico", page_icon="🔴", layout="wide")
+
+from datetime import datetime, time, timedelta
+
+from heatglass.report import create_pdf, report_filename
+from heatglass.rubric import PONTUACAO_MAXIMA, is_yes
+from heatglass.store import ResultStore, mask_criteria
+
+POR_PAGINA = 50
+
+
+@st.cache_resource
+def get_store():
+    return ResultStore(batch_size=1)
+
+store = get_store()
+
+st.title("📚 Histórico de Análises")
+
+# Filtros
+with st.sidebar:
+    st.subheader("Filtros")
+    hoje = datetime.now().date()
+    periodo = st.date_input("Período", value=(hoje - timedelta(days=7), hoje))
+    pontuacao = st.slider("Pontuação", 0, PONTUACAO_MAXIMA, (0, PONTUACAO_MAXIMA))
+    script = st.selectbox("Script de encerramento", ["Todos", "completo", "parcial", "não utilizado"])
+    eliminatorio = st.selectbox("Critérios eliminatórios", ["Todos", "Com violação", "Sem violação"])
+
+filters = {
+    "min_score": pontuacao[0] if pontuacao[0] > 0 else None,
+    "max_score": pontuacao[1] if pontuacao[1] < PONTUACAO_MAXIMA else None,
+    "script_status": None if script == "Todos" else script,
+    "violated": {"Todos": None, "Com violação": True, "Sem violação": False}[eliminatorio],
+}
+if isinstance(periodo, (list, tuple)) and len(periodo) == 2:
+    filters["since"] = datetime.combine(periodo[0], time.min)
+    filters["until"] = datetime.combine(periodo[1] + timedelta(days=1), time.min)
+
+# Paginação por cursor: a pilha guarda o cursor de início de cada página visitada
+if st.session_state.get("historico_filtros") != filters:
+    st.session_state["historico_filtros"] = filters
+    st.session_state["historico_cursores"] = [None]
+cursores = st.session_state["historico_cursores"]
+
+rows, next_cursor = store.page(POR_PAGINA, cursores[-1], **filters)
+st.caption(f"{store.count(**filters)} ligações encontradas - página {len(cursores)}")
+
+col_anterior, col_proxima = st.columns(2)
+if col_anterior.button("⬅️ Anterior", disabled=len(cursores) == 1):
+    cursores.pop()
+    st.rerun()
+if col_proxima.button("Próxima ➡️", disabled=next_cursor is None):
+    cursores.append(next_cursor)
+    st.rerun()
+
+if not rows:
+    st.info("Nenhuma análise encontrada com esses filtros.")
+    st.stop()
+
+st.dataframe(
+    [
+        {
+            "ID": r["id"],
+            "Data": r["analisado_em"],
+            "Arquivo": r["arquivo"],
+            "Pontuação": r["pontuacao_total"],
+            "Script": r["uso_script_status"],
+            "Eliminatórios": ", ".join(mask_criteria(r["eliminatorios_mask"])) or "-",
+        }
+        for r in rows
+    ],
+    use_container_width=True,
+    hide_index=True,
+)
+
+# Detalhes de uma ligação
+selecionado = st.selectbox(
+    "Ver detalhes da ligação",
+    [r["id"] for r in rows],
+    format_func=lambda i: next(f"#{r['id']} - {r['arquivo'] or ''} ({r['analisado_em']})" for r in rows if r["id"] == i),
+)
+record = store.get(selecionado)
+analysis = record["analise"]
+final = analysis.get("status_final", {})
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Pontuação", f"{record['pontuacao_total']} / {PONTUACAO_MAXIMA}")
+col2.metric("Script", record["uso_script_status"] or "-")
+col3.metric("Modelo", record["modelo"] or "-")
+st.write(f"**Cliente:** {final.get('satisfacao')} | **Desfecho:** {final.get('desfecho')} | **Risco:** {final.get('risco')}")
+
+for criterio in analysis.get("criterios_eliminatorios", []):
+    if criterio.get("ocorreu"):
+        st.error(f"**{criterio.get('criterio')}** {criterio.get('justificativa', '')}")
+
+with st.expander("Checklist"):
+    for item in analysis.get("checklist", []):
+        icone = "✅" if is_yes(item.get("resposta", "")) else "❌"
+        st.markdown(f"{icone} **{item.get('item')}. {item.get('criterio')}** ({item.get('pontos')} pts)  \n_{item.get('justificativa')}_")
+
+with st.expander("Resumo e transcrição"):
+    st.write(analysis.get("resumo_geral"))
+    st.code(record["transcricao"] or "", language="markdown")
+
+if record["tempos"]:
+    st.caption("Tempos: " + ", ".join(f"{k} = {v}" for k, v in record["tempos"].items() if v is not None))
+
+if st.button("Gerar relatório em PDF"):
+    analyzed_at = datetime.fromisoformat(record["analisado_em"])
+    st.download_button(
+        "Baixar Relatório em PDF",
+        data=create_pdf(analysis, record["transcricao"] or "", record["modelo"], analyzed_at),
+        file_name=report_filename(record["arquivo"], analyzed_at),
+        mime="application/pdf",
+    )
@@ -0,0 +1,75 @@
+import streamlit as st
+st.set_page_config(page_title="HeatGlass - Painel", page_icon="🔴", layout="wide")
+
+import io
+
+from heatglass.analytics import CallAnalytics
+from heatglass.rubric import CRITERIOS_ELIMINATORIOS, PONTUACAO_MAXIMA
+from heatglass.store import ResultStore
+
+
+@st.cache_resource
+def get_store():
+    return ResultStore(batch_size=1)
+
+
+# Agregações do histórico mantidas entre reruns; a cada execução só as análises novas são somadas
+@st.cache_resource
+def get_analytics():
+    return CallAnalytics()
+
+
+st.title("📊 Painel de Qualidade")
+
+with st.sidebar:
+    st.subheader("Fonte dos dados")
+    jsonl = st.file_uploader("Resultados do modo em lote (.jsonl)", type=["jsonl"])
+
+if jsonl is not None:
+    analytics = CallAnalytics()
+    analytics.load_jsonl(io.TextIOWrapper(jsonl, encoding="utf-8"))
+    st.caption(f"Arquivo: {jsonl.name}")
+else:
+    analytics = get_analytics()
+    analytics.refresh(get_store())
+    st.caption("Histórico de análises gravado pelo HeatGlass")
+
+resumo = analytics.score_summary()
+if not resumo["ligacoes"]:
+    st.info("Nenhuma análise disponível ainda.")
+    st.stop()
+
+semanas = analytics.weekly_eliminatory()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Ligações", resumo["ligacoes"])
+col2.metric("Pontuação média", f"{resumo['media']:.1f} / {PONTUACAO_MAXIMA}")
+col3.metric("Mediana (p10 - p90)", f"{resumo['p50']} ({resumo['p10']} - {resumo['p90']})")
+col4.metric("Com violação eliminatória", f"{semanas['com_violacao'].sum() / resumo['ligacoes']:.1%}")
+
+# Itens que mais reprovam
+st.subheader("✅ Taxa de \"sim\" por item do checklist")
+taxas = analytics.pass_rates()
+st.bar_chart(taxas.assign(item=taxas["item"].astype(str)).set_index("item")["taxa_sim"])
+st.dataframe(
+    taxas.rename(columns={"item": "Item", "criterio": "Critério", "pontos": "Pontos",
+                          "taxa_sim": "Taxa de sim", "reprovacoes": "Reprovações"}),
+    hide_index=True,
+    use_container_width=True,
+)
+
+# Distribuição da pontuação
+st.subheader("📈 Distribuição da pontuação")
+st.bar_chart(analytics.score_histogram().set_index("pontuacao")["ligacoes"])
+
+# Critérios eliminatórios por semana
+st.subheader("⚠️ Critérios eliminatórios por semana")
+st.line_chart(semanas.set_index("semana")["taxa_violacao"])
+nomes = {f"criterio_{c['id']}": f"{c['id']}. {c['criterio']}" for c in CRITERIOS_ELIMINATORIOS}
+st.dataframe(
+    semanas.rename(columns={"semana": "Semana", "ligacoes": "Ligações", "com_violacao": "Com violação",
+                            "taxa_violacao": "Taxa", **nomes}),
+    hide_index=True,
+    use_container_width=True,
+)
+
+st.caption("Script de encerramento: " + ", ".join(f"{k}: {v}" for k, v in sorted(analytics.script_counts.items())))
@@ -2,137 +2,32 @@ import streamlit as st
 # Configurações da página - DEVE ser a primeira chamada Streamlit
 st.set_page_config(page_title="HeatGlass", page_icon="🔴", layout="centered")
 
-from openai import OpenAI
+import os
 import tempfile
-import re
-import json
-import base64
 from datetime import datetime
-from fpdf import FPDF
-
-# Inicializa o novo cliente da OpenAI
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-
-# Função para criar PDF
-def create_pdf(analysis, transcript_text, model_name):
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Configurações de fonte
-    pdf.set_font("Arial", "B", 16)
-    
-    # Cabeçalho
-    pdf.set_fill_color(193, 0, 0)
-    pdf.set_text_color(255, 255, 255)
-    pdf.cell(0, 10, "HeatGlass - Relatório de Atendimento", 1, 1, "C", True)
-    pdf.ln(5)
-    
-    # Informações gerais
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, f"Data da análise: {datetime.now().strftime('%d/%m/%Y %H:%M')}", 0, 1)
-    pdf.cell(0, 10, f"Modelo utilizado: {model_name}", 0, 1)
-    pdf.ln(5)
-    
-    # Status Final
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Status Final", 0, 1)
-    pdf.set_font("Arial", "", 12)
-    final = analysis.get("status_final", {})
-    pdf.cell(0, 10, f"Cliente: {final.get('satisfacao', 'N/A')}", 0, 1)
-    pdf.cell(0, 10, f"Desfecho: {final.get('desfecho', 'N/A')}", 0, 1)
-    pdf.cell(0, 10, f"Risco: {final.get('risco', 'N/A')}", 0, 1)
-    pdf.ln(5)
-    
-    # Script de Encerramento
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Script de Encerramento", 0, 1)
-    pdf.set_font("Arial", "", 12)
-    script_info = analysis.get("uso_script", {})
-    pdf.cell(0, 10, f"Status: {script_info.get('status', 'N/A')}", 0, 1)
-    pdf.multi_cell(0, 10, f"Justificativa: {script_info.get('justificativa', 'N/A')}")
-    pdf.ln(5)
-    
-    # Pontuação Total
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Pontuação Total", 0, 1)
-    pdf.set_font("Arial", "B", 12)
-    total = analysis.get("pontuacao_total", "N/A")
-    pdf.cell(0, 10, f"{total} pontos de 81", 0, 1)
-    pdf.ln(5)
-    
-    # Resumo Geral
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Resumo Geral", 0, 1)
-    pdf.set_font("Arial", "", 12)
-    pdf.multi_cell(0, 10, analysis.get("resumo_geral", "N/A"))
-    pdf.ln(5)
-    
-    # Checklist (nova página)
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Checklist Técnico", 0, 1)
-    pdf.ln(5)
-    
-    # Itens do checklist
-    checklist = analysis.get("checklist", [])
-    for item in checklist:
-        item_num = item.get('item', '')
-        criterio = item.get('criterio', '')
-        pontos = item.get('pontos', 0)
-        resposta = str(item.get('resposta', ''))
-        justificativa = item.get('justificativa', '')
-        
-        pdf.set_font("Arial", "B", 12)
-        pdf.multi_cell(0, 10, f"{item_num}. {criterio} ({pontos} pts)")
-        pdf.set_font("Arial", "", 12)
-        pdf.cell(0, 10, f"Resposta: {resposta}", 0, 1)
-        pdf.multi_cell(0, 10, f"Justificativa: {justificativa}")
-        pdf.ln(5)
-    
-    # Transcrição na última página
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Transcrição da Ligação", 0, 1)
-    pdf.set_font("Arial", "", 10)
-    pdf.multi_cell(0, 10, transcript_text)
-    
-    return pdf.output(dest="S").encode("latin1")
-
-# Função para criar link de download do PDF
-def get_pdf_download_link(pdf_bytes, filename):
-    b64 = base64.b64encode(pdf_bytes).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Baixar Relatório em PDF</a>'
-    return href
-
-# Função para extrair JSON válido da resposta
-def extract_json(text):
-    # Procura pelo primeiro '{' e último '}'
-    start_idx = text.find('{')
-    end_idx = text.rfind('}')
-    
-    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-        json_str = text[start_idx:end_idx+1]
-        try:
-            # Verifica se é um JSON válido
-            return json.loads(json_str)
-        except:
-            # Se não for, tenta encontrar o JSON de outras formas
-            pass
-    
-    # Tenta usar expressão regular para encontrar um bloco JSON
-    import re
-    json_pattern = r'\{(?:[^{}]|(?R))*\}'
-    matches = re.findall(json_pattern, text, re.DOTALL)
-    if matches:
-        for match in matches:
-            try:
-                return json.loads(match)
-            except:
-                continue
-    
-    # Se tudo falhar, lança um erro detalhado
-    raise ValueError(f"Não foi possível extrair JSON válido da resposta: {text[:100]}...")
+
+import altair as alt
+import pandas as pd
+
+from heatglass.audio import stream_sha256
+from heatglass.cache import DiskCache
+from heatglass.jobs import CONCLUIDO, ERRO, JobQueue
+from heatglass.metrics import REGISTRY, Trace, configure_log, serve_metrics
+from heatglass.parsing import parse_analysis
+from heatglass.prompt import MODELO_PADRAO
+from heatglass.report import create_pdf, report_filename, report_key, write_reports_zip
+from heatglass.rubric import CHECKLIST, PONTUACAO_MAXIMA, checklist_entry, eliminatorio_entry, is_yes
+from heatglass.scheduler import SCHEDULER, shared_client
+from heatglass.store import ResultStore
+from heatglass.tiers import MODELO_ESCALONADO, STATS as ESCALONAMENTO
+
+# Cliente da OpenAI único para todas as sessões (pool de conexões); as chamadas
+# passam pelo SCHEDULER, que respeita os limites de RPM/TPM e repete em caso de 429
+@st.cache_resource
+def get_client():
+    return shared_client(st.secrets["OPENAI_API_KEY"])
+
+client = get_client()
 
 # Estilo visual
 st.markdown("""
@@ -228,247 +123,387 @@ def get_script_status_class(status):
     else:
         return "script-nao-usado"
 
-# Modelo fixo: GPT-4 Turbo
-modelo_gpt = "gpt-4-turbo"
+# Modelo: GPT-4 Turbo, ou a avaliação escalonada (modelo rápido primeiro, o
+# completo só reavalia as ligações duvidosas - ver heatglass/tiers.py)
+escalonado = st.sidebar.toggle(
+    "⚡ Avaliação escalonada", value=False,
+    help=f"{MODELO_ESCALONADO}: o modelo completo só entra em ligações limítrofes, com possível "
+         "critério eliminatório ou resposta fora do formato.",
+)
+modelo_gpt = MODELO_ESCALONADO if escalonado else MODELO_PADRAO
+
+# Funções para montar os blocos HTML do resultado
+def status_html(final):
+    return f"""
+    <div class="status-box">
+    <strong>Cliente:</strong> {final.get("satisfacao")}<br>
+    <strong>Desfecho:</strong> {final.get("desfecho")}<br>
+    <strong>Risco:</strong> {final.get("risco")}
+    </div>
+    """
+
+def script_html(script_info):
+    script_status = script_info.get("status", "Não avaliado")
+    script_class = get_script_status_class(script_status)
+    return f"""
+    <div class="{script_class}">
+    <strong>Status:</strong> {script_status}<br>
+    <strong>Justificativa:</strong> {script_info.get("justificativa", "Não informado")}
+    </div>
+    """
+
+def eliminatorio_html(criterio):
+    return f"""
+    <div class="criterio-eliminatorio">
+    <strong>{criterio.get('criterio')}</strong><br>
+    {criterio.get('justificativa', '')}
+    </div>
+    """
+
+def checklist_item_html(item):
+    if is_yes(item.get("resposta", "")):
+        classe = "criterio-sim"
+        icone = "✅"
+    else:
+        classe = "criterio-nao"
+        icone = "❌"
+    return f"""
+    <div class="{classe}">
+    {icone} <strong>{item.get('item')}. {item.get('criterio')}</strong> ({item.get('pontos')} pts)<br>
+    <em>{item.get('justificativa')}</em>
+    </div>
+    """
+
+def resumo_html(resumo):
+    return f"<div class='result-box'>{resumo}</div>"
+
+# Painel de depuração: cascata de tempos das etapas, tokens, custo e resposta bruta
+def debug_panel(trace, result):
+    with st.expander("🐞 Depuração - tempos e resposta bruta"):
+        data = trace.to_dict() if isinstance(trace, Trace) else trace
+        if data and data.get("etapas"):
+            cols = st.columns(3)
+            cols[0].metric("Tokens (entrada / saída)", f"{data.get('prompt_tokens', 0)} / {data.get('completion_tokens', 0)}")
+            cols[1].metric("Duração do áudio", f"{data['audio_s']:.0f} s" if "audio_s" in data else "-")
+            cols[2].metric("Custo estimado", f"US$ {data.get('custo_usd', 0):.4f}")
+            frame = pd.DataFrame(data["etapas"])
+            frame["fim_s"] = frame["inicio_s"] + frame["duracao_s"]
+            chart = alt.Chart(frame).mark_bar().encode(
+                x=alt.X("inicio_s", title="segundos desde o início"),
+                x2="fim_s",
+                y=alt.Y("etapa", sort=None, title=None),
+                tooltip=["etapa", "duracao_s"],
+            )
+            st.altair_chart(chart, use_container_width=True)
+            st.caption(f"Total: {data['total_s']:.2f} s")
+        st.code(result, language="json")
+
+
+# Função para exibir o resultado de uma análise (também usada nos reruns).
+# trace é o Trace da análise ou as métricas já gravadas (dicionário), exibido no
+# modo depuração. O trace já foi fechado pelo core.analyze, então o parse e a
+# renderização são medidos à parte, nos histogramas do REGISTRY
+def render_analysis(transcript_text, result, model_name, first_item_s=None, analyzed_at=None, trace=None, debug=False):
+    with st.expander("Ver transcrição completa"):
+        st.code(transcript_text, language="markdown")
+
+    # Tentar extrair e validar o JSON com a função melhorada
+    try:
+        with REGISTRY.timed("parse_json"):
+            analysis = parse_analysis(result)
+    except Exception as json_error:
+        st.error(f"Erro ao processar JSON: {str(json_error)}")
+        st.text_area("Resposta da IA:", value=result, height=300)
+        if debug:
+            debug_panel(trace, result)
+        return
+
+    with REGISTRY.timed("render"):
+        render_sections(analysis, first_item_s)
+    if debug:
+        debug_panel(trace, result)
+
+    render_pdf_section(analysis, result, transcript_text, model_name, analyzed_at)
+
+
+# Seções do resultado: status, script, eliminatórios, checklist e resumo
+def render_sections(analysis, first_item_s=None):
+    # Status Final
+    st.subheader("📋 Status Final")
+    st.markdown(status_html(analysis.get("status_final", {})), unsafe_allow_html=True)
+
+    # Script de Encerramento
+    st.subheader("📝 Script de Encerramento")
+    st.markdown(script_html(analysis.get("uso_script", {})), unsafe_allow_html=True)
+
+    # Critérios Eliminatórios
+    st.subheader("⚠️ Critérios Eliminatórios")
+    criterios_violados = False
+    for criterio in analysis.get("criterios_eliminatorios", []):
+        if criterio.get("ocorreu", False):
+            criterios_violados = True
+            st.markdown(eliminatorio_html(criterio), unsafe_allow_html=True)
+
+    if not criterios_violados:
+        st.success("Nenhum critério eliminatório foi violado.")
+
+    # Checklist
+    st.subheader("✅ Checklist Técnico")
+    total = analysis.get("pontuacao_total", 0)
+    progress_class = get_progress_class(total)
+    st.progress(min(total / PONTUACAO_MAXIMA, 1.0))
+    st.markdown(f"<h3 class='{progress_class}'>{total} pontos de {PONTUACAO_MAXIMA}</h3>", unsafe_allow_html=True)
+    if first_item_s is not None:
+        st.metric("Tempo até o primeiro item", f"{first_item_s:.1f} s")
+    tiers = analysis.get("escalonamento")
+    if tiers:
+        st.caption(f"Avaliado por {tiers['modelo_usado']}" + (
+            f" (escalado: {', '.join(tiers['motivos'])})" if tiers.get("escalado") else " (sem escalonamento)"))
+
+    with st.expander("Ver Detalhes do Checklist"):
+        for item in analysis.get("checklist", []):
+            st.markdown(checklist_item_html(item), unsafe_allow_html=True)
+
+    # Resumo
+    st.subheader("📝 Resumo Geral")
+    st.markdown(resumo_html(analysis.get('resumo_geral')), unsafe_allow_html=True)
+
+
+# Botão do relatório em PDF
+def render_pdf_section(analysis, result, transcript_text, model_name, analyzed_at):
+    # PDF gerado só quando pedido, e reaproveitado nos reruns seguintes
+    st.subheader("📄 Relatório em PDF")
+    key = report_key(result, transcript_text, model_name)
+    if st.button("Gerar relatório em PDF", key=f"pdf_{key}") or st.session_state.get(f"pdf_{key}_pronto"):
+        try:
+            pdf_bytes = cached_pdf(key, analysis, transcript_text, model_name, analyzed_at)
+            st.session_state[f"pdf_{key}_pronto"] = True
+            st.download_button(
+                "Baixar Relatório em PDF",
+                data=pdf_bytes,
+                file_name=report_filename(analyzed_at=analyzed_at),
+                mime="application/pdf",
+            )
+        except Exception as pdf_error:
+            st.error(f"Erro ao gerar PDF: {str(pdf_error)}")
+
+
+# PDFs em cache pela chave do relatório (os argumentos com _ não entram no hash do Streamlit)
+@st.cache_data(max_entries=32, show_spinner="Gerando PDF...")
+def cached_pdf(key, _analysis, _transcript_text, model_name, _analyzed_at):
+    with REGISTRY.timed("pdf"):
+        return create_pdf(_analysis, _transcript_text, model_name, _analyzed_at)
+
+
+# Função para exportar todas as análises da sessão em um ZIP, gerando um PDF por vez
+def export_session_zip(saved_analyses):
+    def records():
+        for audio_hash, saved in saved_analyses.items():
+            try:
+                analysis = parse_analysis(saved["result"])
+            except ValueError:
+                continue
+            name = saved.get("arquivo") or f"HeatGlass_{audio_hash[:12]}"
+            yield report_filename(name), analysis, saved["transcript_text"], saved["modelo"], saved.get("analisado_em")
+
+    with tempfile.TemporaryFile() as tmp:
+        write_reports_zip(records(), tmp)
+        tmp.seek(0)
+        return tmp.read()
+
+
+
+# Cache em disco compartilhado por todas as sessões; resultados da sessão sobrevivem aos reruns
+@st.cache_resource
+def get_cache():
+    return DiskCache()
+
+# Histórico persistente das análises (SQLite); aqui cada análise é gravada na hora
+@st.cache_resource
+def get_store():
+    return ResultStore(batch_size=1)
+
+# Log estruturado das análises e, com HEATGLASS_METRICS_PORT, o endpoint /metrics do Prometheus
+@st.cache_resource
+def start_metrics():
+    configure_log()
+    port = os.environ.get("HEATGLASS_METRICS_PORT")
+    return serve_metrics(int(port)) if port else None
+
+# Fila de análises em segundo plano, compartilhada por todas as sessões: o número
+# de workers (HEATGLASS_WORKERS) limita as análises simultâneas do servidor
+@st.cache_resource
+def get_queue():
+    return JobQueue(client, get_cache(), get_store())
+
+cache = get_cache()
+store = get_store()
+queue = get_queue()
+start_metrics()
+debug = st.sidebar.toggle("🐞 Modo depuração", value=False)
+if "analises" not in st.session_state:
+    st.session_state["analises"] = {}
+if "trabalhos" not in st.session_state:
+    st.session_state["trabalhos"] = {}  # hash do áudio -> id do trabalho na fila
+if "erros_fila" not in st.session_state:
+    st.session_state["erros_fila"] = {}
+
+
+# Copia um trabalho concluído da fila para as análises da sessão
+def collect_job(audio_hash, job_id):
+    job = queue.get(job_id)
+    if job is None or job["status"] == ERRO:
+        st.session_state["erros_fila"][audio_hash] = (job or {}).get("erro") or "Trabalho não encontrado na fila."
+        return
+    metricas = job["metricas"]
+    st.session_state["analises"][audio_hash] = {
+        "transcript_text": job["transcricao"],
+        "result": job["resposta"],
+        "modelo": job["modelo"],
+        "arquivo": job["arquivo"],
+        "analisado_em": datetime.fromisoformat(job["atualizado_em"]),
+        "primeiro_item_s": metricas.get("primeiro_item_s"),
+        "trace": metricas,
+    }
+    st.session_state.pop("zip_relatorios", None)
+
+
+# Análise parcial de um trabalho, montada com os eventos recebidos do modelo até agora
+def live_analysis_view(events):
+    parts = {"checklist": [], "criterios_eliminatorios": []}
+    for key, value in events:
+        if key in ("checklist", "criterios_eliminatorios"):
+            parts[key].append(value)
+        else:
+            parts[key] = value
+    if "status_final" in parts:
+        st.subheader("📋 Status Final")
+        st.markdown(status_html(parts["status_final"]), unsafe_allow_html=True)
+    if "uso_script" in parts:
+        st.subheader("📝 Script de Encerramento")
+        st.markdown(script_html(parts["uso_script"]), unsafe_allow_html=True)
+    criterios = [eliminatorio_entry(entry, position)
+                 for position, entry in enumerate(parts["criterios_eliminatorios"], 1)]
+    if any(criterio["ocorreu"] for criterio in criterios):
+        st.subheader("⚠️ Critérios Eliminatórios")
+        for criterio in criterios:
+            if criterio["ocorreu"]:
+                st.markdown(eliminatorio_html(criterio), unsafe_allow_html=True)
+    if parts["checklist"]:
+        st.subheader("✅ Checklist Técnico")
+        for position, entry in enumerate(parts["checklist"], 1):
+            st.markdown(checklist_item_html(checklist_entry(entry, position)), unsafe_allow_html=True)
+    if "resumo_geral" in parts:
+        st.subheader("📝 Resumo Geral")
+        st.markdown(resumo_html(parts["resumo_geral"]), unsafe_allow_html=True)
+
+
+# Acompanhamento dos trabalhos da sessão: consulta a fila a cada poucos segundos,
+# mostra a análise de cada um à medida que chega e recarrega a página quando algum termina
+@st.fragment(run_every=2)
+def job_status_panel():
+    jobs = st.session_state["trabalhos"]
+    statuses = queue.status(jobs.values())
+    finished = False
+    for audio_hash, job_id in list(jobs.items()):
+        job = statuses.get(job_id)
+        if job is None or job["status"] in (CONCLUIDO, ERRO):
+            collect_job(audio_hash, job_id)
+            del jobs[audio_hash]
+            finished = True
+            continue
+        if "eventos" in job:
+            st.progress(
+                min(job["itens_recebidos"] / len(CHECKLIST), 1.0),
+                text=f"{job['arquivo']}: analisando ({job['itens_recebidos']} de {len(CHECKLIST)} itens)",
+            )
+            with st.expander(f"Análise parcial de {job['arquivo']}", expanded=len(jobs) == 1):
+                live_analysis_view(job["eventos"])
+        else:
+            st.caption(f"⏳ {job['arquivo']}: {job['etapa'] or job['status']}")
+    if finished:
+        st.rerun()
 
 # Título
 st.title("HeatGlass")
 st.write("Análise inteligente de ligações: avaliação de atendimento ao cliente e conformidade com processos.")
 
-# Upload de áudio
-uploaded_file = st.file_uploader("Envie o áudio da ligação (.mp3)", type=["mp3"])
+# Upload de áudio: cada arquivo vira um trabalho na fila, processado em segundo
+# plano - a análise continua mesmo que a página seja recarregada
+uploaded_files = st.file_uploader("Envie os áudios das ligações (.mp3)", type=["mp3"], accept_multiple_files=True)
+uploaded = [(uploaded_file, stream_sha256(uploaded_file)) for uploaded_file in uploaded_files or []]
 
-if uploaded_file is not None:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-        tmp.write(uploaded_file.read())
-        tmp_path = tmp.name
-
-    st.audio(uploaded_file, format='audio/mp3')
+if uploaded:
+    if len(uploaded) == 1:
+        st.audio(uploaded[0][0], format='audio/mp3')
 
     if st.button("🔍 Analisar Atendimento"):
-        # Transcrição via Whisper
-        with st.spinner("Transcrevendo o áudio..."):
-            with open(tmp_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-            transcript_text = transcript.text
-
-        with st.expander("Ver transcrição completa"):
-            st.code(transcript_text, language="markdown")
-
-        # Prompt - Usando o checklist e instruções originais, mas removendo temperatura/impacto
-        prompt = f"""
-Você é um especialista em atendimento ao cliente. Avalie a transcrição a seguir:
-
-TRANSCRIÇÃO:
-\"\"\"{transcript_text}\"\"\"
-
-Retorne APENAS um JSON com os seguintes campos, sem texto adicional antes ou depois:
-
-{{
-  "status_final": {{"satisfacao": "...", "risco": "...", "desfecho": "..."}},
-  "checklist": [
-    {{"item": 1, "criterio": "Atendeu a ligação prontamente, dentro de 5 seg. e utilizou a saudação correta com as técnicas do atendimento encantador?", "pontos": 10, "resposta": "...", "justificativa": "..."}},
-    ...
-  ],
-  "criterios_eliminatorios": [
-    {{"criterio": "Ofereceu/garantiu algum serviço que o cliente não tinha direito?", "ocorreu": true/false, "justificativa": "..."}},
-    ...
-  ],
-  "uso_script": {{"status": "completo/parcial/não utilizado", "justificativa": "..."}},
-  "pontuacao_total": ...,
-  "resumo_geral": "..."
-}}
-
-Scoring logic (mandatory):
-*Only add points for items marked as “yes”.
-*If the answer is “no”, assign 0 points.
-*Never display 81 points by default.
-*Final score = sum of all "yes" items only.
-
-Checklist (81 pts totais):
-1. Atendeu a ligação prontamente, dentro de 5 seg. e utilizou a saudação correta com as técnicas do atendimento encantador? (10 Pontos)
-2. Solicitou os dados do cadastro do cliente e pediu 2 telefones para contato, nome, cpf, placa do veículo e endereço ? Só é "sim" se todas as informações forem solicitadas (6 Pontos)
-3. O Atendente Verbalizou o script LGPD? Script informado em Instruções Adicionais de Avaliação tópico 2. (2 Pontos)
-4. Utilizou a técnica do eco para garantir o entendimento sobre as informações coletadas, evitando erros no processo e recontato do cliente? (5 Pontos)
-5. Escutou atentamente a solicitação do segurado evitando solicitações em duplicidade?  (3 Pontos)
-6. Compreendeu a solicitação do cliente em linha e demonstrou que entende sobre os serviços da empresa? (5 Pontos)
-7. Confirmou as informações completas sobre o dano no veículo? Confirmou data e motivo da quebra, registro do item, dano na pintura e demais informações necessárias para o correto fluxo de atendimento. (tamanho da trinca, LED, Xenon, etc) - 10 Pontos
-8. Confirmou cidade para o atendimento e selecionou corretamente a primeira opção de loja identificada pelo sistema?  (10 Pontos)
-9. A comunicação com o cliente foi eficaz: não houve uso de gírias, linguagem inadequada ou conversas paralelas? O analista informou quando ficou ausente da linha e quando retornou? (5 Pontos)
-10. A conduta do analista foi acolhedora, com sorriso na voz, empatia e desejo verdadeiro em entender e solucionar a solicitação do cliente? (4 Pontos)
-11.Realizou o script de encerramento completo, informando: prazo de validade, franquia, link de acompanhamento e vistoria, e orientou que o cliente aguarde o contato para agendamento? (15 Pontos)
-12. Orientou o cliente sobre a pesquisa de satisfação do atendimento? (6 Pontos)
-
-Scoring logic (mandatory):
-*Only add points for items marked as “yes”.
-*If the answer is “no”, assign 0 points.
-*Never display 81 points by default.
-*Final score = sum of all "yes" items only
-
-INSTRUÇÕES ADICIONAIS DE AVALIAÇÃO:
-1. Técnica do eco: Marque como "sim" somente se o atendente repetir verbalmente informações essenciais como telefones, placa ou CPF após coletá-las. O eco deve ser claro, objetivo e demonstrar validação do entendimento. Caso contrário, marque como "não".
-2. Script LGPD: O atendente deve mencionar explicitamente que o telefone será compartilhado com o prestador de serviço, com ênfase em privacidade ou consentimento. As seguintes variações são válidas e devem ser aceitas como equivalentes:
-    2.1 Você permite que a nossa empresa compartilhe o seu telefone com o prestador que irá lhe atender?
-    2.2 Podemos compartilhar seu telefone com o prestador que irá realizar o serviço?
-    2.3 Seu telefone pode ser informado ao prestador que irá realizar o serviço?
-    2.4 O prestador pode ter acesso ao seu número para realizar o agendamento do serviço?
-    2.5 Podemos compartilhar seu telefone com o prestador que irá te atender?
-    2.6 Você autoriza o compartilhamento do telefone informado com o prestador que irá te atender?
-3. Confirmação de histórico: Verifique se há menção explícita ao histórico de utilização do serviço pelo cliente. A simples localização do cliente no sistema NÃO constitui confirmação de histórico.
-4. Pontuação: Cada item não realizado deve impactar estritamente a pontuação final. Os pontos máximos de cada item estão indicados entre parênteses - se marcado como "não", zero pontos devem ser atribuídos.
-5. Critérios eliminatórios: Avalie com alto rigor - qualquer ocorrência, mesmo que sutil, deve ser marcada.
-6. Script de encerramento: Compare literalmente com o modelo fornecido - só marque como "completo" se TODOS os elementos estiverem presentes (validade, franquia, link, pesquisa de satisfação e despedida).
-7. Registration data confirmation (Item 2): Be extremely rigorous in the evaluation. Verify if the attendant collected/confirmed EACH of the 7 mandatory elements:
-    7.1 Name, CPF, License Plate, Email, Vehicle, Address, and 2 phone numbers.
-    7.2 The absence of ANY element results in "no" and 0 point.
-    7.3 In the justification, specifically list which data was missing.
-    7.4 Exemple: "Faltou confirmação do endereço do cliente" ou "Não coletou o nome do cliente".
-
-Critérios Eliminatórios (cada um resulta em 0 pontos se ocorrer):
-- Ofereceu/garantiu algum serviço que o cliente não tinha direito? 
-  Exemplos: Prometer serviços fora da cobertura, dar garantias não previstas no contrato.
-- Preencheu ou selecionou o Veículo/peça incorretos?
-  Exemplos: Registrar modelo diferente do informado, selecionar peça diferente da solicitada.
-- Agiu de forma rude, grosseira, não deixando o cliente falar e/ou se alterou na ligação?
-  Exemplos: Interrupções constantes, tom agressivo, impedir cliente de explicar situação.
-- Encerrou a chamada ou transferiu o cliente sem o seu conhecimento?
-  Exemplos: Desligar abruptamente, transferir sem explicar ou obter consentimento.
-- Falou negativamente sobre a Carglass, afiliados, seguradoras ou colegas de trabalho?
-  Exemplos: Criticar atendimento prévio, fazer comentários pejorativos sobre a empresa.
-- Forneceu informações incorretas ou fez suposições infundadas sobre garantias, serviços ou procedimentos?
-  Exemplos: "Como a lataria já passou para nós, então provavelmente a sua garantia é motor e câmbio" sem ter certeza disso, sugerir que o cliente pode perder a garantia do veículo.
-- Comentou sobre serviços de terceiros ou orientou o cliente para serviços externos sem autorização?
-  Exemplos: Sugerir que o cliente verifique procedimentos com a concessionária primeiro, fazer comparações com outros serviços, discutir políticas de garantia de outras empresas sem necessidade.
-
-ATENÇÃO: Avalie com rigor frases como "Não teria problema em mexer na lataria e o senhor perder a garantia?" ou "provavelmente a sua garantia é motor e câmbio" - estas constituem informações incorretas ou suposições sem confirmação que podem confundir o cliente e são consideradas violações de critérios eliminatórios.
-
-O script correto para a pergunta 12 é:
-"*obrigada por me aguardar! O seu atendimento foi gerado, e em breve receberá dois links no whatsapp informado, para acompanhar o pedido e realizar a vistoria.*
-*Lembrando que o seu atendimento tem uma franquia de XXX que deverá ser paga no ato do atendimento. (****acessórios/RRSM ****- tem uma franquia que será confirmada após a vistoria).*
-*Te ajudo com algo mais?*
-*Ao final do atendimento terá uma pesquisa de Satisfação, a nota 5 é a máxima, tudo bem?*
-*Agradeço o seu contato, tenha um excelente dia!"*
-
-Avalie se o script acima foi utilizado completamente ou não foi utilizado.
-
-IMPORTANTE: Retorne APENAS o JSON, sem nenhum texto adicional, sem decoradores de código como ```json ou ```, e sem explicações adicionais.
-"""
-
-        with st.spinner("Analisando a conversa..."):
-            try:
-                response = client.chat.completions.create(
-                    model=modelo_gpt,
-                    messages=[
-                        {"role": "system", "content": "Você é um analista especializado em atendimento. Responda APENAS com o JSON solicitado, sem texto adicional, sem marcadores de código como ```json, e sem explicações."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    response_format={"type": "json_object"}  # Força resposta em formato JSON
-                )
-                result = response.choices[0].message.content.strip()
-
-                # Mostrar resultado bruto para depuração
-                with st.expander("Debug - Resposta bruta"):
-                    st.code(result, language="json")
-                
-                # Tentar extrair e validar o JSON com a função melhorada
-                try:
-                    if not result.startswith("{"):
-                        analysis = extract_json(result)
-                    else:
-                        analysis = json.loads(result)
-                except Exception as json_error:
-                    st.error(f"Erro ao processar JSON: {str(json_error)}")
-                    st.text_area("Resposta da IA:", value=result, height=300)
-                    st.stop()
-
-                # Status Final
-                st.subheader("📋 Status Final")
-                final = analysis.get("status_final", {})
-                st.markdown(f"""
-                <div class="status-box">
-                <strong>Cliente:</strong> {final.get("satisfacao")}<br>
-                <strong>Desfecho:</strong> {final.get("desfecho")}<br>
-                <strong>Risco:</strong> {final.get("risco")}
-                </div>
-                """, unsafe_allow_html=True)
-
-                # Script de Encerramento
-                st.subheader("📝 Script de Encerramento")
-                script_info = analysis.get("uso_script", {})
-                script_status = script_info.get("status", "Não avaliado")
-                script_class = get_script_status_class(script_status)
-                
-                st.markdown(f"""
-                <div class="{script_class}">
-                <strong>Status:</strong> {script_status}<br>
-                <strong>Justificativa:</strong> {script_info.get("justificativa", "Não informado")}
-                </div>
-                """, unsafe_allow_html=True)
-
-                # Critérios Eliminatórios
-                st.subheader("⚠️ Critérios Eliminatórios")
-                criterios_elim = analysis.get("criterios_eliminatorios", [])
-                criterios_violados = False
-                
-                for criterio in criterios_elim:
-                    if criterio.get("ocorreu", False):
-                        criterios_violados = True
-                        st.markdown(f"""
-                        <div class="criterio-eliminatorio">
-                        <strong>{criterio.get('criterio')}</strong><br>
-                        {criterio.get('justificativa', '')}
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                if not criterios_violados:
-                    st.success("Nenhum critério eliminatório foi violado.")
-
-                # Checklist
-                st.subheader("✅ Checklist Técnico")
-                checklist = analysis.get("checklist", [])
-                total = float(re.sub(r"[^\d.]", "", str(analysis.get("pontuacao_total", "0"))))
-                progress_class = get_progress_class(total)
-                st.progress(min(total / 100, 1.0))
-                st.markdown(f"<h3 class='{progress_class}'>{int(total)} pontos de 81</h3>", unsafe_allow_html=True)
-
-                with st.expander("Ver Detalhes do Checklist"):
-                    for item in checklist:
-                        resposta = item.get("resposta", "").lower()
-                        if resposta == "sim":
-                            classe = "criterio-sim"
-                            icone = "✅"
-                        else:
-                            classe = "criterio-nao"
-                            icone = "❌"
-                        
-                        st.markdown(f"""
-                        <div class="{classe}">
-                        {icone} <strong>{item.get('item')}. {item.get('criterio')}</strong> ({item.get('pontos')} pts)<br>
-                        <em>{item.get('justificativa')}</em>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-                # Resumo
-                st.subheader("📝 Resumo Geral")
-                st.markdown(f"<div class='result-box'>{analysis.get('resumo_geral')}</div>", unsafe_allow_html=True)
-                
-                # Gerar PDF
-                st.subheader("📄 Relatório em PDF")
-                try:
-                    pdf_bytes = create_pdf(analysis, transcript_text, modelo_gpt)
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"HeatGlass_Relatorio_{timestamp}.pdf"
-                    st.markdown(get_pdf_download_link(pdf_bytes, filename), unsafe_allow_html=True)
-                except Exception as pdf_error:
-                    st.error(f"Erro ao gerar PDF: {str(pdf_error)}")
-
-            except Exception as e:
-                st.error(f"Erro ao processar a análise: {str(e)}")
-                try:
-                    st.text_area("Resposta da IA:", value=response.choices[0].message.content.strip(), height=300)
-                except:
-                    st.text_area("Não foi possível recuperar a resposta da IA", height=300)
+        for uploaded_file, audio_hash in uploaded:
+            if audio_hash in st.session_state["analises"] or audio_hash in st.session_state["trabalhos"]:
+                continue
+            st.session_state["erros_fila"].pop(audio_hash, None)
+            st.session_state["trabalhos"][audio_hash] = queue.submit(
+                uploaded_file, uploaded_file.name, modelo_gpt, audio_hash
+            )
+
+if st.session_state["trabalhos"]:
+    st.subheader("⏳ Em análise")
+    job_status_panel()
+
+for uploaded_file, audio_hash in uploaded:
+    if audio_hash in st.session_state["erros_fila"]:
+        st.error(f"Erro ao processar a análise de {uploaded_file.name}: {st.session_state['erros_fila'][audio_hash]}")
+
+# Resultado: com vários arquivos, um de cada vez
+done = [(uploaded_file.name, audio_hash) for uploaded_file, audio_hash in uploaded
+        if audio_hash in st.session_state["analises"]]
+if done:
+    if len(done) > 1:
+        audio_hash = st.selectbox("Resultado", done, format_func=lambda option: option[0])[1]
+    else:
+        audio_hash = done[0][1]
+    saved = st.session_state["analises"][audio_hash]
+    render_analysis(
+        saved["transcript_text"], saved["result"], saved["modelo"],
+        saved.get("primeiro_item_s"), saved.get("analisado_em"), saved.get("trace"), debug,
+    )
+
+# Contadores do cache e exportação das análises da sessão
+with st.sidebar:
+    if len(st.session_state["analises"]) > 1:
+        st.subheader("Exportar")
+        if st.button("📦 Preparar ZIP com todos os relatórios"):
+            st.session_state["zip_relatorios"] = export_session_zip(st.session_state["analises"])
+        if st.session_state.get("zip_relatorios"):
+            st.download_button(
+                "Baixar relatórios (ZIP)",
+                data=st.session_state["zip_relatorios"],
+                file_name=f"HeatGlass_Relatorios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                mime="application/zip",
+            )
+
+    st.subheader("Fila de análises")
+    st.caption(", ".join(f"{n} {status}" for status, n in sorted(queue.counts().items())) or "vazia")
+
+    st.subheader("Cache")
+    for namespace, counters in cache.stats.items():
+        st.caption(f"{namespace}: {counters['hits']} acertos / {counters['misses']} faltas")
+
+    if debug:
+        st.subheader("Fila da API")
+        st.caption(
+            f"{SCHEDULER.stats['fila']} aguardando (máx. {SCHEDULER.stats['fila_maxima']}), "
+            f"{SCHEDULER.stats['retentativas']} novas tentativas, {SCHEDULER.stats['limitadas']} limitadas (429)"
+        )
+        if ESCALONAMENTO.stats["avaliacoes"]:
+            summary = ESCALONAMENTO.summary()
+            st.subheader("Escalonamento")
+            st.caption(
+                f"{summary['escaladas']} de {summary['avaliacoes']} ligações escaladas "
+                f"({summary['taxa_escalonamento']:.0%})"
+                + (f", concordância entre camadas {summary['concordancia']:.0%}"
+                   if summary["concordancia"] is not None else "")
+            )
+        st.subheader("Latência por etapa")
+        for stage, quantiles in sorted(REGISTRY.percentiles().items()):
+            st.caption(f"{stage}: " + " / ".join(f"p{int(q * 100)} {v:.2f}s" for q, v in quantiles.items()))
@@ -0,0 +1,37 @@
+import pytest
+
+from heatglass.audio import SEGMENTO_S, SOBREPOSICAO_S, merge_transcripts, segment_bounds
+
+
+def test_short_recording_is_a_single_segment():
+    assert segment_bounds(120) == [(0.0, 120)]
+
+
+@pytest.mark.parametrize("duration", [601, 900, 900.05, 600 + SOBREPOSICAO_S])
+def test_tail_covered_by_the_overlap_is_not_a_segment(duration):
+    bounds = segment_bounds(duration)
+    start, length = bounds[-1]
+    assert start + length == pytest.approx(duration)
+    assert length > SOBREPOSICAO_S
+    assert all(length >= SEGMENTO_S for _, length in bounds[:-1])
+
+
+def test_segments_overlap_and_cover_the_recording():
+    bounds = segment_bounds(1210)
+    assert [start for start, _ in bounds] == [0, 300, 600, 900, 1200]
+    for (start, length), (next_start, _) in zip(bounds, bounds[1:]):
+        assert start + length == next_start + SOBREPOSICAO_S
+    assert bounds[-1] == (1200, 10)
+
+
+def test_merge_removes_the_repeated_overlap():
+    first = "o cliente informou que o carro parou na estrada perto de Campinas"
+    second = "Parou na estrada, perto de Campinas, e pediu um guincho"
+    assert merge_transcripts([first, second]) == (
+        "o cliente informou que o carro parou na estrada perto de Campinas e pediu um guincho"
+    )
+
+
+def test_merge_without_common_words_keeps_both_texts():
+    assert merge_transcripts(["bom dia", "", "qual o seu nome"]) == "bom dia qual o seu nome"
+    assert merge_transcripts([]) == ""
@@ -0,0 +1,10 @@
+from heatglass import batch, core
+
+
+def test_unreadable_response_error_reaches_the_trace(monkeypatch):
+    monkeypatch.setattr(core, "transcribe", lambda *args: ("Atendente: bom dia.", "hash"))
+    monkeypatch.setattr(core, "evaluate", lambda *args: '{"checklist": [')
+    record = batch.process_file(object(), "ligacao.mp3", "gpt-4-turbo")
+    assert "JSON" in record["erro"]
+    assert record["metricas"]["erro"] == record["erro"]
+    assert record["metricas"]["modelo"] == "gpt-4-turbo"
@@ -0,0 +1,121 @@
+import json
+import types
+
+import pytest
+
+from heatglass import pipeline
+from heatglass.mapreduce import CARACTERES_POR_TOKEN, _parse_window, merge_windows, split_windows
+from heatglass.rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS, ITENS_LIGACAO_INTEIRA
+
+
+def make_partial(answers=None, ocorreu=(), script="não utilizado", risco="baixo", resumo="trecho", **fields):
+    answers = answers or {}
+    partial = {
+        "status_final": {"satisfacao": "neutro", "risco": risco, "desfecho": "em andamento"},
+        "checklist": [{"item": c["item"], "resposta": answers.get(c["item"], "sem evidência"),
+                       "justificativa": f"item {c['item']}"} for c in CHECKLIST],
+        "criterios_eliminatorios": [{"id": c["id"], "ocorreu": c["id"] in ocorreu, "justificativa": f"c{c['id']}"}
+                                    for c in CRITERIOS_ELIMINATORIOS],
+        "uso_script": {"status": script, "justificativa": ""},
+        "resumo_geral": resumo,
+    }
+    partial.update(fields)
+    return partial
+
+
+def by_item(merged):
+    return {entry["item"]: entry for entry in merged["checklist"]}
+
+
+def test_split_short_text_is_a_single_window():
+    assert split_windows("  Olá, tudo bem?  ", window_tokens=100) == ["Olá, tudo bem?"]
+
+
+def test_split_windows_overlap_and_cover_every_word():
+    words = [f"palavra{i}" for i in range(2000)]
+    text = ". ".join(" ".join(words[i:i + 10]) for i in range(0, len(words), 10)) + "."
+    windows = split_windows(text, window_tokens=200, overlap_tokens=20)
+    assert len(windows) > 1
+    assert all(len(w) <= 200 * CARACTERES_POR_TOKEN for w in windows)
+    seen = set()
+    for window in windows:
+        seen.update(w.strip(".") for w in window.split())
+    assert seen == set(words)
+    # Vizinhos se sobrepõem e nenhum corte cai no meio de uma palavra
+    for previous, current in zip(windows, windows[1:]):
+        assert current.split()[0] in previous.split()
+        assert current.split()[0].strip(".") in words
+
+
+def test_split_prefers_sentence_ends():
+    text = " ".join(f"Frase número {i} termina aqui." for i in range(300))
+    for window in split_windows(text, window_tokens=100, overlap_tokens=10)[:-1]:
+        assert window.endswith(".")
+
+
+def test_merge_yes_in_any_window_passes():
+    item = next(c["item"] for c in CHECKLIST if c["item"] not in ITENS_LIGACAO_INTEIRA)
+    merged = merge_windows([make_partial(), make_partial({item: "sim"}), make_partial({item: "não"})])
+    assert by_item(merged)[item]["resposta"] == "sim"
+    assert by_item(merged)[item]["justificativa"] == f"[Trecho 2] item {item}"
+    assert merged["trechos"] == 3
+
+
+def test_merge_whole_call_items_fail_on_any_no():
+    item = next(iter(ITENS_LIGACAO_INTEIRA))
+    assert by_item(merge_windows([make_partial({item: "sim"}), make_partial({item: "não"})]))[item]["resposta"] == "não"
+    assert by_item(merge_windows([make_partial({item: "sim"}), make_partial()]))[item]["resposta"] == "sim"
+
+
+def test_merge_criteria_script_status_and_summary():
+    criterio = CRITERIOS_ELIMINATORIOS[0]["id"]
+    merged = merge_windows([
+        make_partial(script="parcial", risco="alto", resumo="início"),
+        make_partial(ocorreu={criterio}, script="completo", risco="médio", resumo="fim"),
+    ])
+    criterios = {c["id"]: c for c in merged["criterios_eliminatorios"]}
+    assert criterios[criterio]["ocorreu"] and criterios[criterio]["justificativa"] == f"[Trecho 2] c{criterio}"
+    assert not any(c["ocorreu"] for i, c in criterios.items() if i != criterio)
+    assert merged["uso_script"]["status"] == "completo"
+    assert merged["status_final"]["risco"] == "alto"
+    assert merged["resumo_geral"] == "[Trecho 1] início [Trecho 2] fim"
+    assert "json_reparado" not in merged
+
+
+def test_merge_propagates_repair_flag():
+    assert merge_windows([make_partial(), make_partial(json_reparado=True)])["json_reparado"]
+
+
+def test_parse_window_accepts_omitted_prescreened_entries():
+    partial = make_partial()
+    del partial["uso_script"]
+    partial["checklist"] = [e for e in partial["checklist"] if e["item"] not in (11, 12)]
+    script = {"status": "completo", "justificativa": "pré-triagem"}
+    parsed = _parse_window(json.dumps(partial), skip={11, 12}, script=script)
+    assert parsed["uso_script"] == script
+    with pytest.raises(ValueError, match="uso_script"):
+        _parse_window(json.dumps(partial), skip={11, 12})
+    with pytest.raises(ValueError, match="faltam itens 11, 12"):
+        _parse_window(json.dumps(dict(partial, uso_script=script)))
+
+
+def test_long_call_with_prescreened_script_is_analyzed(monkeypatch):
+    screen = {"itens": {11: {"item": 11, "resposta": "sim", "justificativa": "local"}},
+              "uso_script": {"status": "completo", "justificativa": "local"}, "pistas": [], "medicoes": []}
+    monkeypatch.setattr(pipeline, "_prescreen", lambda *args: screen)
+
+    # Trechos que obedecem ao prompt: sem o item 11 e sem uso_script
+    def create(**kwargs):
+        assert "OMITA" in kwargs["messages"][1]["content"]
+        partial = make_partial()
+        del partial["uso_script"]
+        partial["checklist"] = [e for e in partial["checklist"] if e["item"] != 11]
+        message = types.SimpleNamespace(content=json.dumps(partial))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    text = "Atendente: bom dia, em que posso ajudar? Cliente: meu carro quebrou. " * 800
+    analysis = json.loads(pipeline.request_analysis(client, text, "gpt-4-turbo", max_workers=2))
+    assert analysis["trechos"] > 1
+    assert analysis["uso_script"] == screen["uso_script"]
+    assert by_item(analysis)[11]["justificativa"] == "local"
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from heatglass.parsing import _repair, _scan, extract_json, parse_analysis, validate_analysis
+from heatglass.rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS
+
+
+def make_analysis(**overrides):
+    analysis = {
+        "status_final": {"satisfacao": "satisfeito", "risco": "baixo", "desfecho": "resolvido"},
+        "checklist": [{"item": c["item"], "resposta": "sim", "justificativa": "ok"} for c in CHECKLIST],
+        "criterios_eliminatorios": [
+            {"id": c["id"], "ocorreu": False, "justificativa": ""} for c in CRITERIOS_ELIMINATORIOS
+        ],
+        "uso_script": {"status": "completo", "justificativa": "ok"},
+        "resumo_geral": "Atendimento cordial.",
+    }
+    analysis.update(overrides)
+    return analysis
+
+
+def test_scan_finds_root_objects_and_ignores_braces_inside_strings():
+    text = 'antes {"a": "x}{y"} meio {"b": [1, {"c": "]"}]} fim'
+    complete, open_start, _, in_string, stack = _scan(text)
+    assert [json.loads(text[s:e]) for s, e in complete] == [{"a": "x}{y"}, {"b": [1, {"c": "]"}]}]
+    assert open_start == -1
+    assert not in_string and stack == ""
+
+
+def test_scan_handles_escaped_quotes():
+    text = '{"a": "diz \\"oi\\" {"}'
+    complete, open_start, *_ = _scan(text)
+    assert complete == [(0, len(text))]
+    assert open_start == -1
+
+
+def test_scan_reports_open_object_and_stack():
+    text = 'x {"a": [1, {"b": "texto'
+    complete, open_start, safe_points, in_string, stack = _scan(text)
+    assert complete == []
+    assert open_start == 2
+    assert in_string
+    assert stack == "{[{"
+    assert safe_points
+
+
+def test_scan_discards_object_with_mismatched_closer():
+    text = '{"a": [1} {"b": 2}'
+    complete, open_start, *_ = _scan(text)
+    assert [json.loads(text[s:e]) for s, e in complete] == [{"b": 2}]
+    assert open_start == -1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": "tex', {"a": "tex"}),
+    ('{"a": [1, 2, ', {"a": [1, 2]}),
+    ('{"a": 1, "b": {"c": [true, ', {"a": 1, "b": {"c": [True]}}),
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1, "b": ', {"a": 1}),
+])
+def test_repair_closes_truncated_object(text, expected):
+    _, open_start, safe_points, in_string, stack = _scan(text)
+    assert _repair(text, open_start, safe_points, in_string, stack) == expected
+
+
+def test_validate_requires_every_field():
+    analysis = make_analysis()
+    del analysis["uso_script"]
+    assert validate_analysis(analysis) == ["campo 'uso_script' ausente"]
+    assert validate_analysis({"checklist": []})
+
+
+def test_validate_requires_dict_entries():
+    assert validate_analysis(make_analysis(checklist=["sim"])) == ["campo 'checklist' deveria conter apenas objetos"]
+
+
+def test_parse_rejects_empty_checklist():
+    with pytest.raises(ValueError):
+        parse_analysis('{"checklist": []}')
+    with pytest.raises(ValueError, match="faltam itens"):
+        parse_analysis(json.dumps(make_analysis(checklist=[])))
+
+
+def test_parse_accepts_text_around_json():
+    analysis = parse_analysis("Segue:\n```json\n" + json.dumps(make_analysis()) + "\n```")
+    assert analysis["pontuacao_total"] == sum(c["pontos"] for c in CHECKLIST)
+    assert "json_reparado" not in analysis
+
+
+def test_truncated_tail_is_repaired_with_defaults():
+    text = json.dumps(make_analysis(), ensure_ascii=False)
+    text = text[:text.index('"uso_script"')]
+    analysis = parse_analysis(text)
+    assert analysis["json_reparado"]
+    assert analysis["resumo_geral"] == ""
+    assert analysis["pontuacao_total"] == sum(c["pontos"] for c in CHECKLIST)
+
+
+def test_truncated_checklist_is_rejected_not_scored():
+    text = json.dumps(make_analysis(), ensure_ascii=False)
+    with pytest.raises(ValueError):
+        parse_analysis(text[:text.index('{"item": 3,')])
+
+
+def test_repaired_object_missing_items_is_marked_truncated():
+    analysis = make_analysis()
+    analysis = {"criterios_eliminatorios": analysis.pop("criterios_eliminatorios"), **analysis}
+    text = json.dumps(analysis, ensure_ascii=False)
+    text = text[:text.index('{"item": 3,')]
+    assert extract_json(text)["json_reparado"]
+    with pytest.raises(ValueError, match="resposta truncada"):
+        parse_analysis(text)
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from heatglass.prescreen import Transcript, check_echo, facts_prompt, prescreen
+
+# Conversa neutra para empurrar o que vem depois para a parte final da ligação
+MEIO = "Atendente: certo, vou verificar aqui no sistema o seu cadastro. " * 60
+
+ENCERRAMENTO = (
+    "Atendente: o serviço tem validade de 30 dias, sem franquia. Vou enviar o link pelo WhatsApp. "
+    "Aguarde o contato do prestador para o agendamento. Depois responda a pesquisa de satisfação com nota 5. "
+    "Agradeço o seu contato, tenha um ótimo dia."
+)
+
+
+def pista(screen, item):
+    return next((p for p in screen["pistas"] if p.startswith(f"Item {item}:")), None)
+
+
+@pytest.mark.parametrize("frase", [
+    "Você autoriza o compartilhamento do telefone informado com o prestador que irá te atender?",
+    "Podemos compartilhar seu telefone com o prestador que irá realizar o serviço?",
+    "Você permite que a nossa empresa compartilhe o seu telefone com o prestador que irá lhe atender?",
+])
+def test_lgpd_with_consent_is_decided(frase):
+    screen = prescreen(f"Atendente: {frase} Cliente: sim. " + MEIO)
+    assert screen["itens"][3]["resposta"] == "sim"
+
+
+@pytest.mark.parametrize("frase", [
+    "Atendente: O prestador vai entrar em contato pelo número informado.",
+    "Atendente: o prestador vai entrar em contato pelo número informado, tudo bem?",
+    "Cliente: o prestador pode ter acesso ao meu número?",
+])
+def test_lgpd_without_consent_verb_is_only_a_hint(frase):
+    screen = prescreen(frase + " " + MEIO)
+    assert 3 not in screen["itens"]
+    assert "sem pedido de consentimento" in pista(screen, 3)
+
+
+def test_lgpd_absent():
+    screen = prescreen(MEIO)
+    assert 3 not in screen["itens"]
+    assert "nenhuma frase" in pista(screen, 3)
+
+
+def test_echo_is_never_decided_locally():
+    screen = prescreen("Cliente: meu telefone é 11 9876 5432. Atendente: 11 9876 5432, correto? " + MEIO)
+    assert 4 not in screen["itens"]
+    assert "repetido" in pista(screen, 4)
+    assert "Item 4" not in facts_prompt(screen).split("PISTAS")[0]
+
+
+@pytest.mark.parametrize("texto", [
+    "Cliente: o carro é 2019. Atendente: 2019, certo.",
+    "Atendente: o valor é R$ 1.500,00. Cliente: 1.500,00?",
+    "Atendente: fica 1500 reais. Cliente: 1500 reais?",
+    "Cliente: placa ABC1234. Atendente: ABC1234.",
+])
+def test_echo_ignores_years_amounts_and_short_runs(texto):
+    assert check_echo(Transcript(texto)) is None
+
+
+def test_echo_finds_phone_and_cpf_written_out():
+    texto = "Cliente: o CPF é um dois três quatro cinco seis sete oito nove zero zero. Atendente: 123 456 789 00."
+    assert check_echo(Transcript(texto)) is not None
+
+
+def test_closing_script_at_the_end_is_decided():
+    screen = prescreen(MEIO + ENCERRAMENTO)
+    assert set(screen["itens"]) == {11, 12}
+    assert screen["uso_script"]["status"] == "completo"
+    assert "OMITA" in facts_prompt(screen)
+
+
+def test_closing_script_early_in_the_call_is_only_a_hint():
+    screen = prescreen(ENCERRAMENTO + " " + MEIO + MEIO)
+    assert 11 not in screen["itens"] and 12 not in screen["itens"]
+    assert screen["uso_script"] is None
+    assert "fora do encerramento" in pista(screen, 12)
+
+
+def test_customer_questions_do_not_decide_item_11():
+    screen = prescreen(MEIO + "Cliente: Qual a franquia? E o link, é whatsapp? E a validade… "
+                              "Atendente: aguarde o contato do prestador para o agendamento.")
+    assert 11 not in screen["itens"]
+    assert screen["uso_script"] is None
+
+
+def test_missing_survey_is_a_hint():
+    screen = prescreen(MEIO + "Atendente: tenha um ótimo dia.")
+    assert 12 not in screen["itens"]
+    assert "não é mencionada" in pista(screen, 12)
+
+
+def test_long_transcript_stays_fast():
+    texto = ("Atendente: o prestador vai ligar. Cliente: ok, meu telefone é 11 9876 5432. " * 3000)
+    start = time.perf_counter()
+    prescreen(texto)
+    assert time.perf_counter() - start < 0.3
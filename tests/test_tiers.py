@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from heatglass import pipeline
+from heatglass.rubric import CHECKLIST, CRITERIOS_ELIMINATORIOS
+from heatglass.tiers import agreement, escalation_reasons, tier_result
+
+
+def make_result(answer=lambda item: "sim", pre=()):
+    return json.dumps({
+        "status_final": {"satisfacao": "satisfeito", "risco": "baixo", "desfecho": "resolvido"},
+        "checklist": [{"item": c["item"], "resposta": answer(c["item"]), "justificativa": ""} for c in CHECKLIST],
+        "criterios_eliminatorios": [{"id": c["id"], "ocorreu": False, "justificativa": ""}
+                                    for c in CRITERIOS_ELIMINATORIOS],
+        "uso_script": {"status": "completo", "justificativa": ""},
+        "resumo_geral": "",
+        "itens_pre_triagem": list(pre),
+    })
+
+
+def test_clear_result_is_not_escalated():
+    assert escalation_reasons(make_result()) == []
+    assert escalation_reasons('{"checklist": [') == ["formato"]
+
+
+def test_agreement_ignores_prescreened_items():
+    fast = make_result(lambda i: "não" if i == 11 else "sim", pre=(11,))
+    heavy = make_result(lambda i: "sim", pre=(11,))
+    compared = agreement(fast, heavy)
+    assert compared["itens_comparados"] == len(CHECKLIST) - 1 + len(CRITERIOS_ELIMINATORIOS)
+    assert compared["concordancia"] == 1.0
+
+
+def test_unreadable_heavy_falls_back_to_fast():
+    analysis = json.loads(tier_result(make_result(), "não é json", "rapido", "completo", ["limitrofe"]))
+    assert analysis["escalonamento"]["modelo_usado"] == "rapido"
+    assert analysis["escalonamento"]["falha_modelo_completo"]
+
+
+@pytest.fixture
+def tiered(monkeypatch):
+    calls = {"pre_triagem": 0, "modelos": []}
+    real_prescreen = pipeline._prescreen
+
+    def counting_prescreen(*args):
+        calls["pre_triagem"] += 1
+        return real_prescreen(*args)
+
+    def fake_request(client, text, model, trace=None, audio=None, max_workers=1, screen=None):
+        assert screen is not None
+        calls["modelos"].append(model)
+        if model == "rapido":
+            raise calls["erro"]
+        return make_result()
+
+    monkeypatch.setattr(pipeline, "_prescreen", counting_prescreen)
+    monkeypatch.setattr(pipeline, "request_analysis", fake_request)
+    return calls
+
+
+@pytest.mark.parametrize("error, reason", [(ValueError("Trecho fora do formato"), "formato"),
+                                           (RuntimeError("model not found"), "erro")])
+def test_fast_tier_failure_escalates(tiered, error, reason):
+    tiered["erro"] = error
+    analysis = json.loads(pipeline.request_analysis_tiered(None, "texto", "rapido", "completo"))
+    assert tiered["modelos"] == ["rapido", "completo"]
+    assert tiered["pre_triagem"] == 1
+    assert analysis["escalonamento"]["motivos"] == [reason]
+    assert analysis["escalonamento"]["modelo_usado"] == "completo"
+
+
+def test_streamed_fast_tier_failure_escalates(tiered, monkeypatch):
+    tiered["erro"] = ValueError("fora do formato")
+    streamed = []
+
+    def fake_stream(client, text, on_event, model, trace=None, audio=None, max_workers=1, started=None,
+                    screen=None):
+        assert screen is not None
+        tiered["modelos"].append(model)
+        on_event("checklist", {"item": 1})
+        return make_result()
+
+    monkeypatch.setattr(pipeline, "stream_analysis", fake_stream)
+    result = pipeline.stream_analysis_tiered(None, "texto", lambda k, v: streamed.append(k), "rapido", "completo")
+    assert json.loads(result)["escalonamento"]["escalado"]
+    assert streamed == ["checklist"]
+    assert tiered["pre_triagem"] == 1